@@ -1,63 +1,80 @@
+import time
+
+# start of the application (for startup phase times)
+STARTED = time.perf_counter()
+
 import tkinter as tk
-from tkinter import simpledialog, messagebox
+from tkinter import simpledialog, messagebox, filedialog
 import tkinter.ttk as ttk
-from importlib import import_module
 from random import randint
 from subprocess import Popen
-from playwright.sync_api import sync_playwright
-import webbrowser
-import platform
+import threading
 from datetime import date
 
+# Playwright, popups (requests, BeautifulSoup) and exporter are imported when they are used, not to delay startup
 from art_db import ARTDatabase
-from popups.add_award import AddAward
-from popups.note_of_day import NoteOfDay
-from popups.settings import Settings
+from art_db_backend import create_backend, get_storage_config
+from art_refresh import BackgroundRefresher, get_chrome_command
+from art_scheduler import RefreshScheduler
+from awards._trace import tracer
+
+# milliseconds between checks of background balance updates
+POLL_INTERVAL = 200
+# balance history rows read at a time; the next page is read when scrolled near the bottom
+HISTORY_PAGE_SIZE = 50
+# scrolled position (0.0 top, 1.0 bottom) of the bottom of the view to read the next page
+HISTORY_PAGE_THRESHOLD = 0.9
+# milliseconds to gather award overview refresh requests into one redraw (about a frame)
+REDRAW_INTERVAL = 16
+
 
 class ART(object):
     """Main class for ART, Automated Rewards Tracker"""
     award_info_gui_components = []
 
     def __init__(self):
-        """Initial function. Unlock MySQL and launch Chrome CDP mode; then launch ART app."""
+        """Initial function. Unlock the database, then show ART app while Chrome CDP mode is launched in the
+        background. Award scripts connect to Chrome when they run (see RefreshWorkerPool).
+        """
+        # seconds of each startup phase
+        self.startup = {"imports": time.perf_counter() - STARTED}
+        self.art_db = self.open_database()
+        if self.art_db is None:
+            return
+        self.chrome_debug_port = randint(10000, 30000)
+        self.chrome_process = None
+        # configs are read here: a MySQL connection taken by the Chrome thread would never be returned to the pool
+        chrome_executable = self.art_db.get_configs("chrome_executable")["chrome_executable"]["conf_value"]
+        self.chrome_thread = threading.Thread(target=self.launch_chrome, args=(chrome_executable,), daemon=True)
+        self.chrome_thread.start()
+        # award scripts run in the background not to freeze the window
+        self.refresher = BackgroundRefresher(art_db=self.art_db,
+                                             cdp_url=f"http://localhost:{self.chrome_debug_port}")
+        # stale balances and balances about to expire are updated without a click (Configs.auto_refresh)
+        self.scheduler = RefreshScheduler(art_db=self.art_db, refresher=self.refresher)
+        # phases of balance updates are traced if Configs.trace_file is set (saved when ART is closed)
+        self.trace_file = self.art_db.get_configs("trace_file")["trace_file"]["conf_value"].strip()
+        if self.trace_file != "":
+            tracer.start()
+        self.show_main_app()
+
+    def open_database(self) -> ARTDatabase | None:
+        """Open ART database. Ask MySQL password (up to 3 times) unless the database is SQLite.
+
+        :return: ART database or None if the password did not match 3 times
+        """
         retry = 0
         while True:
             try:
-                password = self.get_mysql_password(retry)
-                self.art_db = ARTDatabase(password=password)
-                self.chrome_debug_port = randint(10000, 30000)
-                # set size of Chrome to a limited/fixed size
-                if platform.system() == "Windows":
-                    chrome_path = self.art_db.get_configs("chrome_executable")["chrome_executable"]["conf_value"]
-                    self.chrome_process = Popen([
-                        chrome_path,
-                        f"--remote-debugging-port={self.chrome_debug_port}",
-                        "--window-size=1240,800"
-                    ])
-                elif platform.system() == "Linux":
-                    # I did not test for Linux yet.
-                    self.chrome_process = Popen([
-                        "google-chrome",
-                        f"--remote-debugging-port={self.chrome_debug_port}",
-                        "--window-size=1240,800"
-                    ])
-                elif platform.system() == "Darwin":
-                    # Since I do not have a MAC system, I did not test this line.
-                    self.chrome_process = Popen([
-                        "open",
-                        "-a",
-                        "Google Chrome.app",
-                        "--args",
-                        f"--remote-debugging-port={self.chrome_debug_port}",
-                        "--window-size=1240,800"
-                    ])
-                self.playwright = sync_playwright().start()
-                self.chrome_debug_browser = self.playwright.chromium.connect_over_cdp(
-                    f"http://localhost:{self.chrome_debug_port}"
-                )
-                print(f"DEBUG MODE >> Chrome Debug Port #{self.chrome_debug_port}")
-                self.show_main_app()
-                break
+                # an SQLite database has no password
+                storage = get_storage_config()
+                started = time.perf_counter()
+                password = None if storage["backend"] == "sqlite" else self.get_mysql_password(retry)
+                self.startup["password"] = self.startup.get("password", 0) + time.perf_counter() - started
+                started = time.perf_counter()
+                art_db = ARTDatabase(password=password, backend=create_backend(password=password, storage=storage))
+                self.startup["database"] = time.perf_counter() - started
+                return art_db
             except RuntimeError:
                 retry += 1
                 if retry == 3:
@@ -65,7 +82,26 @@ class ART(object):
                         title="Exceed Retries",
                         message="Failed to match the password 3 times.\nTerminate the application."
                     )
-                    break
+                    return None
+
+    def launch_chrome(self, chrome_executable: str) -> None:
+        """Launch Chrome CDP mode (background thread). The database is not used by this thread.
+
+        :param chrome_executable: Chrome executable (Configs.chrome_executable)
+        """
+        started = time.perf_counter()
+        # set size of Chrome to a limited/fixed size
+        command = get_chrome_command(chrome_executable=chrome_executable, port=self.chrome_debug_port)
+        if command is not None:
+            self.chrome_process = Popen(command)
+        self.startup["chrome"] = time.perf_counter() - started
+        print(f"DEBUG MODE >> Chrome Debug Port #{self.chrome_debug_port}")
+
+    def report_startup(self) -> None:
+        """Print time of each startup phase once the main window is shown."""
+        self.startup["total"] = time.perf_counter() - STARTED
+        phases = ", ".join(f"{phase} {seconds:.2f} s" for phase, seconds in self.startup.items())
+        print(f"DEBUG MODE >> Startup: {phases}")
 
     def get_mysql_password(self, retry: int = 0) -> str:
         """Get MySQL password from user.
@@ -82,6 +118,7 @@ class ART(object):
 
     def show_main_app(self) -> None:
         """Creating GUI: main window."""
+        started = time.perf_counter()
         self.win = tk.Tk()
         self.win.title("ART: Automated Rewards Tracker")
 
@@ -89,14 +126,19 @@ class ART(object):
         self.gui_add_menu()
         self.gui_add_main()
         self.main_frame.pack(fill="both", expand=False)
+        self.gui_add_status_bar()
 
         self.init_data()
+        self.startup["window"] = time.perf_counter() - started
 
         self.win.protocol("WM_DELETE_WINDOW", self.on_closing)
         # show note of the day but only once a day
         today = date.today().strftime("%Y-%m-%d")
         if self.art_db.get_configs("last_day_note_opened")["last_day_note_opened"]["conf_value"] != today:
             self.win.after(1000, self.show_note_of_day)
+        self.win.after(POLL_INTERVAL, self.poll_refresher)
+        # the window is drawn when the event loop is idle for the first time
+        self.win.after_idle(self.report_startup)
 
         self.win.mainloop()
 
@@ -107,7 +149,7 @@ class ART(object):
 
         # menu: File
         menu_file = tk.Menu(menubar, tearoff=False)
-        menu_file.add_command(label="Export to Excel (NYI)",
+        menu_file.add_command(label="Export to Excel/CSV",
                               command=self.on_export_to_excel)
         menu_file.add_separator()
         menu_file.add_command(label="Settings",
@@ -126,6 +168,13 @@ class ART(object):
         menu_account.add_command(label="Remove an Award (NYI)",
                                  command=self.on_remove_award)
         menu_account.add_separator()
+        menu_account.add_command(label="Update All Balances (Owner)",
+                                 command=self.on_update_all_balances)
+        menu_account.add_command(label="Update All Balances (All Owners)",
+                                 command=self.on_update_all_owners_balances)
+        menu_account.add_command(label="Cancel All Updates",
+                                 command=self.on_cancel_all_updates)
+        menu_account.add_separator()
         menu_account.add_command(label="Refresh Awards (NYI)",
                                  command=self.refresh_award_list)
         menubar.add_cascade(label="Account", menu=menu_account)
@@ -186,6 +235,9 @@ class ART(object):
         self.treeview_award_list.column("last_update", anchor="w", width=100)
         self.treeview_award_list.heading("last_update", text="Last Updated")
         self.treeview_award_list.bind("<<TreeviewSelect>>", self.on_show_award_details)
+        # shown rows: {("category", category) or (award, username): [Treeview item, values]}
+        self.award_list_rows = {}
+        self.award_list_redraw = None
 
     def gui_add_award_info(self) -> None:
         """Creating GUI: Award detail."""
@@ -216,19 +268,22 @@ class ART(object):
         frame_balance_history = ttk.Frame(paned_balance_history)
         paned_balance_history.add(frame_balance_history)
 
-        scrollbar_balance_history = ttk.Scrollbar(frame_balance_history)
-        scrollbar_balance_history.configure(orient="vertical")
-        scrollbar_balance_history.pack(fill="y", side="right")
+        self.scrollbar_balance_history = ttk.Scrollbar(frame_balance_history)
+        self.scrollbar_balance_history.configure(orient="vertical")
+        self.scrollbar_balance_history.pack(fill="y", side="right")
+        # account shown in balance history and date of its last row read (None if all rows are read)
+        self.history_account = None
+        self.history_before = None
 
         # Add a Treeview widget
         self.treeview_balance_history = ttk.Treeview(
             frame_balance_history,
-            yscrollcommand=scrollbar_balance_history.set,
+            yscrollcommand=self.on_scroll_balance_history,
             columns=('date', 'balance'),
             show='headings'
         )
         self.treeview_balance_history.pack(expand=True, fill="y")
-        scrollbar_balance_history.config(command=self.treeview_balance_history.yview)
+        self.scrollbar_balance_history.config(command=self.treeview_balance_history.yview)
         self.treeview_balance_history.column("date", anchor="w", width=130)
         self.treeview_balance_history.heading("date", text="Date", anchor="w")
         self.treeview_balance_history.column("balance", anchor="w", width=130)
@@ -242,7 +297,18 @@ class ART(object):
                                    text="Update Award Balance",
                                    command=self.on_update_award_program,
                                    width=20)
-        button_update.grid(padx=3, sticky="e")
+        button_update.grid(column=0, row=0, padx=3, sticky="e")
+        button_cancel = ttk.Button(frame_award_info_update,
+                                   text="Cancel Update",
+                                   command=self.on_cancel_award_update,
+                                   width=15)
+        button_cancel.grid(column=1, row=0, padx=3, sticky="e")
+
+    def gui_add_status_bar(self) -> None:
+        """Creating GUI: status bar showing running and queued balance updates."""
+        self.status_text = tk.StringVar(value="Ready")
+        label_status = ttk.Label(self.win, textvariable=self.status_text, anchor="w", relief="sunken")
+        label_status.pack(side="bottom", fill="x")
 
     def init_data(self) -> None:
         """Initialize data. Get user list and award information."""
@@ -253,55 +319,100 @@ class ART(object):
             self.combo_owner.current(0)
             self.refresh_award_list()
 
-    def get_current_award_data_from_web(self, user: str, award: str, username: str) -> dict:
-        """Retrieve current point balance by user and award.
-
-        :param user: name of the current user
-        :param award: award program name
-        :param username: username or ID
-        :return: dict output from awards.XYZ.get_balance()
-        """
-        # get award information
-        award_info = self.art_db.get_award_info(award=award)
-        account_info = self.art_db.get_account_info(award=award,
-                                                    user=user,
-                                                    username=username)
-        script = import_module(f"awards.{award_info['script']}")
-        try:
-            return script.get_balance(browser=self.chrome_debug_browser,
-                                      account_info=account_info,
-                                      award_info=award_info)
-        except:
-            # if there is any error, return dummy output
-            return {"balance": 0, "expire_date": None}
+    def schedule_award_list_refresh(self) -> None:
+        """Refresh award overview at the next frame. Requests until then are merged into one refresh."""
+        if self.award_list_redraw is None:
+            self.award_list_redraw = self.win.after(REDRAW_INTERVAL, self.refresh_award_list)
 
     def refresh_award_list(self) -> None:
-        """Refresh award overview"""
+        """Refresh award overview. Only changed rows are updated, so selection and scroll position are kept."""
+        if self.award_list_redraw is not None:
+            self.win.after_cancel(self.award_list_redraw)
+            self.award_list_redraw = None
         award_list = self.art_db.get_all_latest_balances(user=self.combo_owner.get())
-
-        # clear data
-        for item in self.treeview_award_list.get_children():
-            self.treeview_award_list.delete(item)
-
-        # add data
+        rows = []
         for category in award_list:
-            self.treeview_award_list.insert(
-                '', 'end', values=[f"[ {category} ]", "", "", "", ""])
+            rows.append((("category", category), [f"[ {category} ]", "", "", "", ""]))
             for award_info in award_list[category]:
-                self.treeview_award_list.insert('', 'end', values=award_info)
+                rows.append(((award_info[0], award_info[1]), award_info))
+
+        # remove rows which are gone
+        keys = {key for key, _ in rows}
+        for key in [key for key in self.award_list_rows if key not in keys]:
+            self.treeview_award_list.delete(self.award_list_rows.pop(key)[0])
+        # order of shown items, kept in step with Treeview so that only changes call Tk
+        items = list(self.treeview_award_list.get_children())
+        for index, (key, values) in enumerate(rows):
+            if key not in self.award_list_rows:
+                item = self.treeview_award_list.insert('', index, values=values)
+                self.award_list_rows[key] = [item, values]
+                items.insert(index, item)
+                continue
+            item, shown_values = self.award_list_rows[key]
+            if shown_values != values:
+                self.treeview_award_list.item(item, values=values)
+                self.award_list_rows[key][1] = values
+            if items[index] != item:
+                self.treeview_award_list.move(item, '', index)
+                items.remove(item)
+                items.insert(index, item)
 
     def on_closing(self) -> None:
         """Event: close ART application."""
+        self.refresher.close()
+        if self.trace_file != "":
+            print(f"DEBUG MODE >> Saved {tracer.save(self.trace_file)} trace spans to {self.trace_file}")
         self.art_db.close()
-        self.playwright.stop()
         # close Chrome browser
-        self.chrome_process.terminate()
-        self.chrome_process.wait()
+        self.chrome_thread.join()
+        if self.chrome_process is not None:
+            self.chrome_process.terminate()
+            self.chrome_process.wait()
         self.win.destroy()
 
     def on_export_to_excel(self) -> None:
-        """Event: export data to Excel"""
-        pass
+        """Event: export accounts and balance history to Excel or CSV in the background."""
+        if getattr(self, "export", None) is not None and not self.export.finished:
+            messagebox.showinfo(title="Export", message="Export is in progress.")
+            return
+        owner = self.combo_owner.get()
+        all_owners = messagebox.askyesnocancel(title="Export",
+                                               message="Export all owners?\n"
+                                                       f"(No: {owner or 'current owner'} only)")
+        if all_owners is None or (not all_owners and owner == ""):
+            return
+        path = filedialog.asksaveasfilename(parent=self.win,
+                                            defaultextension=".xlsx",
+                                            filetypes=[("Excel", "*.xlsx"), ("CSV", "*.csv")])
+        if not path:
+            return
+        from art_export import BackgroundExport
+
+        self.export = BackgroundExport(art_db=self.art_db, path=path, user=None if all_owners else owner)
+        self.export_status = "Exporting..."
+        self.export.start()
+        self.update_status_bar()
+        self.win.after(POLL_INTERVAL, self.poll_export)
+
+    def poll_export(self) -> None:
+        """Show progress of the export, then check again after POLL_INTERVAL until it ends."""
+        events = self.export.poll()
+        for event in events:
+            if event["event"] == "progress":
+                self.export_status = (f"Exporting: {event['accounts_done']}/{event['accounts']} accounts, "
+                                      f"{event['rows']} rows")
+            elif event["event"] == "finished":
+                self.export_status = None
+                messagebox.showinfo(title="Export",
+                                    message=f"Exported {event['accounts']} accounts ({event['rows']} rows) "
+                                            f"in {event['elapsed']:.1f} seconds.\n{event['path']}")
+            elif event["event"] == "failed":
+                self.export_status = None
+                messagebox.showerror(title="Export", message=f"Export failed: {event['error']}")
+        if len(events) > 0:
+            self.update_status_bar()
+        if not self.export.finished:
+            self.win.after(POLL_INTERVAL, self.poll_export)
 
     def on_add_user(self) -> None:
         """Event: add a user."""
@@ -323,6 +434,8 @@ class ART(object):
         if owner is None or owner == '':
             messagebox.showerror(title="No User Error", message="Please add a user before adding an award program.")
             return
+        from popups.add_award import AddAward
+
         popup = AddAward(parent=self.win, art_db=self.art_db, owner=owner)
         account_info = popup.show()
         if account_info is not None:
@@ -335,15 +448,8 @@ class ART(object):
                                        award=award,
                                        username=username,
                                        account_info=account_info):
-                crawled_award_data = self.get_current_award_data_from_web(
-                    user=owner, username=username, award=award
-                )
-                self.art_db.add_balance(user=owner,
-                                        award=award,
-                                        username=username,
-                                        balance=crawled_award_data["balance"],
-                                        expire_date=crawled_award_data["expire_date"])
-                self.refresh_award_list()
+                self.refresher.submit(user=owner, award=award, username=username)
+                self.update_status_bar()
             else:
                 messagebox.showerror(title="Account Exists",
                                      message=f"{award} account for {owner} already exists.")
@@ -354,10 +460,14 @@ class ART(object):
 
     def on_open_settings_window(self) -> None:
         """Event: open setting window."""
+        from popups.settings import Settings
+
         Settings(parent=self.win, art_db=self.art_db)
 
     def show_note_of_day(self) -> None:
         """Show note of the day popup"""
+        from popups.note_of_day import NoteOfDay
+
         NoteOfDay(parent=self.win, art_db=self.art_db)
         self.art_db.set_config("last_day_note_opened", date.today().strftime("%Y-%m-%d"))
 
@@ -368,43 +478,185 @@ class ART(object):
 
     def on_show_about(self) -> None:
         """Event: open about window."""
+        import webbrowser
+
         webbrowser.open("https://github.com/shilph/art")
 
     def on_owner_changed(self, event) -> None:
         """Event: selected owner is changed."""
         pass
 
+    def get_selected_account(self) -> tuple | None:
+        """Get the account shown in award detail.
+
+        :return: (user, award, username) or None if no account is selected
+        """
+        if getattr(self, "selected_award_details", None) is None:
+            return None
+        username = self.selected_award_details[self.selected_award_details["required_field_names"][0]]
+        return self.combo_owner.get(), self.entry_award_program.get(), username
+
     def on_update_award_program(self) -> None:
-        """Event: update an award program."""
+        """Event: update an award program in the background."""
+        account = self.get_selected_account()
+        if account is None:
+            return
+        owner, award, username = account
+        if not self.art_db.get_award_info(award=award)["has_script"]:
+            messagebox.showinfo(title="Update Award Balance",
+                                message=f"{award} has no award script. Its balance cannot be updated.")
+            return
+        if not self.refresher.submit(user=owner, award=award, username=username):
+            messagebox.showinfo(title="Update Award Balance",
+                                message=f"{award} ({username}) is already being updated.")
+        self.update_status_bar()
+
+    def on_cancel_award_update(self) -> None:
+        """Event: cancel the update of the selected award program."""
+        account = self.get_selected_account()
+        if account is None:
+            return
+        owner, award, username = account
+        self.refresher.cancel(user=owner, award=award, username=username)
+        self.update_status_bar()
+
+    def on_cancel_all_updates(self) -> None:
+        """Event: cancel all queued and running updates."""
+        self.refresher.cancel_all()
+        self.update_status_bar()
+
+    def on_update_all_balances(self) -> None:
+        """Event: update all award programs of the current owner."""
         owner = self.combo_owner.get()
-        award = self.entry_award_program.get()
-        username = self.selected_award_details[
-            self.selected_award_details["required_field_names"][0]]
-        crawled_award_data = self.get_current_award_data_from_web(
-            user=owner, award=award, username=username
+        if owner is None or owner == '':
+            messagebox.showerror(title="No User Error", message="Please add a user before updating balances.")
+            return
+        self.update_all_balances(user=owner)
+
+    def on_update_all_owners_balances(self) -> None:
+        """Event: update all award programs of all owners."""
+        self.update_all_balances(user=None)
+
+    def update_all_balances(self, user: str | None) -> None:
+        """Queue all award programs to concurrent award scripts. The elapsed time is shown when all are done.
+
+        :param user: name of user. If user is None, update all users
+        """
+        accounts = self.art_db.get_accounts(user=user)
+        batch = {"started": time.perf_counter(), "accounts": 0}
+        for account in accounts:
+            if self.refresher.submit(user=account["user"],
+                                     award=account["award"],
+                                     username=account["username"],
+                                     batch=batch):
+                batch["accounts"] += 1
+        if len(accounts) > 0 and batch["accounts"] == 0:
+            messagebox.showinfo(title="Update All Balances",
+                                message="All accounts are already being updated (or have no award script).")
+        self.update_status_bar()
+
+    def poll_refresher(self) -> None:
+        """Handle results of background balance updates and submit scheduled updates, then check again after
+        POLL_INTERVAL.
+        """
+        try:
+            events = self.refresher.poll(on_prompt=self.ask_for_award_script)
+            self.scheduler.record(events)
+            scheduled = self.scheduler.tick()
+        finally:
+            self.win.after(POLL_INTERVAL, self.poll_refresher)
+        finished = [event for event in events if event["event"] in ["finished", "cancelled"]]
+        if any(not event["cancelled"] for event in finished):
+            self.schedule_award_list_refresh()
+            selected_account = self.get_selected_account()
+            if selected_account in [BackgroundRefresher.get_key(event["job"]) for event in finished]:
+                self.update_balance_history(*selected_account)
+        for event in finished:
+            batch = event["job"]["batch"]
+            if batch is not None and batch["remaining"] == 0 and not batch.get("reported", False):
+                batch["reported"] = True
+                self.show_update_all_report(batch=batch)
+        if len(events) > 0 or scheduled:
+            self.update_status_bar()
+
+    def ask_for_award_script(self, title: str, message: str) -> str | None:
+        """Ask input of an award script running in the background (i.e. passcode).
+
+        :param title: title of dialog
+        :param message: message of dialog
+        :return: user entered text or None if cancelled
+        """
+        return simpledialog.askstring(title=title, prompt=message, parent=self.win)
+
+    def show_update_all_report(self, batch: dict) -> None:
+        """Show the elapsed time of Update All Balances.
+
+        :param batch: {started, accounts, cancelled, failed, unsaved, serial_baseline} of the update
+        """
+        wall_clock = time.perf_counter() - batch["started"]
+        speedup = batch["serial_baseline"] / wall_clock if wall_clock > 0 else 0
+        updated = batch["accounts"] - batch["cancelled"] - batch["failed"] - batch["unsaved"]
+        messagebox.showinfo(
+            title="Update All Balances",
+            message=f"Updated {updated} accounts ({batch['failed']} not updated, {batch['unsaved']} not saved, "
+                    f"{batch['cancelled']} cancelled) in {wall_clock:.1f} seconds.\n"
+                    f"One by one, it would take about {batch['serial_baseline']:.1f} seconds (x{speedup:.1f})."
         )
-        self.art_db.add_balance(user=owner,
-                                award=award,
-                                username=username,
-                                balance=crawled_award_data["balance"],
-                                expire_date=crawled_award_data["expire_date"])
-        self.refresh_award_list()
-        self.update_balance_history(user=owner, award=award, username=username)
+
+    def update_status_bar(self) -> None:
+        """Show running, queued and failed balance updates (and export progress) in the status bar."""
+        status = self.refresher.get_status()
+        texts = []
+        if len(status["running"]) + len(status["queued"]) > 0:
+            running = ", ".join(f"{award} ({user})" for user, award, _ in status["running"])
+            texts.append(f"Updating: {running or '-'} | Queued: {len(status['queued'])}")
+        if len(status["failed"]) > 0:
+            failed = ", ".join(f"{award} ({user}): {result}" for (user, award, _), result in status["failed"].items())
+            texts.append(f"Not updated: {failed}")
+        if getattr(self, "export_status", None) is not None:
+            texts.append(self.export_status)
+        self.status_text.set(" | ".join(texts) or "Ready")
 
     def update_balance_history(self, user: str, award: str, username: str) -> None:
-        """Update balance history to award detail page.
+        """Update balance history to award detail page. Only the first page is read (see load_balance_history).
 
         :param user: name of user
         :param award: award program
         :param username: username or ID
         """
+        self.treeview_balance_history.delete(*self.treeview_balance_history.get_children())
+        self.history_account = (user, award, username)
+        self.history_before = None
+        self.load_balance_history()
+
+    def load_balance_history(self, page: tuple = None) -> None:
+        """Add the next page of balance history of the shown account.
+
+        :param page: (account, before) the page was requested for. If the shown page changed since, do nothing
+        """
+        if page is not None and page != (self.history_account, self.history_before):
+            return
+        user, award, username = self.history_account
         balance_history = self.art_db.get_balance_history(user=user,
                                                           award=award,
-                                                          username=username)
-        for item in self.treeview_balance_history.get_children():
-            self.treeview_balance_history.delete(item)
+                                                          username=username,
+                                                          limit=HISTORY_PAGE_SIZE,
+                                                          before=self.history_before)
         for balance in balance_history:
             self.treeview_balance_history.insert('', 'end', values=balance)
+        # a short page is the last one
+        self.history_before = balance_history[-1][0] if len(balance_history) == HISTORY_PAGE_SIZE else None
+
+    def on_scroll_balance_history(self, first: str, last: str) -> None:
+        """Event: balance history is scrolled (or its rows changed). Read the next page near the bottom.
+
+        :param first: top of the view (0.0 to 1.0)
+        :param last: bottom of the view (0.0 to 1.0)
+        """
+        self.scrollbar_balance_history.set(first, last)
+        if self.history_before is not None and float(last) >= HISTORY_PAGE_THRESHOLD:
+            # not while Treeview is calling back; one page is requested more than once while scrolling
+            self.win.after_idle(self.load_balance_history, (self.history_account, self.history_before))
 
     def update_readonly_entry(self, entry: tk.Entry, text: str) -> None:
         """Update a READONLY entry.
@@ -0,0 +1,281 @@
+"""Update balances with Playwright async API: many award scripts in one event loop.
+
+An award script is ported to the async engine by adding get_balance_async() next to get_balance():
+
+    async def get_balance_async(browser, account_info: dict, award_info: dict, **kwargs) -> dict:
+        context = kwargs.get("context") or browser.contexts[0]
+        page = await context.new_page()
+        wait = AsyncPageWaiter(page=page, deadline=WAIT_DEADLINE)
+        await page.goto("https://www.example.com")
+        await wait.for_selector("button#login")
+        ...
+
+Award scripts which are not ported yet keep working: AsyncRefresher runs them on the worker threads of
+RefreshWorkerPool (Playwright sync API) and awaits their results, so both kinds run at the same time.
+"""
+import asyncio
+import time
+from functools import partial
+
+from art_db import ARTDatabase
+from art_refresh import RefreshWorkerPool, get_refresh_jobs, get_session_store
+from art_result import STATUS_OK, CircuitBreaker, get_result_async
+from awards._registry import registry
+from awards._resources import ResourceBlocker, get_profile
+from awards._trace import span, tracer
+
+
+def is_async_script(script: str) -> bool:
+    """Check an award script has get_balance_async().
+
+    :param script: name of award script in awards directory
+    :return: True if ported to the async engine
+    """
+    return hasattr(registry.get_module(script), "get_balance_async")
+
+
+async def get_award_data_async(browser, script: str, account_info: dict, award_info: dict, **kwargs) -> dict:
+    """Run an async award script to retrieve the current point balance (traced as a span, see awards._trace).
+    Errors of the award script are raised (see art_result.get_result_async() for retries and statuses).
+
+    :param browser: Chrome debug browser (Playwright async API)
+    :param script: name of award script in awards directory
+    :param account_info: account information from database
+    :param award_info: award information from database
+    :param kwargs: additional arguments for awards.XYZ.get_balance_async() (i.e. context)
+    :return: dict output from awards.XYZ.get_balance_async()
+    """
+    with span("get_balance", script=script):
+        return await registry.get_module(script).get_balance_async(browser=browser,
+                                                                   account_info=account_info,
+                                                                   award_info=award_info,
+                                                                   **kwargs)
+
+
+class AsyncRefresher(object):
+    """Run award scripts concurrently in one event loop.
+
+    Ported scripts (get_balance_async) run in a new browser context each, at most concurrency at a time.
+    The others are submitted to a RefreshWorkerPool, which is started when the first of them is run.
+    """
+
+    def __init__(self, browser, cdp_url: str, concurrency: int = 4, session_store=None, block_resources: str = "no",
+                 on_prompt=None):
+        """Initial function.
+
+        :param browser: Chrome debug browser (Playwright async API) connected to cdp_url
+        :param cdp_url: Chrome debug URL, i.e. http://localhost:12345 (for worker threads of unported scripts)
+        :param concurrency: number of concurrent pages of ported scripts and of worker threads
+        :param session_store: saved log in sessions (unported scripts only, see RefreshWorkerPool)
+        :param block_resources: "yes", "measure" or "no" (see RefreshWorkerPool)
+        :param on_prompt: optional callback(title, message) -> answer for unported scripts asking input
+        """
+        self.browser = browser
+        self.cdp_url = cdp_url
+        self.concurrency = max(1, concurrency)
+        self.session_store = session_store
+        self.block_resources = block_resources
+        self.on_prompt = on_prompt
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        # shared with the worker pool: failures of both engines pause an award program
+        self.breaker = CircuitBreaker()
+        self._pool = None
+        self._pool_futures = {}
+        self._pool_dispatcher = None
+
+    async def run(self, job: dict) -> dict:
+        """Run the award script of a job.
+
+        :param job: {user, award, username, account_info, award_info}
+        :return: {job, award_data, elapsed}
+        """
+        if is_async_script(job["award_info"]["script"]):
+            return await self._run_async(job)
+        return await self._run_in_pool(job)
+
+    async def _run_async(self, job: dict) -> dict:
+        """Run a ported award script (with retries, a new browser context for each attempt).
+
+        :param job: {user, award, username, account_info, award_info}
+        :return: {job, award_data, elapsed}
+        """
+        async with self._semaphore:
+            started = time.perf_counter()
+            award_data = await get_result_async(attempt=partial(self._attempt, job),
+                                                script=job["award_info"]["script"],
+                                                breaker=self.breaker)
+            return {"job": job, "award_data": award_data, "elapsed": time.perf_counter() - started}
+
+    async def _attempt(self, job: dict, prompt) -> dict:
+        """Run a ported award script once in a new browser context (traced, see awards._trace). Errors of the award
+        script are raised.
+
+        :param job: {user, award, username, account_info, award_info}
+        :param prompt: not used (ported award scripts do not ask input)
+        :return: award_data
+        """
+        with tracer.account(program=job["award"], account=job["username"]):
+            script = job["award_info"]["script"]
+            with span("new context"):
+                context = await self.browser.new_context()
+                blocker = None
+                profile = get_profile(award_script=registry.get_module(script))
+                if self.block_resources in ["yes", "measure"] and profile is not None:
+                    blocker = ResourceBlocker(profile=profile, dry_run=self.block_resources == "measure")
+                    await blocker.attach_async(context)
+            try:
+                award_data = await get_award_data_async(browser=self.browser,
+                                                        script=script,
+                                                        account_info=job["account_info"],
+                                                        award_info=job["award_info"],
+                                                        context=context)
+                if blocker is not None:
+                    award_data["resources"] = blocker.report()
+                return award_data
+            finally:
+                with span("close context"):
+                    await context.close()
+
+    async def _run_in_pool(self, job: dict) -> dict:
+        """Compatibility shim: run an unported award script on a worker thread and await its result.
+
+        :param job: {user, award, username, account_info, award_info}
+        :return: {job, award_data, elapsed}
+        """
+        if self._pool is None:
+            self._pool = RefreshWorkerPool(cdp_url=self.cdp_url,
+                                           workers=self.concurrency,
+                                           session_store=self.session_store,
+                                           block_resources=self.block_resources,
+                                           breaker=self.breaker)
+            self._pool_dispatcher = asyncio.create_task(self._dispatch_pool_events())
+        future = asyncio.get_running_loop().create_future()
+        self._pool_futures[id(job)] = future
+        self._pool.submit(job)
+        return await future
+
+    async def _dispatch_pool_events(self) -> None:
+        """Resolve futures of unported scripts from the events of the worker pool until the pool is closed."""
+        while True:
+            event = await asyncio.to_thread(self._pool.events.get)
+            if event["event"] == "closed":
+                break
+            if event["event"] == "prompt":
+                answer = None if self.on_prompt is None else self.on_prompt(event["title"], event["message"])
+                event["answer"].put(answer)
+            if event["event"] != "finished":
+                continue
+            future = self._pool_futures.pop(id(event["job"]))
+            future.set_result({"job": event["job"], "award_data": event["award_data"], "elapsed": event["elapsed"]})
+
+    async def close(self) -> None:
+        """Stop worker threads of unported scripts (if started)."""
+        if self._pool is None:
+            return
+        await asyncio.to_thread(self._pool.close)
+        self._pool.events.put({"event": "closed"})
+        await self._pool_dispatcher
+
+
+async def refresh_balances_async(art_db: ARTDatabase, cdp_url: str, user: str = None, concurrency: int = None,
+                                 on_result=None, on_prompt=None, accounts: [dict] = None) -> dict:
+    """Update balances of all accounts of a user (or all users) in one event loop.
+
+    Balances are written to the database (add_balance) as each award script finishes; failed updates are not.
+
+    :param art_db: ART database
+    :param cdp_url: Chrome debug URL, i.e. http://localhost:12345
+    :param user: name of user. If user is None, all accounts of all users
+    :param concurrency: number of concurrent pages. If None, use Configs.refresh_concurrency
+    :param on_result: optional callback(job, award_data) called after each update (award_data has status)
+    :param on_prompt: optional callback(title, message) -> answer for award scripts asking input (i.e. passcode)
+    :param accounts: list of {user, award, username} to update instead of all accounts of user
+    :return: {accounts, concurrency, wall_clock, serial_baseline, speedup, failed, unsaved, results}
+             (see refresh_all_balances)
+             results have async (True if the script ran on the async engine)
+    """
+    from playwright.async_api import async_playwright
+
+    configs = art_db.get_configs()
+    if concurrency is None:
+        concurrency = int(configs["refresh_concurrency"]["conf_value"])
+    jobs = get_refresh_jobs(art_db=art_db, user=user, accounts=accounts)
+    started = time.perf_counter()
+    results = []
+    if len(jobs) > 0:
+        async with async_playwright() as playwright:
+            browser = await playwright.chromium.connect_over_cdp(cdp_url)
+            refresher = AsyncRefresher(browser=browser,
+                                       cdp_url=cdp_url,
+                                       concurrency=min(concurrency, len(jobs)),
+                                       session_store=get_session_store(art_db=art_db),
+                                       block_resources=configs["block_resources"]["conf_value"].strip().lower(),
+                                       on_prompt=on_prompt)
+            try:
+                for task in asyncio.as_completed([refresher.run(job) for job in jobs]):
+                    output = await task
+                    job = output["job"]
+                    award_data = output["award_data"]
+                    saved = False
+                    # a failed update keeps the last balance
+                    if award_data["status"] == STATUS_OK:
+                        try:
+                            art_db.add_balance(user=job["user"],
+                                               award=job["award"],
+                                               username=job["username"],
+                                               balance=award_data["balance"],
+                                               expire_date=award_data["expire_date"])
+                            saved = True
+                        except Exception as e:
+                            print(f"Could not save the balance of {job['award']} ({job['username']}): {e}")
+                    results.append({
+                        "user": job["user"],
+                        "award": job["award"],
+                        "username": job["username"],
+                        "status": award_data["status"],
+                        "error": award_data["error"],
+                        "attempts": award_data["attempts"],
+                        "balance": award_data["balance"],
+                        "saved": saved,
+                        "elapsed": output["elapsed"],
+                        "resources": award_data.get("resources"),
+                        "async": is_async_script(job["award_info"]["script"])
+                    })
+                    if on_result is not None:
+                        on_result(job, award_data)
+            finally:
+                await refresher.close()
+    wall_clock = time.perf_counter() - started
+    serial_baseline = sum(result["elapsed"] for result in results)
+    return {
+        "accounts": len(jobs),
+        "concurrency": concurrency,
+        "wall_clock": wall_clock,
+        "serial_baseline": serial_baseline,
+        "speedup": serial_baseline / wall_clock if wall_clock > 0 else 0,
+        "failed": sum(1 for result in results if result["status"] != STATUS_OK),
+        "unsaved": sum(1 for result in results if result["status"] == STATUS_OK and not result["saved"]),
+        "results": results
+    }
+
+
+def refresh_all_balances_async(art_db: ARTDatabase, cdp_url: str, user: str = None, concurrency: int = None,
+                               on_result=None, on_prompt=None, accounts: [dict] = None) -> dict:
+    """Blocking entry point of refresh_balances_async(): run it in a new event loop (art_cli.py refresh --engine async).
+
+    :param art_db: ART database
+    :param cdp_url: Chrome debug URL, i.e. http://localhost:12345
+    :param user: name of user. If user is None, all accounts of all users
+    :param concurrency: number of concurrent pages. If None, use Configs.refresh_concurrency
+    :param on_result: optional callback(job, award_data) called after each update (award_data has status)
+    :param on_prompt: optional callback(title, message) -> answer for award scripts asking input (i.e. passcode)
+    :param accounts: list of {user, award, username} to update instead of all accounts of user
+    :return: see refresh_balances_async()
+    """
+    return asyncio.run(refresh_balances_async(art_db=art_db,
+                                              cdp_url=cdp_url,
+                                              user=user,
+                                              concurrency=concurrency,
+                                              on_result=on_result,
+                                              on_prompt=on_prompt,
+                                              accounts=accounts))
@@ -0,0 +1,179 @@
+"""ART without windows: update balances from a command line (i.e. a nightly cron job or systemd timer).
+
+How to use:
+    python art_cli.py refresh (--owner USER | --all) [--award AWARD] [--due] [--jobs N] [--engine async]
+                              [--cdp-url http://localhost:PORT | --headless] [--output results.json]
+                              [--trace trace.json]
+
+The MySQL password is read from ART_DB_PASSWORD or from a password file (~/.art/password by default) which only its
+owner can read (chmod 600); an SQLite database has no password (see art_db_backend.STORAGE_CONFIG). Chrome is
+attached with --cdp-url or launched (--headless for a server without a display) and closed at the end.
+Award scripts run on worker threads, or with --engine async in one event loop (see art_async).
+
+Award scripts asking a passcode get no answer (there is nobody to type it), so those accounts are not updated;
+use --interactive to type passcodes on the terminal. Results are printed as JSON on stdout and anything else
+(i.e. prints of award scripts) goes to stderr. The exit code is 1 if any account was not updated or its balance
+was not saved (saved of its result is False, i.e. the database was not reachable).
+"""
+import argparse
+import contextlib
+import json
+import os
+import stat
+import sys
+import time
+from random import randint
+from subprocess import Popen
+
+from art_db import ARTDatabase
+from art_db_backend import create_backend, get_storage_config
+
+DB_PASSWORD_ENVIRONMENT = "ART_DB_PASSWORD"
+DB_PASSWORD_FILE = "~/.art/password"
+
+
+def get_db_password(password_file: str = DB_PASSWORD_FILE) -> str:
+    """Get MySQL password from the environment or from a password file.
+
+    :param password_file: file with the password in its first line
+    :return: MySQL password
+    """
+    password = os.environ.get(DB_PASSWORD_ENVIRONMENT)
+    if password:
+        return password
+    path = os.path.expanduser(password_file)
+    if not os.path.isfile(path):
+        raise RuntimeError(f"No MySQL password: set {DB_PASSWORD_ENVIRONMENT} or write it to {path}")
+    # permissions are not checked on Windows (no POSIX mode bits)
+    if os.name == "posix" and os.stat(path).st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+        raise RuntimeError(f"{path} may be read by other users; run chmod 600 {path}")
+    with open(path) as f:
+        return f.readline().rstrip("\n")
+
+
+def open_database() -> ARTDatabase:
+    """Open ART database of the storage config.
+
+    :return: ART database
+    """
+    storage = get_storage_config()
+    password = None if storage["backend"] == "sqlite" else get_db_password()
+    return ARTDatabase(password=password, backend=create_backend(password=password, storage=storage))
+
+
+def ask_on_terminal(title: str, message: str) -> str | None:
+    """Ask input of an award script (i.e. passcode) on the terminal.
+
+    :param title: title of the question
+    :param message: question
+    :return: answer or None if empty
+    """
+    print(f"{title}: {message}", file=sys.stderr)
+    return sys.stdin.readline().strip() or None
+
+
+def refresh(args) -> int:
+    """Update balances of the selected accounts and print the results as JSON.
+
+    :param args: command line arguments
+    :return: exit code
+    """
+    from art_async import refresh_all_balances_async
+    from art_refresh import get_chrome_command, refresh_all_balances, wait_for_cdp
+    from art_scheduler import get_due_accounts
+    from awards._trace import tracer
+
+    timing = {}
+    started = time.perf_counter()
+    art_db = open_database()
+    timing["database"] = time.perf_counter() - started
+    chrome_process = None
+    try:
+        user = None if args.all else args.owner
+        accounts = get_due_accounts(art_db=art_db) if args.due else art_db.get_accounts(user=user)
+        accounts = [
+            account for account in accounts
+            if (user is None or account["user"] == user) and (args.award is None or account["award"] == args.award)
+        ]
+
+        started = time.perf_counter()
+        cdp_url = args.cdp_url
+        if cdp_url is None and len(accounts) > 0:
+            port = randint(10000, 30000)
+            command = get_chrome_command(
+                chrome_executable=art_db.get_configs("chrome_executable")["chrome_executable"]["conf_value"],
+                port=port,
+                headless=args.headless
+            )
+            if command is None:
+                raise RuntimeError("Chrome cannot be launched on this platform; use --cdp-url")
+            chrome_process = Popen(command)
+            cdp_url = f"http://localhost:{port}"
+            if not wait_for_cdp(cdp_url):
+                raise RuntimeError(f"Chrome is not ready at {cdp_url}")
+        timing["chrome"] = time.perf_counter() - started
+
+        if args.trace is not None:
+            tracer.start()
+        refresh_balances = refresh_all_balances_async if args.engine == "async" else refresh_all_balances
+        report = refresh_balances(art_db=art_db,
+                                  cdp_url=cdp_url,
+                                  concurrency=args.jobs,
+                                  on_prompt=ask_on_terminal if args.interactive else None,
+                                  accounts=[{"user": account["user"],
+                                             "award": account["award"],
+                                             "username": account["username"]} for account in accounts])
+    finally:
+        if args.trace is not None:
+            tracer.save(args.trace)
+        art_db.close()
+        if chrome_process is not None:
+            chrome_process.terminate()
+            chrome_process.wait()
+    report["timing"] = timing
+    output = json.dumps(report, indent=2, default=str)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output, file=sys.__stdout__)
+    # not 0 if any account was not updated (see art_result) or its balance is not in the database
+    return 0 if report["failed"] + report["unsaved"] == 0 else 1
+
+
+def main(argv: [str] = None) -> int:
+    """Run a command.
+
+    :param argv: command line arguments. If None, sys.argv
+    :return: exit code
+    """
+    parser = argparse.ArgumentParser(prog="art", description="ART: Automated Rewards Tracker without windows")
+    commands = parser.add_subparsers(dest="command", required=True)
+    refresh_parser = commands.add_parser("refresh", help="update balances")
+    owners = refresh_parser.add_mutually_exclusive_group(required=True)
+    owners.add_argument("--owner", help="update accounts of a user")
+    owners.add_argument("--all", action="store_true", help="update accounts of all users")
+    refresh_parser.add_argument("--award", help="update accounts of an award program only")
+    refresh_parser.add_argument("--due", action="store_true",
+                                help="update only accounts due for an update (Configs.auto_refresh_days)")
+    refresh_parser.add_argument("--jobs", type=int, help="concurrent updates (default: Configs.refresh_concurrency)")
+    refresh_parser.add_argument("--engine", choices=["threads", "async"], default="threads",
+                                help="run award scripts on worker threads or in one event loop (get_balance_async)")
+    refresh_parser.add_argument("--cdp-url", help="attach to a running Chrome, i.e. http://localhost:9222")
+    refresh_parser.add_argument("--headless", action="store_true", help="launch Chrome without a window")
+    refresh_parser.add_argument("--interactive", action="store_true", help="type passcodes on the terminal")
+    refresh_parser.add_argument("--output", help="file to write results (JSON)")
+    refresh_parser.add_argument("--trace", help="file to write phases of updates (Chrome trace JSON)")
+    refresh_parser.set_defaults(run=refresh)
+    args = parser.parse_args(argv)
+
+    # stdout is kept for the results
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            return args.run(args)
+        except RuntimeError as e:
+            print(f"art: {e}", file=sys.stderr)
+            return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,124 +1,172 @@
-import mysql.connector
-from datetime import date
+import re
+import threading
+import time
+from datetime import date, datetime
+
+from art_db_backend import create_backend
+from awards._registry import registry
+
+
+def to_date(value: date | None) -> date | None:
+    """Get the date of a DATE column value. Award scripts may give a datetime (i.e. parsed by datetime.strptime).
+
+    :param value: date, datetime or None
+    :return: date or None
+    """
+    return value.date() if isinstance(value, datetime) else value
 
 
 class ARTDatabase(object):
     """MySQL database wrapper for ART."""
     DEFAULT_DATABASE = "ARTDB"
     AWARD_REQUIRED_FILED_SPLITER = "; ;"
+    # version of tables. An older database is migrated when connected (see migrate_schema())
+    #   1: initial tables
+    #   2: Histories primary key (account_id, updated), Accounts index (user)
+    #   3: LatestBalances (the last Histories record of each account)
+    #   4: AccountFields (one record per account field) and Accounts.login (indexed) replace Accounts.required_values
+    #   5: Awards.has_script (0 for award programs without an award script)
+    #   6: Configs values with backslashes doubled by escaping before bound values are repaired
+    SCHEMA_VERSION = 6
 
     # ART supports 3 reward program categories: CC, airlines & hotels
     AWARD_CATEGORIES = ["Credit Cards", "Airlines", "Hotels"]
-
-    # Information about each supported Award programs. Those data will be stored in Awards table.
-    # Columns: category, award name, expired in months, web crawling script (in awards directory),
-    #          required field names & required field labels
-    # Note: required field names & required field labels may contain more than one field.
-    #       Use AWARD_REQUIRED_FILED_SPLITER to separate.
-    AWARD_PROGRAMS = [
-        [
-            "Credit Cards", "Chase Ultimate Rewards", 0, "", "chase",
-            AWARD_REQUIRED_FILED_SPLITER.join(["username", "password"]),
-            AWARD_REQUIRED_FILED_SPLITER.join(["Username", "Password"])
-        ],
-        [
-            "Credit Cards", "Amex Membership Rewards", 0, "", "amex",
-            AWARD_REQUIRED_FILED_SPLITER.join(["username", "password"]),
-            AWARD_REQUIRED_FILED_SPLITER.join(["Username", "Password"])
-        ],
-        ["Credit Cards", "Bilt", 0, "", "bilt", "email", "Email"],
-        [
-            "Hotels", "Marriott Bonvoy", 24, "", "marriott",
-            AWARD_REQUIRED_FILED_SPLITER.join(["username", "password"]),
-            AWARD_REQUIRED_FILED_SPLITER.join(["Username", "Password"])
-        ],
-        [
-            "Hotels", "Hilton Honors", 24, "", "hilton",
-            AWARD_REQUIRED_FILED_SPLITER.join(["username", "password"]),
-            AWARD_REQUIRED_FILED_SPLITER.join(["Username", "Password"])
-        ],
-        [
-            "Hotels", "Hyatt (World of Hyatt)", 24, "", "hyatt",
-            AWARD_REQUIRED_FILED_SPLITER.join(
-                ["username", "password", "lastname"]),
-            AWARD_REQUIRED_FILED_SPLITER.join(
-                ["Username or Membership Number", "Password", "Last Name"])
-        ],
-        [
-            "Airlines", "Delta Skymiles", 0, "", "delta",
-            AWARD_REQUIRED_FILED_SPLITER.join(["username", "password"]),
-            AWARD_REQUIRED_FILED_SPLITER.join(["Username", "Password"])
-        ],
-        [
-            "Airlines", "United MileagePlus", 0, "", "ua",
-            AWARD_REQUIRED_FILED_SPLITER.join(["username", "password"]),
-            AWARD_REQUIRED_FILED_SPLITER.join(["Username", "Password"])
-        ],
-        [
-            "Airlines", "American Airlines AAdvantage", 24, "", "aa",
-            AWARD_REQUIRED_FILED_SPLITER.join(
-                ["username", "password", "lastname"]),
-            AWARD_REQUIRED_FILED_SPLITER.join(
-                ["Username", "Password", "Last Name"])
-        ],
-        [
-            "Airlines", "Southwest Rapid Rewards", 0, "", "southwest",
-            AWARD_REQUIRED_FILED_SPLITER.join(["username", "password"]),
-            AWARD_REQUIRED_FILED_SPLITER.join(["Username", "Password"])
-        ],
-        [
-            "Airlines", "Alaska Airlines Mileage Plan", 0, "", "alaska",
-            AWARD_REQUIRED_FILED_SPLITER.join(["username", "password"]),
-            AWARD_REQUIRED_FILED_SPLITER.join(["Username", "Password"])
-        ],
-        [
-            "Airlines", "Virgin Atlantic Flying Club", 0, "", "virgin_atlantic",
-            AWARD_REQUIRED_FILED_SPLITER.join(["username", "password"]),
-            AWARD_REQUIRED_FILED_SPLITER.join(["Username", "Password"])
-        ],
-        [
-            "Airlines", "Korean Air SkyPass", 120, "", "korean_air",
-            AWARD_REQUIRED_FILED_SPLITER.join(["username", "password"]),
-            AWARD_REQUIRED_FILED_SPLITER.join(["Username", "Password"])
-        ],
-        [
-            "Airlines", "Avianca LifeMiles", 12,
-            "Expire in 24 months for elite members or accrued via a co-branded card.",
-            "avianca",
-            AWARD_REQUIRED_FILED_SPLITER.join(["username", "password"]),
-            AWARD_REQUIRED_FILED_SPLITER.join(["Username", "Password"])
-        ],
-    ]
+    # Award programs are described by their award scripts (AWARD_PROGRAM in awards/XYZ.py) and synced to Awards
+    # table by sync_award_programs().
 
     # configurations/settings
     CONFIGS = [
-        ["chrome_executable", "Chrome Executable Link", r"C:\\Program Files\\Google\\Chrome\\Application\\chrome.exe"],
+        ["chrome_executable", "Chrome Executable Link", r"C:\Program Files\Google\Chrome\Application\chrome.exe"],
         ["art_blog_link", "", "https://automatedrewardstracker.blogspot.com/"],
-        ["last_day_note_opened", "", date.today()]
+        ["last_day_note_opened", "", date.today()],
+        ["refresh_concurrency", "Concurrent Balance Updates", "4"],
+        ["session_cache", "Keep Logged In Between Updates (yes/no)", "no"],
+        ["session_directory", "Logged In Session Directory", "~/.art/sessions"],
+        ["block_resources", "Block Images/Fonts/Ads While Updating (yes/no/measure)", "yes"],
+        ["auto_refresh", "Update Balances Automatically (yes/no)", "no"],
+        ["auto_refresh_days", "Update Automatically Every N Days (i.e. 7; Marriott Bonvoy=3)", "7"],
+        ["auto_refresh_budget", "Automatic Update Time Limit per Run (minutes)", "10"],
+        ["trace_file", "Save Update Traces to (Chrome trace JSON, empty for no traces)", ""]
     ]
 
-    def __init__(self, password: str):
-        """Initial function. Connected to the local MySQL.
-
-        :param password: password to connect to the MySQL
+    # Histories table (table name is a parameter for migration)
+    HISTORIES_TABLE = (
+        "CREATE TABLE {table} ("
+        "   account_id INT NOT NULL,"
+        "   balance INT NOT NULL,"
+        "   updated DATE NOT NULL,"
+        "   PRIMARY KEY (account_id, updated),"
+        "   FOREIGN KEY (account_id) REFERENCES Accounts(id)"
+        ")"
+    )
+
+    # LatestBalances table: one record per account
+    LATEST_BALANCES_TABLE = (
+        "CREATE TABLE LatestBalances ("
+        "   account_id INT NOT NULL PRIMARY KEY,"
+        "   balance INT NOT NULL,"
+        "   updated DATE NOT NULL,"
+        "   FOREIGN KEY (account_id) REFERENCES Accounts(id)"
+        ")"
+    )
+
+    # AccountFields table: one record per required field of an account (i.e. username, password)
+    ACCOUNT_FIELDS_TABLE = (
+        "CREATE TABLE AccountFields ("
+        "   account_id INT NOT NULL,"
+        "   field_name VARCHAR(50) NOT NULL,"
+        "   field_value VARCHAR(200) NOT NULL,"
+        "   PRIMARY KEY (account_id, field_name),"
+        "   FOREIGN KEY (account_id) REFERENCES Accounts(id)"
+        ")"
+    )
+
+    def __init__(self, password: str = None, database: str = DEFAULT_DATABASE, backend=None):
+        """Initial function. Connected to the local MySQL or to an SQLite file (see art_db_backend.STORAGE_CONFIG).
+
+        ARTDatabase may be used by more than one thread (i.e. award script workers): every thread has its own
+        connection (see MySQLBackend and SQLiteBackend).
+
+        :param password: password to connect to the MySQL (not used by SQLite)
+        :param database: name of database (i.e. a separate database for benchmarks)
+        :param backend: storage backend. If None, the backend of the storage config
         """
+        self.database = database
+        # Configs, Awards and Categories rows, read once (see _get_metadata())
+        self._metadata = None
+        self._metadata_lock = threading.Lock()
+        # metadata reads served from memory (hits) or from the database (misses)
+        self.cache_stats = {"hits": 0, "misses": 0}
         # TODO: may need to change connection to non-root user
-        try:
-            self.connection = mysql.connector.connect(
-                host="localhost", user="root", password=password)
-        except mysql.connector.errors.ProgrammingError:
-            raise RuntimeError("Incorrect password")
-        self.cursor = self.connection.cursor()
-        self.cursor.execute(f"SHOW DATABASES LIKE '{self.DEFAULT_DATABASE}'")
-        if self.cursor.fetchone() is None:
+        self.db = create_backend(password=password) if backend is None else backend
+        if not self.db.database_exists(self.database):
             self.create_art_database()
         else:
-            self.cursor.execute(f"USE {self.DEFAULT_DATABASE}")
+            self.db.select_database(self.database)
+            self.migrate_schema()
+            self.add_missing_configs()
+            self.sync_award_programs()
+
+    def _get_metadata(self) -> dict:
+        """Get Configs, Awards and Categories. They are read from the database at the first call after
+        invalidate_metadata() and kept in memory: they change only by set_config() or schema/seed changes.
+
+        :return: {configs: {conf_key: {conf_label, conf_value}},
+                  awards: {award: {id, category, expire, note, script, required_field_names,
+                                   required_field_displays, has_script}},
+                  award_program_names: ["category: award" ...]}
+        """
+        metadata = self._metadata
+        if metadata is not None:
+            self.cache_stats["hits"] += 1
+            return metadata
+        with self._metadata_lock:
+            if self._metadata is not None:
+                self.cache_stats["hits"] += 1
+                return self._metadata
+            self.cache_stats["misses"] += 1
+            configs = {}
+            for conf_key, conf_label, conf_value in self.db.fetchall(
+                    "SELECT conf_key, conf_label, conf_value FROM Configs"):
+                configs[conf_key] = {"conf_label": conf_label, "conf_value": conf_value}
+            awards = {}
+            for award_id, category, award, expire, note, script, names, displays, has_script in self.db.fetchall(
+                    "SELECT A.id, C.category, A.award, A.expire, A.note, A.script, "
+                    "  A.required_field_names, A.required_field_displays, A.has_script "
+                    "FROM Awards A JOIN Categories C ON A.category_id = C.id "
+                    "ORDER BY C.category, A.award"):
+                awards[award] = {
+                    "id": award_id,
+                    "category": category,
+                    "expire": expire,
+                    "note": note,
+                    "script": script,
+                    "required_field_names": names.split(self.AWARD_REQUIRED_FILED_SPLITER),
+                    "required_field_displays": displays.split(self.AWARD_REQUIRED_FILED_SPLITER),
+                    "has_script": bool(has_script)
+                }
+            self._metadata = {
+                "configs": configs,
+                "awards": awards,
+                # award programs which accounts can be added to
+                "award_program_names": [
+                    f"{info['category']}: {award}" for award, info in awards.items() if info["has_script"]
+                ]
+            }
+            return self._metadata
+
+    def invalidate_metadata(self) -> None:
+        """Drop cached Configs, Awards and Categories; the next read loads them again."""
+        with self._metadata_lock:
+            self._metadata = None
 
     def close(self) -> None:
         """Disconnect MySQL database"""
-        self.cursor.close()
-        self.connection.close()
+        self.db.close()
+
+    def release_connection(self) -> None:
+        """Return the connection of the current thread (i.e. a worker thread which is ending)."""
+        self.db.release()
 
     def create_art_database(self) -> None:
         """Add ART database and tables.
@@ -128,12 +176,13 @@ class ARTDatabase(object):
             * Categories: Reward program categories
             * Awards: Reward types and information
             * Accounts: Individual user account per reward program
+            * AccountFields: Required field values of each account (Award.required_field_names)
             * Histories: Reward points histories
+            * LatestBalances: The last Histories record of each account (kept by add_balance)
         """
-        self.cursor.execute(f"CREATE DATABASE {self.DEFAULT_DATABASE}")
-        self.cursor.execute(f"USE {self.DEFAULT_DATABASE}")
+        self.db.create_database(self.database)
         # Configuration
-        self.cursor.execute(
+        self.db.execute_ddl(
             "CREATE TABLE Configs ("
             "   conf_key VARCHAR(50) NOT NULL UNIQUE,"
             "   conf_label VARCHAR(100),"
@@ -141,71 +190,250 @@ class ARTDatabase(object):
             ")"
         )
         # Award program category: index, category type (credit cards, airlines, hotels..)
-        self.cursor.execute(
+        self.db.execute_ddl(
             "CREATE TABLE Categories ("
-            "   id INT AUTO_INCREMENT PRIMARY KEY,"
+            f"   {self.db.AUTO_ID},"
             "   category VARCHAR(25) NOT NULL UNIQUE"
             ")"
         )
         # Award program: index, category index, award program name, points expired in months (0 for not expire),
         #                additional note, script to crawl data, required field variable names,
         #                required field variable labels
-        self.cursor.execute(
+        self.db.execute_ddl(
             "CREATE TABLE Awards ("
-            "   id INT AUTO_INCREMENT PRIMARY KEY,"
+            f"   {self.db.AUTO_ID},"
             "   category_id INT NOT NULL,"
             "   award VARCHAR(50) NOT NULL UNIQUE,"
             "   expire INT NOT NULL, note VARCHAR(100),"
             "   script VARCHAR(20),"
             "   required_field_names VARCHAR(200) NOT NULL,"
             "   required_field_displays VARCHAR(200) NOT NULL,"
+            "   has_script INT NOT NULL DEFAULT 1,"
             "   FOREIGN KEY (category_id) REFERENCES Categories(id)"
             ")"
         )
-        # Account: index, award index, name of a user, required field variable values for Award.required_field_names,
+        # Account: index, award index, name of a user, login (value of the first required field, i.e. username),
         #          expected expire date of this reward
-        self.cursor.execute(
+        self.db.execute_ddl(
             "CREATE TABLE Accounts ("
-            "   id INT AUTO_INCREMENT PRIMARY KEY,"
+            f"   {self.db.AUTO_ID},"
             "   award_id INT NOT NULL,"
             "   user VARCHAR(30) NOT NULL,"
-            "   required_values VARCHAR(200) NOT NULL,"
+            "   login VARCHAR(200) NOT NULL,"
             "   expected_expire DATE DEFAULT NULL,"
             "   FOREIGN KEY (award_id) REFERENCES Awards(id)"
             ")"
         )
+        self.db.execute_ddl("CREATE INDEX idx_accounts_user ON Accounts (user)")
+        # account lookups by award, user and login
+        self.db.execute_ddl("CREATE INDEX idx_accounts_login ON Accounts (award_id, user, login)")
+        # Account field: account index, field name (Award.required_field_names), field value
+        self.db.execute_ddl(self.ACCOUNT_FIELDS_TABLE)
         # Balance history: account index, point balance, date added
-        self.cursor.execute(
-            "CREATE TABLE Histories ("
-            "   account_id INT NOT NULL,"
-            "   balance INT NOT NULL,"
-            "   updated DATE NOT NULL,"
-            "   FOREIGN KEY (account_id) REFERENCES Accounts(id)"
-            ")"
+        # one record per account/date; the primary key also serves the latest balance and history queries
+        self.db.execute_ddl(self.HISTORIES_TABLE.format(table="Histories"))
+        # Latest balance: account index, point balance, date added. Overview reads it instead of Histories
+        self.db.execute_ddl(self.LATEST_BALANCES_TABLE)
+        with self.db.transaction():
+            # add configs
+            self.db.executemany(
+                "INSERT INTO Configs (conf_key, conf_label, conf_value) VALUES (%s, %s, %s)",
+                [[conf_key, conf_label, str(conf_value)] for conf_key, conf_label, conf_value in self.CONFIGS]
+            )
+            self._set_schema_version(self.SCHEMA_VERSION)
+            # add award categories
+            self.db.executemany("INSERT INTO Categories (category) VALUES (%s)",
+                                [[category] for category in self.AWARD_CATEGORIES])
+        self.invalidate_metadata()
+        # add award programs of award scripts
+        self.sync_award_programs(force=True)
+
+    def get_schema_version(self) -> int:
+        """Get version of tables. Databases created before versioning have no Configs.schema_version.
+
+        :return: schema version
+        """
+        result = self.db.fetchone("SELECT conf_value FROM Configs WHERE conf_key = 'schema_version'")
+        return 1 if result is None else int(result[0])
+
+    def _set_schema_version(self, version: int) -> None:
+        """Record version of tables (hidden config).
+
+        :param version: schema version
+        """
+        self._set_hidden_config(conf_key="schema_version", conf_value=str(version))
+
+    def _set_hidden_config(self, conf_key: str, conf_value: str) -> None:
+        """Add or change a config which is not shown in Settings (no label).
+
+        :param conf_key: Configs.conf_key
+        :param conf_value: Configs.conf_value
+        """
+        if self.db.dialect == "sqlite":
+            upsert = "ON CONFLICT (conf_key) DO UPDATE SET conf_value = excluded.conf_value"
+        else:
+            upsert = "ON DUPLICATE KEY UPDATE conf_value = VALUES(conf_value)"
+        self.db.execute(
+            f"INSERT INTO Configs (conf_key, conf_label, conf_value) VALUES (%s, '', %s) {upsert}",
+            [conf_key, conf_value]
         )
-        # add configs
-        for conf_key, conf_label, conf_value in self.CONFIGS:
-            self.cursor.execute(
-                f"INSERT INTO Configs (conf_key, conf_label, conf_value) "
-                f"VALUES ('{conf_key}', '{conf_label}', '{conf_value}')"
+
+    def migrate_schema(self) -> None:
+        """Migrate tables of an existing database to SCHEMA_VERSION in place. Data are kept.
+
+        SQLite databases are created at a version with Histories primary key (2 or later).
+        """
+        version = self.get_schema_version()
+        if version < 2:
+            # Histories: copy to a table with the primary key (duplicated account/date records are dropped)
+            self.db.execute_ddl(self.HISTORIES_TABLE.format(table="Histories_v2"))
+            self.db.execute(
+                "INSERT IGNORE INTO Histories_v2 (account_id, balance, updated) "
+                "SELECT account_id, balance, updated FROM Histories"
             )
-            self.connection.commit()
-        # add award categories
-        for category in self.AWARD_CATEGORIES:
-            self.cursor.execute(
-                f"INSERT INTO Categories (category) VALUES ('{category}')")
-            self.connection.commit()
-        # add known award programs
-        for category, award, expire, note, script, required_field_names, required_field_displays in self.AWARD_PROGRAMS:
-            self.cursor.execute(
-                f"INSERT INTO Awards ("
-                f"   category_id, award, expire, note, script, required_field_names, required_field_displays"
-                f") VALUES ("
-                f"  (SELECT id FROM Categories WHERE category = '{category}'),"
-                f"  '{award}', {expire}, '{note}', '{script}', '{required_field_names}', '{required_field_displays}'"
-                f")"
+            # swap tables at once; the old table is dropped only after the new one is in place
+            self.db.execute_ddl("RENAME TABLE Histories TO Histories_v1, Histories_v2 TO Histories")
+            self.db.execute_ddl("DROP TABLE Histories_v1")
+            self.db.execute_ddl("CREATE INDEX idx_accounts_user ON Accounts (user)")
+            self._set_schema_version(2)
+        if version < 3:
+            self.db.execute_ddl(self.LATEST_BALANCES_TABLE)
+            self.rebuild_latest_balances()
+            self._set_schema_version(3)
+        if version < 4:
+            self._migrate_account_fields()
+            self._set_schema_version(4)
+        if version < 5:
+            # award programs are flagged by the next sync_award_programs()
+            self.db.execute_ddl("ALTER TABLE Awards ADD COLUMN has_script INT NOT NULL DEFAULT 1")
+            self._set_schema_version(5)
+        if version < 6:
+            self._repair_config_backslashes()
+            self._set_schema_version(6)
+        self.invalidate_metadata()
+
+    def _repair_config_backslashes(self) -> None:
+        """Schema version 6: undo backslashes of Configs values doubled by escaping them before they were bound
+        (every save of Settings doubled them). A run of backslashes is one backslash again, except at the start
+        of a value where it is two (a network path).
+        """
+        repaired = []
+        for conf_key, conf_value in self.db.fetchall("SELECT conf_key, conf_value FROM Configs"):
+            if conf_value is None or "\\\\" not in conf_value:
+                continue
+            value = re.sub(r"(?<=.)\\+", r"\\", conf_value)
+            value = re.sub(r"^\\{2,}", r"\\\\", value)
+            repaired.append([value, conf_key])
+        if len(repaired) > 0:
+            self.db.executemany("UPDATE Configs SET conf_value = %s WHERE conf_key = %s", repaired)
+
+    def _migrate_account_fields(self) -> None:
+        """Schema version 4: split Accounts.required_values into AccountFields and Accounts.login.
+
+        Only ALTER TABLE ADD/DROP COLUMN and CREATE INDEX are used, which both MySQL and SQLite support.
+        """
+        self.db.execute_ddl("ALTER TABLE Accounts ADD COLUMN login VARCHAR(200) NOT NULL DEFAULT ''")
+        self.db.execute_ddl(self.ACCOUNT_FIELDS_TABLE)
+        rows = self.db.fetchall(
+            "SELECT AC.id, AW.required_field_names, AC.required_values "
+            "FROM Accounts AC JOIN Awards AW ON AC.award_id = AW.id"
+        )
+        fields = []
+        logins = []
+        for account_id, required_field_names, required_values in rows:
+            values = [value.strip() for value in required_values.split(self.AWARD_REQUIRED_FILED_SPLITER)]
+            # accounts were found by the first value
+            logins.append([values[0], account_id])
+            for name, value in zip(required_field_names.split(self.AWARD_REQUIRED_FILED_SPLITER), values):
+                fields.append([account_id, name.strip(), value])
+        with self.db.transaction():
+            if len(fields) > 0:
+                self.db.executemany(
+                    "INSERT INTO AccountFields (account_id, field_name, field_value) VALUES (%s, %s, %s)", fields
+                )
+            if len(logins) > 0:
+                self.db.executemany("UPDATE Accounts SET login = %s WHERE id = %s", logins)
+        self.db.execute_ddl("CREATE INDEX idx_accounts_login ON Accounts (award_id, user, login)")
+        # dropped only after every value is copied
+        self.db.execute_ddl("ALTER TABLE Accounts DROP COLUMN required_values")
+
+    def rebuild_latest_balances(self) -> None:
+        """Fill LatestBalances from Histories (i.e. after Histories is changed without add_balance())."""
+        with self.db.transaction():
+            self.db.execute("DELETE FROM LatestBalances")
+            self.db.execute(
+                "INSERT INTO LatestBalances (account_id, balance, updated) "
+                "SELECT H.account_id, H.balance, H.updated "
+                "FROM Histories H "
+                "JOIN (SELECT account_id, MAX(updated) AS max_date FROM Histories GROUP BY account_id) H2 "
+                "    ON H.account_id = H2.account_id AND H.updated = H2.max_date"
             )
-            self.connection.commit()
+
+    def add_missing_configs(self) -> None:
+        """Add configs introduced after the database was created. Existing values are not changed."""
+        with self.db.transaction():
+            for conf_key, conf_label, conf_value in self.CONFIGS:
+                self.db.execute(
+                    f"{self.db.INSERT_IGNORE} INTO Configs (conf_key, conf_label, conf_value) VALUES (%s, %s, %s)",
+                    [conf_key, conf_label, str(conf_value)]
+                )
+        self.invalidate_metadata()
+
+    def sync_award_programs(self, force: bool = False) -> bool:
+        """Add or update Awards from award scripts (see awards/_registry.py). Award programs which no award script
+        describes (i.e. removed scripts) are kept for their accounts but flagged (Awards.has_script = 0).
+
+        The manifest hash of award scripts is kept in Configs; if it is the same, nothing is read or imported.
+
+        :param force: sync even if the manifest hash is the same
+        :return: True if synced
+        """
+        manifest_hash = registry.get_manifest_hash()
+        manifest = self.get_configs(conf_key="award_manifest")
+        if not force and manifest.get("award_manifest", {}).get("conf_value") == manifest_hash:
+            return False
+        programs = registry.get_programs()
+        existing = {row[0] for row in self.db.fetchall("SELECT award FROM Awards")}
+        described = {program["award"] for program in programs}
+        values = [
+            [
+                program["category"], program["expire"], program["note"], program["script"],
+                self.AWARD_REQUIRED_FILED_SPLITER.join(program["required_field_names"]),
+                self.AWARD_REQUIRED_FILED_SPLITER.join(program["required_field_displays"]),
+                program["award"]
+            ]
+            for program in programs
+        ]
+        with self.db.transaction():
+            self.db.executemany(f"{self.db.INSERT_IGNORE} INTO Categories (category) VALUES (%s)",
+                                [[category] for category in {program["category"] for program in programs}])
+            updates = [value for value in values if value[-1] in existing]
+            if len(updates) > 0:
+                self.db.executemany(
+                    "UPDATE Awards SET "
+                    "  category_id = (SELECT id FROM Categories WHERE category = %s), expire = %s, note = %s, "
+                    "  script = %s, required_field_names = %s, required_field_displays = %s, has_script = 1 "
+                    "WHERE award = %s",
+                    updates
+                )
+            inserts = [value for value in values if value[-1] not in existing]
+            if len(inserts) > 0:
+                self.db.executemany(
+                    "INSERT INTO Awards ("
+                    "   category_id, expire, note, script, required_field_names, required_field_displays, award"
+                    ") VALUES ("
+                    "  (SELECT id FROM Categories WHERE category = %s), %s, %s, %s, %s, %s, %s"
+                    ")",
+                    inserts
+                )
+            flagged = sorted(existing - described)
+            if len(flagged) > 0:
+                self.db.executemany("UPDATE Awards SET has_script = 0 WHERE award = %s", [[award] for award in flagged])
+            self._set_hidden_config(conf_key="award_manifest", conf_value=manifest_hash)
+        self.invalidate_metadata()
+        if len(flagged) > 0:
+            print(f"Award programs without an award script (balances cannot be updated): {', '.join(flagged)}")
+        return True
 
     def get_configs(self, conf_key: str = None) -> dict:
         """Get data from Configs table.
@@ -213,14 +441,13 @@ class ARTDatabase(object):
         :param conf_key: Configs.conf_key to find. If conf_key is null, return all data in Configs
         :return: {conf_key: {conf_label, conf_value} ...}
         """
-        self.cursor.execute(
-            "SELECT conf_key, conf_label, conf_value FROM Configs" +
-            ("" if conf_key is None else f" WHERE conf_key='{conf_key}'")
-        )
-        configs = {}
-        for conf_key, conf_label, conf_value in self.cursor.fetchall():
-            configs[conf_key] = {"conf_label": conf_label, "conf_value": conf_value}
-        return configs
+        configs = self._get_metadata()["configs"]
+        # copies: callers may change them
+        if conf_key is None:
+            return {key: dict(config) for key, config in configs.items()}
+        if conf_key not in configs:
+            return {}
+        return {conf_key: dict(configs[conf_key])}
 
     def set_config(self, conf_key: str = None, conf_value: str = None) -> None:
         """Set a configuration in Configs.
@@ -228,66 +455,57 @@ class ARTDatabase(object):
         :param conf_key: Configs.conf_key to update
         :param conf_value: Configs.conf_key to be updated
         """
-        self.cursor.execute(f"UPDATE Configs SET conf_value = '{conf_value}' WHERE conf_key = '{conf_key}'")
-        self.connection.commit()
+        self.db.execute("UPDATE Configs SET conf_value = %s WHERE conf_key = %s", [str(conf_value), conf_key])
+        self.invalidate_metadata()
 
     def get_users(self) -> [str]:
         """Get name of all users.
 
         :return: name of all users in list
         """
-        self.cursor.execute("SELECT DISTINCT user FROM Accounts")
-        return [row[0] for row in self.cursor.fetchall()]
+        return [row[0] for row in self.db.fetchall("SELECT DISTINCT user FROM Accounts")]
 
     def remove_user(self, user: str) -> None:
         """Remove a user by name. It will remove all award information of the user.
 
         :param user: name of user to remove
         """
-        self.cursor.execute(
-            f"DELETE FROM Histories WHERE account_id IN (SELECT id from Accounts WHERE user = '{user}'"
-        )
-        self.connection.commit()
-        self.cursor.execute(f"DELETE FROM Accounts WHERE user = '{user}'")
-        self.connection.commit()
+        with self.db.transaction():
+            self.db.execute(
+                "DELETE FROM LatestBalances WHERE account_id IN (SELECT id from Accounts WHERE user = %s)", [user]
+            )
+            self.db.execute(
+                "DELETE FROM AccountFields WHERE account_id IN (SELECT id from Accounts WHERE user = %s)", [user]
+            )
+            self.db.execute("DELETE FROM Histories WHERE account_id IN (SELECT id from Accounts WHERE user = %s)",
+                            [user])
+            self.db.execute("DELETE FROM Accounts WHERE user = %s", [user])
 
     def get_award_info(self, award: str) -> dict | None:
         """Get award information by name of award.
 
         :param award: name of award to get
-        :return: {expire, note, script, required_field_names, required_field_displays}
+        :return: {category, expire, note, script, required_field_names, required_field_displays, has_script}
         """
-        self.cursor.execute(
-            "SELECT expire, note, script, required_field_names, required_field_displays "
-            "FROM Awards "
-            f"WHERE award = '{award}'")
-        result = self.cursor.fetchone()
-        if result is None:
+        award_info = self._get_metadata()["awards"].get(award)
+        if award_info is None:
             return None
         return {
-            "expire":
-                result[0],
-            "note":
-                result[1],
-            "script":
-                result[2],
-            "required_field_names":
-                result[3].split(self.AWARD_REQUIRED_FILED_SPLITER),
-            "required_field_displays":
-                result[4].split(self.AWARD_REQUIRED_FILED_SPLITER)
+            "category": award_info["category"],
+            "expire": award_info["expire"],
+            "note": award_info["note"],
+            "script": award_info["script"],
+            "required_field_names": list(award_info["required_field_names"]),
+            "required_field_displays": list(award_info["required_field_displays"]),
+            "has_script": award_info["has_script"]
         }
 
     def get_award_program_names(self) -> [str]:
-        """Get all available award program names.
+        """Get all available award program names (award programs without an award script are not available).
 
         :return: list of award program names
         """
-        self.cursor.execute(
-            "SELECT A.award, C.category "
-            "FROM Awards A JOIN Categories C ON A.category_id = C.id "
-            "ORDER BY C.category, A.award"
-        )
-        return [f"{award[1]}: {award[0]}" for award in self.cursor.fetchall()]
+        return list(self._get_metadata()["award_program_names"])
 
     def _get_award_id(self, award: str):
         """Get award index by award name.
@@ -295,11 +513,10 @@ class ARTDatabase(object):
         :param award: name of award to search
         :return: award index in Award table
         """
-        self.cursor.execute(f"SELECT id FROM Awards WHERE award = '{award}'")
-        result = self.cursor.fetchone()
-        if result is None:
+        award_info = self._get_metadata()["awards"].get(award)
+        if award_info is None:
             raise RuntimeError(f"Could not find an award program: {award}")
-        return result[0]
+        return award_info["id"]
 
     def get_account_info(self, user: str, award: str,
                          username: str) -> dict | None:
@@ -308,27 +525,29 @@ class ARTDatabase(object):
         :param user: name of user
         :param award: name of award program
         :param username: username or ID
-        :return: {id, expected_expire, required_field_names+required_values (split and paired)}
+        :return: {id, expected_expire, required_field_names+field values (paired)}
                  or None if there is no account found
         """
-        self.cursor.execute(
-            f"SELECT AC.id, AW.required_field_names, AC.required_values, AC.expected_expire "
-            f"FROM Accounts AC JOIN Awards AW ON AC.award_id = AW.id "
-            f"WHERE "
-            f"  AC.user = '{user}'"
-            f"  AND AW.award = '{award}'"
-            f"  AND ("
-            f"      AC.required_values LIKE '{username}{self.AWARD_REQUIRED_FILED_SPLITER}%' "
-            f"      OR AC.required_values = '{username}'"
-            f"  )")
-        result = self.cursor.fetchone()
-        if result is None:
+        award_info = self._get_metadata()["awards"].get(award)
+        if award_info is None:
+            return None
+        # the account and its fields at once (an account without fields has one row of NULL fields)
+        results = self.db.fetchall(
+            "SELECT AC.id, AC.expected_expire, F.field_name, F.field_value "
+            "FROM Accounts AC LEFT JOIN AccountFields F ON AC.id = F.account_id "
+            "WHERE AC.award_id = %s AND AC.user = %s AND AC.login = %s",
+            [award_info["id"], user, username]
+        )
+        if len(results) == 0:
             return None
-        account_info = {"id": int(result[0]), "expected_expire": result[3]}
-        for name, value in zip(
-                result[1].split(self.AWARD_REQUIRED_FILED_SPLITER),
-                result[2].split(self.AWARD_REQUIRED_FILED_SPLITER)):
-            account_info[name.strip()] = value.strip()
+        fields = {field_name: field_value for _, _, field_name, field_value in results if field_name is not None}
+        account_info = {"id": int(results[0][0]), "expected_expire": results[0][1]}
+        # fields in the order of the award program
+        for name in award_info["required_field_names"]:
+            name = name.strip()
+            if name in fields:
+                account_info[name] = fields.pop(name)
+        account_info.update(fields)
         return account_info
 
     def _get_account_id(self, award: str, user: str, username: str):
@@ -340,21 +559,54 @@ class ARTDatabase(object):
         :return: Award table index
         """
         award_id = self._get_award_id(award=award)
-        self.cursor.execute(
-            f"SELECT id FROM Accounts "
-            f"WHERE"
-            f"  user = '{user}'"
-            f"  AND award_id = {award_id}"
-            f"  AND ("
-            f"      required_values LIKE '{username}{self.AWARD_REQUIRED_FILED_SPLITER}%' "
-            f"      OR required_values = '{username}'"
-            f"  )"
+        result = self.db.fetchone(
+            "SELECT id FROM Accounts WHERE award_id = %s AND user = %s AND login = %s",
+            [award_id, user, username]
         )
-        result = self.cursor.fetchone()
         if result is None:
             raise RuntimeError(f"Could not find an account for {user} ({award})")
         return result[0]
 
+    def get_accounts(self, user: str = None) -> [dict]:
+        """Get all accounts of a user or of all users.
+
+        :param user: name of user. If user is None, return accounts of all users
+        :return: list of {user, award, username}
+        """
+        if user is None:
+            rows = self.db.fetchall(
+                "SELECT AC.user, AW.award, AC.login "
+                "FROM Accounts AC JOIN Awards AW ON AC.award_id = AW.id "
+                "ORDER BY AC.user, AW.award"
+            )
+        else:
+            rows = self.db.fetchall(
+                "SELECT AC.user, AW.award, AC.login "
+                "FROM Accounts AC JOIN Awards AW ON AC.award_id = AW.id "
+                "WHERE AC.user = %s "
+                "ORDER BY AC.user, AW.award",
+                [user]
+            )
+        return [{"user": account_user, "award": award, "username": login} for account_user, award, login in rows]
+
+    def get_refresh_candidates(self) -> [dict]:
+        """Get accounts which balances can be updated, with the date of their latest balance (see art_scheduler).
+
+        :return: list of {user, award, username, updated, expected_expire}
+                 updated is None if the account has no balance yet; expected_expire is None if it does not expire
+        """
+        rows = self.db.fetchall(
+            "SELECT AC.user, AW.award, AC.login, L.updated, AC.expected_expire "
+            "FROM Accounts AC "
+            "JOIN Awards AW ON AC.award_id = AW.id "
+            "LEFT JOIN LatestBalances L ON AC.id = L.account_id "
+            "WHERE AW.has_script = 1"
+        )
+        return [
+            {"user": user, "award": award, "username": login, "updated": updated, "expected_expire": expected_expire}
+            for user, award, login, updated, expected_expire in rows
+        ]
+
     def add_account(self, user: str, award: str, username: str, account_info: dict) -> bool:
         """Add an account.
 
@@ -365,58 +617,57 @@ class ARTDatabase(object):
         :return: True if added; False if there is an account exists
         """
         award_id = self._get_award_id(award=award)
-        account_info_dict = [
-            account_info[info]
-            for info in account_info
-            if info != "award" and info != "first_field"
+        fields = [
+            [field_name, str(field_value).strip()]
+            for field_name, field_value in account_info.items()
+            if field_name != "award" and field_name != "first_field"
         ]
-        required_values = self.AWARD_REQUIRED_FILED_SPLITER.join(account_info_dict)
         if self.get_account_info(award=award, user=user, username=username) is not None:
             # if there is no account balance, return True (as account added)
             return len(self.get_balance_history(user=user, award=award, username=username)) == 0
-        self.cursor.execute(
-            f"INSERT INTO Accounts (award_id, user, required_values) "
-            f"VALUES ({award_id}, '{user}', '{required_values}')"
-        )
-        self.connection.commit()
+        with self.db.transaction():
+            self.db.execute(
+                "INSERT INTO Accounts (award_id, user, login) VALUES (%s, %s, %s)", [award_id, user, username]
+            )
+            account_id = self._get_account_id(award=award, user=user, username=username)
+            self.db.executemany(
+                "INSERT INTO AccountFields (account_id, field_name, field_value) VALUES (%s, %s, %s)",
+                [[account_id, field_name, field_value] for field_name, field_value in fields]
+            )
         return True
 
     def get_all_latest_balances(self, user: str) -> dict:
-        """Get account balances from a user.
+        """Get account balances from a user (accounts without a balance too). Reads LatestBalances, so the cost does
+        not grow with Histories.
 
         :param user: name of user
         :return: {category: list of [award program, username, balance, expected expire date, last updated date]}
         """
         balances = {}
-        self.cursor.execute(
-            f"SELECT C.category, A.award, ACC.required_values, H.balance, ACC.expected_expire, H.updated "
-            f"FROM Accounts ACC "
-            f"JOIN Awards A ON ACC.award_id = A.id "
-            f"JOIN Histories H ON ACC.id = H.account_id "
-            f"JOIN Categories C ON A.category_id = C.id "
-            f"JOIN "
-            f"    (SELECT account_id, MAX(updated) AS max_date FROM Histories GROUP BY account_id) H2 "
-            f"    ON H.account_id = H2.account_id AND H.updated = H2.max_date "
-            f"WHERE ACC.user = '{user}' "
-            f"ORDER BY C.id, A.award"
+        results = self.db.fetchall(
+            "SELECT C.category, A.award, ACC.login, L.balance, ACC.expected_expire, L.updated "
+            "FROM Accounts ACC "
+            "JOIN Awards A ON ACC.award_id = A.id "
+            "LEFT JOIN LatestBalances L ON ACC.id = L.account_id "
+            "JOIN Categories C ON A.category_id = C.id "
+            "WHERE ACC.user = %s "
+            "ORDER BY C.id, A.award",
+            [user]
         )
-        results = self.cursor.fetchall()
-        for category, award, required_values, balance, expected_expire, updated_date in results:
+        for category, award, login, balance, expected_expire, updated_date in results:
             if category not in balances:
                 balances[category] = []
             if expected_expire is None:
                 expected_expire = "Do not expire"
-            balances[category].append([
-                award,
-                required_values.split(
-                    self.AWARD_REQUIRED_FILED_SPLITER)[0].strip(), balance,
-                expected_expire, updated_date
-            ])
+            # no balance until the first update succeeds
+            if updated_date is None:
+                balance, updated_date = "-", "Not updated"
+            balances[category].append([award, login, balance, expected_expire, updated_date])
         return balances
 
     def add_balance(self, user: str, award: str, username: str, balance: int,
                     expire_date: date) -> None:
-        """Add new award program balance.
+        """Add new award program balance. Only one record per account/date: today's balance is replaced.
 
         :param user: name of user
         :param award: award program
@@ -424,52 +675,110 @@ class ARTDatabase(object):
         :param balance: new balance
         :param expire_date: expected expire date
         """
-        account_id = self._get_account_id(
-            award=award, user=user, username=username)
-        # update expected expire date
-        if expire_date is not None:
-            self.cursor.execute(
-                f"UPDATE Accounts SET expected_expire = '{expire_date}' WHERE id = {account_id}"
-            )
-            self.connection.commit()
+        self.add_balances([
+            {"user": user, "award": award, "username": username, "balance": balance, "expire_date": expire_date}
+        ])
 
-        # only one record per account/date
-        today = date.today()
-        self.cursor.execute(
-            f"SELECT * FROM Histories WHERE account_id = {account_id} AND updated = '{today}'"
-        )
-        result = self.cursor.fetchone()
+    def add_balances(self, balances: [dict]) -> dict:
+        """Add many balances in one transaction (i.e. results of a batch refresh or an import).
 
-        if result is None:
-            self.cursor.execute(
-                f"INSERT INTO Histories (account_id, balance, updated) VALUES ({account_id}, {balance}, '{today}')"
+        Each statement runs once for all balances (executemany). Only one record per account/date: a balance
+        of the same date is replaced, and LatestBalances is not moved back by an older date.
+
+        :param balances: list of {user, award, username, balance, expire_date, updated (optional, default today)}
+        :return: {rows (balances written), elapsed (seconds)}
+        """
+        started = time.perf_counter()
+        today = date.today()
+        account_ids = {}
+        histories = []
+        expire_dates = []
+        for balance in balances:
+            key = (balance["user"], balance["award"], balance["username"])
+            if key not in account_ids:
+                account_ids[key] = self._get_account_id(award=balance["award"], user=balance["user"],
+                                                        username=balance["username"])
+            histories.append([account_ids[key], balance["balance"], to_date(balance.get("updated")) or today])
+            if balance["expire_date"] is not None:
+                expire_dates.append([to_date(balance["expire_date"]), account_ids[key]])
+        if self.db.dialect == "sqlite":
+            histories_sql = (
+                "INSERT INTO Histories (account_id, balance, updated) VALUES (%s, %s, %s) "
+                "ON CONFLICT (account_id, updated) DO UPDATE SET balance = excluded.balance"
+            )
+            # keep the latest balance (an older date does not replace a newer one)
+            latest_sql = (
+                "INSERT INTO LatestBalances (account_id, balance, updated) VALUES (%s, %s, %s) "
+                "ON CONFLICT (account_id) DO UPDATE SET balance = excluded.balance, updated = excluded.updated "
+                "WHERE excluded.updated >= LatestBalances.updated"
             )
-            self.connection.commit()
         else:
-            self.cursor.execute(
-                f"UPDATE Histories SET balance = {balance} WHERE account_id = {account_id} AND updated = '{today}'"
+            histories_sql = (
+                "INSERT INTO Histories (account_id, balance, updated) VALUES (%s, %s, %s) "
+                "ON DUPLICATE KEY UPDATE balance = VALUES(balance)"
+            )
+            # keep the latest balance (balance is compared with the old date before the date is updated)
+            latest_sql = (
+                "INSERT INTO LatestBalances (account_id, balance, updated) VALUES (%s, %s, %s) "
+                "ON DUPLICATE KEY UPDATE "
+                "  balance = IF(VALUES(updated) >= updated, VALUES(balance), balance),"
+                "  updated = GREATEST(updated, VALUES(updated))"
             )
-            self.connection.commit()
+        if len(histories) > 0:
+            # expected expire dates and balances are saved together
+            with self.db.transaction():
+                if len(expire_dates) > 0:
+                    self.db.executemany("UPDATE Accounts SET expected_expire = %s WHERE id = %s", expire_dates)
+                self.db.executemany(histories_sql, histories)
+                self.db.executemany(latest_sql, histories)
+        return {"rows": len(histories), "elapsed": time.perf_counter() - started}
 
     def get_balance_history(self,
                             user: str,
                             award: str,
                             username: str,
-                            limit: int = 10) -> [[date, int]]:
+                            limit: int = 10,
+                            before: date = None) -> [[date, int]]:
         """Get Point balance for the last X record (Order by date DESC).
 
+        Pages are read by keyset: pass the date of the last record of a page as before to get the next page.
+        Each page is a range read of Histories primary key, so it costs the same however deep it is.
+
         :param user: name of user
         :param award: award program
         :param username: username
-        :param limit: number of last histories
+        :param limit: number of last histories (page size)
+        :param before: only records older than this date. If None, from the latest record
         :return: list of [updated date, balance]
         """
         account_id = self._get_account_id(
             award=award, user=user, username=username)
-        self.cursor.execute(
-            f"SELECT updated, balance FROM Histories "
-            f"WHERE account_id = {account_id} "
-            f"ORDER BY updated DESC LIMIT {limit}"
-        )
-        results = self.cursor.fetchall()
+        if before is None:
+            results = self.db.fetchall(
+                "SELECT updated, balance FROM Histories "
+                "WHERE account_id = %s "
+                "ORDER BY updated DESC LIMIT %s",
+                [account_id, limit]
+            )
+        else:
+            results = self.db.fetchall(
+                "SELECT updated, balance FROM Histories "
+                "WHERE account_id = %s AND updated < %s "
+                "ORDER BY updated DESC LIMIT %s",
+                [account_id, before, limit]
+            )
         return [[result[0], result[1]] for result in results]
+
+    def iterate_balance_history(self, user: str, award: str, username: str, chunk_size: int = 1000):
+        """Get all balance history of an account (Order by date ASC) in chunks, without reading it all at once.
+
+        :param user: name of user
+        :param award: award program
+        :param username: username
+        :param chunk_size: records per chunk
+        :return: generator of lists of [updated date, balance]
+        """
+        account_id = self._get_account_id(award=award, user=user, username=username)
+        for rows in self.db.iterate("SELECT updated, balance FROM Histories WHERE account_id = %s ORDER BY updated",
+                                    [account_id], size=chunk_size):
+            yield [[row[0], row[1]] for row in rows]
@@ -0,0 +1,545 @@
+"""Storage backends of ARTDatabase: parameter binding, prepared statements and per-thread connections.
+
+ARTDatabase runs on MySQL (MySQLBackend) or on an embedded SQLite file (SQLiteBackend), chosen by the
+storage config file (STORAGE_CONFIG, see get_storage_config()). Both have the same interface and take
+SQL with %s placeholders; the few statements which differ between them check backend.dialect.
+
+Every thread which uses ARTDatabase gets its own connection from a small pool, so award script workers
+can write balances while the GUI reads them. When all pooled connections are taken, a thread waits until
+another thread releases one. Statements are prepared on the server once per connection
+and reused (values are bound, never formatted into SQL). A connection which was dropped by the server
+(i.e. after wait_timeout) is reconnected when it is used next.
+
+Connections autocommit, so a thread always reads what other threads committed. Statements which must be
+saved together run in transaction().
+
+How to use:
+    backend = MySQLBackend(password=password)
+    backend.select_database("ARTDB")
+    row = backend.fetchone("SELECT id FROM Awards WHERE award = %s", [award])
+    with backend.transaction():
+        backend.execute("UPDATE Accounts SET expected_expire = %s WHERE id = %s", [expire_date, account_id])
+        backend.execute("INSERT INTO Histories ...", [...])
+"""
+import configparser
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+
+STORAGE_CONFIG = "~/.art/storage.ini"
+# seconds a thread waits for a pooled MySQL connection while all of them are used by other threads
+POOL_TIMEOUT = 60
+# storage config when there is no file: MySQL as before
+DEFAULT_STORAGE = {"backend": "mysql", "sqlite_directory": "~/.art"}
+
+
+def get_storage_config(path: str = STORAGE_CONFIG) -> dict:
+    """Read the storage config file. It is read before connecting, so it cannot be in Configs table.
+
+        [storage]
+        backend = sqlite              ; mysql (default) or sqlite
+        sqlite_directory = ~/.art     ; directory of SQLite database files
+
+    :param path: storage config file
+    :return: {backend, sqlite_directory}
+    """
+    parser = configparser.ConfigParser()
+    parser.read(os.path.expanduser(path))
+    storage = dict(DEFAULT_STORAGE)
+    if parser.has_section("storage"):
+        storage.update(parser["storage"])
+    storage["backend"] = storage["backend"].strip().lower()
+    return storage
+
+
+def create_backend(password: str = None, storage: dict = None):
+    """Create the storage backend of the storage config.
+
+    :param password: MySQL password (not used by SQLite)
+    :param storage: {backend, sqlite_directory}. If None, read the storage config file
+    :return: MySQLBackend or SQLiteBackend
+    """
+    storage = get_storage_config() if storage is None else storage
+    if storage["backend"] == "sqlite":
+        return SQLiteBackend(directory=storage["sqlite_directory"])
+    if storage["backend"] != "mysql":
+        raise ValueError(f"Unknown storage backend: {storage['backend']}")
+    return MySQLBackend(password=password)
+
+
+def check_database_name(database: str) -> None:
+    """Check a database name can be used in SQL or as a file name (names cannot be bound as values).
+
+    :param database: name of database
+    """
+    if re.fullmatch(r"\w+", database) is None:
+        raise ValueError(f"Invalid database name: {database}")
+
+
+class MySQLBackend(object):
+    """Pool of per-thread MySQL connections with prepared statements cached per connection."""
+    dialect = "mysql"
+    # column definition of an auto increment primary key
+    AUTO_ID = "id INT AUTO_INCREMENT PRIMARY KEY"
+    INSERT_IGNORE = "INSERT IGNORE"
+
+    def __init__(self, password: str, host: str = "localhost", user: str = "root", pool_size: int = 8):
+        """Initial function. Open the first connection to check the password.
+
+        :param password: password to connect to the MySQL
+        :param host: MySQL host
+        :param user: MySQL user
+        :param pool_size: maximum number of threads using the database at the same time. More threads wait for a
+                          connection released by another thread (see release())
+        """
+        # imported here: SQLite users do not need MySQL connector
+        import mysql.connector
+        from mysql.connector import errorcode, pooling
+
+        self._errors = (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError)
+        # client error codes of a connection which is gone
+        self._connection_lost_errors = [
+            errorcode.CR_SERVER_GONE_ERROR, errorcode.CR_SERVER_LOST, errorcode.CR_SERVER_LOST_EXTENDED
+        ]
+        try:
+            self._pool = pooling.MySQLConnectionPool(pool_name=f"art_{id(self)}",
+                                                     pool_size=pool_size,
+                                                     host=host,
+                                                     user=user,
+                                                     password=password,
+                                                     autocommit=True)
+        except mysql.connector.errors.ProgrammingError:
+            raise RuntimeError("Incorrect password")
+        # connections not taken by a thread; mysql.connector raises PoolError instead of waiting when there is none
+        self._free = threading.BoundedSemaphore(pool_size)
+        self._local = threading.local()
+        self.database = None
+        # number of statements sent to the server (for benchmarks)
+        self.statements = 0
+
+    def _get_connection(self):
+        """Get the connection of the current thread. Take one from the pool at the first use, waiting up to
+        POOL_TIMEOUT seconds if other threads use all of them.
+
+        :return: pooled MySQL connection
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if not self._free.acquire(timeout=POOL_TIMEOUT):
+                raise RuntimeError(f"No free database connection in {POOL_TIMEOUT} seconds")
+            try:
+                connection = self._pool.get_connection()
+            except:
+                self._free.release()
+                raise
+            if self.database is not None:
+                connection.database = self.database
+            self._local.connection = connection
+            # {SQL: prepared cursor}
+            self._local.statements = {}
+            self._local.in_transaction = False
+        return connection
+
+    def _reconnect(self) -> None:
+        """Reconnect the connection of the current thread. Prepared statements are gone with the old session."""
+        connection = self._local.connection
+        connection.reconnect(attempts=3, delay=1)
+        if self.database is not None:
+            connection.database = self.database
+        self._local.statements = {}
+        self._local.in_transaction = False
+
+    def _get_cursor(self, sql: str, prepared: bool):
+        """Get a cursor for a statement.
+
+        :param sql: SQL statement
+        :param prepared: True to use (and cache) a server-side prepared statement
+        :return: cursor
+        """
+        connection = self._get_connection()
+        if not prepared:
+            return connection.cursor()
+        cursor = self._local.statements.get(sql)
+        if cursor is None:
+            cursor = connection.cursor(prepared=True)
+            self._local.statements[sql] = cursor
+        return cursor
+
+    def _run(self, sql: str, params, prepared: bool, many: bool = False):
+        """Run a statement. Reconnect and run it again if the connection was lost outside a transaction.
+
+        :param sql: SQL statement with %s placeholders
+        :param params: values of placeholders (list of them if many)
+        :param prepared: True to use a prepared statement
+        :param many: True to run the statement for every values in params
+        :return: cursor which ran the statement
+        """
+        for attempt in range(2):
+            cursor = self._get_cursor(sql=sql, prepared=prepared)
+            try:
+                self.statements += 1
+                if many:
+                    cursor.executemany(sql, params)
+                else:
+                    cursor.execute(sql, params)
+                return cursor
+            except self._errors as e:
+                # statements of a transaction would be lost with the connection: let the caller know
+                if e.errno not in self._connection_lost_errors or attempt == 1 or self._local.in_transaction:
+                    raise
+                self._reconnect()
+
+    def database_exists(self, database: str) -> bool:
+        """Check a database exists.
+
+        :param database: name of database
+        :return: True if exists
+        """
+        return self.fetchone("SHOW DATABASES LIKE %s", [database]) is not None
+
+    def create_database(self, database: str) -> None:
+        """Create a database and use it for all connections.
+
+        :param database: name of database
+        """
+        check_database_name(database)
+        self.execute_ddl(f"CREATE DATABASE {database}")
+        self.select_database(database)
+
+    def drop_database(self, database: str) -> None:
+        """Remove a database with all data (i.e. a benchmark database).
+
+        :param database: name of database
+        """
+        check_database_name(database)
+        self.execute_ddl(f"DROP DATABASE {database}")
+
+    def select_database(self, database: str) -> None:
+        """Use a database for all connections.
+
+        :param database: name of database
+        """
+        check_database_name(database)
+        self.database = database
+        self._get_connection().database = database
+
+    def execute(self, sql: str, params: list | tuple = ()) -> int:
+        """Run a statement which changes data. It is committed unless it is in transaction().
+
+        :param sql: SQL statement with %s placeholders
+        :param params: values of placeholders
+        :return: number of rows changed
+        """
+        return self._run(sql=sql, params=params, prepared=True).rowcount
+
+    def executemany(self, sql: str, params: list) -> int:
+        """Run a statement for many values (i.e. one multi-row INSERT).
+
+        :param sql: SQL statement with %s placeholders
+        :param params: list of values of placeholders
+        :return: number of rows changed
+        """
+        return self._run(sql=sql, params=params, prepared=False, many=True).rowcount
+
+    def execute_ddl(self, sql: str) -> None:
+        """Run a statement which cannot be prepared (i.e. CREATE TABLE, RENAME TABLE). Commits implicitly.
+
+        :param sql: SQL statement without placeholders
+        """
+        self._run(sql=sql, params=(), prepared=False)
+
+    def fetchone(self, sql: str, params: list | tuple = ()) -> tuple | None:
+        """Run a query and get the first row.
+
+        :param sql: SQL query with %s placeholders
+        :param params: values of placeholders
+        :return: row or None
+        """
+        cursor = self._run(sql=sql, params=params, prepared=True)
+        rows = cursor.fetchall()
+        return rows[0] if len(rows) > 0 else None
+
+    def fetchall(self, sql: str, params: list | tuple = ()) -> [tuple]:
+        """Run a query and get all rows.
+
+        :param sql: SQL query with %s placeholders
+        :param params: values of placeholders
+        :return: rows
+        """
+        return self._run(sql=sql, params=params, prepared=True).fetchall()
+
+    def iterate(self, sql: str, params: list | tuple = (), size: int = 1000):
+        """Run a query and get rows in chunks as they arrive (unbuffered cursor), i.e. for an export.
+
+        The connection of the current thread cannot run other statements until all chunks are read.
+
+        :param sql: SQL query with %s placeholders
+        :param params: values of placeholders
+        :param size: rows per chunk
+        :return: generator of lists of rows
+        """
+        cursor = self._run(sql=sql, params=params, prepared=False)
+        try:
+            while True:
+                rows = cursor.fetchmany(size)
+                if len(rows) == 0:
+                    break
+                yield rows
+        finally:
+            # rows which are not read yet must be read before the connection is used again
+            while len(cursor.fetchmany(size)) > 0:
+                pass
+            cursor.close()
+
+    @contextmanager
+    def transaction(self):
+        """Run statements of the current thread as one transaction: commit at the end or roll back on error.
+
+        A lost connection is not reconnected in a transaction since its statements are lost with it.
+        """
+        connection = self._get_connection()
+        if self._local.in_transaction:
+            # already in a transaction of the caller
+            yield self
+            return
+        connection.start_transaction()
+        self._local.in_transaction = True
+        try:
+            yield self
+            connection.commit()
+        except:
+            connection.rollback()
+            raise
+        finally:
+            self._local.in_transaction = False
+
+    def release(self) -> None:
+        """Return the connection of the current thread to the pool (i.e. when a worker thread ends)."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            return
+        for cursor in self._local.statements.values():
+            cursor.close()
+        self._local.connection = None
+        connection.close()
+        self._free.release()
+
+    def close(self) -> None:
+        """Release the connection of the current thread. Connections of other threads are released by them."""
+        self.release()
+
+
+# dates are saved as ISO text (YYYY-MM-DD) and read back as date for DATE columns. A datetime is saved as its
+# date, as MySQL does for a DATE column; values saved with a time before are read as their date.
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.date().isoformat())
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()[:10]))
+
+
+class SQLiteBackend(object):
+    """Per-thread connections to an SQLite database file in WAL mode (readers do not wait for a writer)."""
+    dialect = "sqlite"
+    # column definition of an auto increment primary key
+    AUTO_ID = "id INTEGER PRIMARY KEY AUTOINCREMENT"
+    INSERT_IGNORE = "INSERT OR IGNORE"
+
+    def __init__(self, directory: str = DEFAULT_STORAGE["sqlite_directory"]):
+        """Initial function.
+
+        :param directory: directory of database files ({database}.sqlite3)
+        """
+        self.directory = os.path.expanduser(directory)
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self._local = threading.local()
+        self.database = None
+        self.path = None
+        # {SQL with %s: SQL with ?}
+        self._sql = {}
+        # number of statements sent to SQLite (for benchmarks)
+        self.statements = 0
+
+    def get_path(self, database: str) -> str:
+        """Get file path of a database.
+
+        :param database: name of database
+        :return: file path
+        """
+        check_database_name(database)
+        return os.path.join(self.directory, f"{database}.sqlite3")
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Get the connection of the current thread. Open one at the first use.
+
+        :return: SQLite connection
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self.path is None:
+                raise RuntimeError("No database is selected")
+            # isolation_level=None: autocommit, transactions are started by transaction()
+            # statements are compiled once per connection and kept in the statement cache
+            connection = sqlite3.connect(self.path, isolation_level=None, detect_types=sqlite3.PARSE_DECLTYPES,
+                                         cached_statements=256, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute("PRAGMA foreign_keys = ON")
+            connection.execute("PRAGMA busy_timeout = 5000")
+            self._local.connection = connection
+            self._local.in_transaction = False
+        return connection
+
+    def _to_sqlite(self, sql: str) -> str:
+        """Convert %s placeholders to ?.
+
+        :param sql: SQL with %s placeholders
+        :return: SQL with ? placeholders
+        """
+        converted = self._sql.get(sql)
+        if converted is None:
+            converted = sql.replace("%s", "?")
+            self._sql[sql] = converted
+        return converted
+
+    def database_exists(self, database: str) -> bool:
+        """Check a database exists.
+
+        :param database: name of database
+        :return: True if exists
+        """
+        return os.path.exists(self.get_path(database))
+
+    def create_database(self, database: str) -> None:
+        """Create a database and use it for all connections.
+
+        :param database: name of database
+        """
+        self.select_database(database)
+        self._get_connection()
+
+    def drop_database(self, database: str) -> None:
+        """Remove a database with all data (i.e. a benchmark database).
+
+        :param database: name of database
+        """
+        path = self.get_path(database)
+        if path == self.path:
+            self.release()
+            self.path = None
+            self.database = None
+        for suffix in ["", "-wal", "-shm"]:
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    def select_database(self, database: str) -> None:
+        """Use a database for all connections.
+
+        :param database: name of database
+        """
+        path = self.get_path(database)
+        if path != self.path:
+            self.release()
+        self.database = database
+        self.path = path
+
+    def execute(self, sql: str, params: list | tuple = ()) -> int:
+        """Run a statement which changes data. It is committed unless it is in transaction().
+
+        :param sql: SQL statement with %s placeholders
+        :param params: values of placeholders
+        :return: number of rows changed
+        """
+        self.statements += 1
+        return self._get_connection().execute(self._to_sqlite(sql), params).rowcount
+
+    def executemany(self, sql: str, params: list) -> int:
+        """Run a statement for many values.
+
+        :param sql: SQL statement with %s placeholders
+        :param params: list of values of placeholders
+        :return: number of rows changed
+        """
+        self.statements += 1
+        with self.transaction():
+            return self._get_connection().executemany(self._to_sqlite(sql), params).rowcount
+
+    def execute_ddl(self, sql: str) -> None:
+        """Run a statement which changes tables (i.e. CREATE TABLE).
+
+        :param sql: SQL statement without placeholders
+        """
+        self.statements += 1
+        self._get_connection().execute(sql)
+
+    def fetchone(self, sql: str, params: list | tuple = ()) -> tuple | None:
+        """Run a query and get the first row.
+
+        :param sql: SQL query with %s placeholders
+        :param params: values of placeholders
+        :return: row or None
+        """
+        self.statements += 1
+        return self._get_connection().execute(self._to_sqlite(sql), params).fetchone()
+
+    def fetchall(self, sql: str, params: list | tuple = ()) -> [tuple]:
+        """Run a query and get all rows.
+
+        :param sql: SQL query with %s placeholders
+        :param params: values of placeholders
+        :return: rows
+        """
+        self.statements += 1
+        return self._get_connection().execute(self._to_sqlite(sql), params).fetchall()
+
+    def iterate(self, sql: str, params: list | tuple = (), size: int = 1000):
+        """Run a query and get rows in chunks as they are read, i.e. for an export.
+
+        :param sql: SQL query with %s placeholders
+        :param params: values of placeholders
+        :param size: rows per chunk
+        :return: generator of lists of rows
+        """
+        self.statements += 1
+        cursor = self._get_connection().execute(self._to_sqlite(sql), params)
+        try:
+            while True:
+                rows = cursor.fetchmany(size)
+                if len(rows) == 0:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    @contextmanager
+    def transaction(self):
+        """Run statements of the current thread as one transaction: commit at the end or roll back on error."""
+        connection = self._get_connection()
+        if self._local.in_transaction:
+            # already in a transaction of the caller
+            yield self
+            return
+        # take the write lock at the beginning, so that two writers do not deadlock upgrading read locks
+        connection.execute("BEGIN IMMEDIATE")
+        self._local.in_transaction = True
+        try:
+            yield self
+            connection.execute("COMMIT")
+        except:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            self._local.in_transaction = False
+
+    def release(self) -> None:
+        """Close the connection of the current thread (i.e. when a worker thread ends)."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            return
+        self._local.connection = None
+        connection.close()
+
+    def close(self) -> None:
+        """Close the connection of the current thread. Connections of other threads are closed by them."""
+        self.release()
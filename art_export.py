@@ -0,0 +1,183 @@
+"""Export accounts and their whole balance history to CSV or Excel (XLSX).
+
+Histories are read in chunks (see ARTDatabase.iterate_balance_history) and every row is written as soon as
+it is read, so memory does not grow with years of daily balances. XLSX files are written by openpyxl in
+write-only mode (pip install openpyxl); CSV needs nothing else.
+"""
+import csv
+import queue
+import threading
+import time
+
+from art_db import ARTDatabase
+
+EXPORT_COLUMNS = ["User", "Category", "Award Program", "Username/ID", "Expected Expire", "Date", "Balance"]
+# Histories records read at a time
+EXPORT_CHUNK_SIZE = 1000
+
+
+class CSVExportWriter(object):
+    """Write export rows to a CSV file."""
+
+    def __init__(self, path: str):
+        """Initial function.
+
+        :param path: CSV file path
+        """
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+
+    def write(self, row: list) -> None:
+        """Write a row.
+
+        :param row: values of a row
+        """
+        self.writer.writerow(row)
+
+    def close(self) -> None:
+        """Close the file."""
+        self.file.close()
+
+
+class XLSXExportWriter(object):
+    """Write export rows to an Excel file. Rows are streamed to the file, not kept in memory."""
+
+    def __init__(self, path: str):
+        """Initial function.
+
+        :param path: XLSX file path
+        """
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise RuntimeError("Excel export needs openpyxl: pip install openpyxl")
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet(title="Balance History")
+
+    def write(self, row: list) -> None:
+        """Write a row.
+
+        :param row: values of a row
+        """
+        self.sheet.append(row)
+
+    def close(self) -> None:
+        """Save the file."""
+        self.workbook.save(self.path)
+
+
+def get_export_writer(path: str):
+    """Get a writer by file extension.
+
+    :param path: .csv or .xlsx file path
+    :return: CSVExportWriter or XLSXExportWriter
+    """
+    if path.lower().endswith(".xlsx"):
+        return XLSXExportWriter(path)
+    if path.lower().endswith(".csv"):
+        return CSVExportWriter(path)
+    raise ValueError(f"Unknown export file type: {path}")
+
+
+def export_balance_history(art_db: ARTDatabase, path: str, user: str = None, on_progress=None,
+                           chunk_size: int = EXPORT_CHUNK_SIZE) -> dict:
+    """Export every account of a user (or all users) with its whole balance history, one row per record.
+    An account without balance history has one row without Date and Balance.
+
+    :param art_db: ART database
+    :param path: .csv or .xlsx file path
+    :param user: name of user. If user is None, all accounts of all users
+    :param on_progress: optional callback({accounts, accounts_done, rows}) called after each chunk
+    :param chunk_size: Histories records read at a time
+    :return: {path, accounts, rows, elapsed (seconds)}
+    """
+    started = time.perf_counter()
+    accounts = art_db.get_accounts(user=user)
+    progress = {"accounts": len(accounts), "accounts_done": 0, "rows": 0}
+    writer = get_export_writer(path)
+    try:
+        writer.write(EXPORT_COLUMNS)
+        for account in accounts:
+            category = art_db.get_award_info(award=account["award"])["category"]
+            account_info = art_db.get_account_info(**account)
+            expected_expire = account_info["expected_expire"] if account_info is not None else None
+            rows = progress["rows"]
+            for chunk in art_db.iterate_balance_history(**account, chunk_size=chunk_size):
+                for updated, balance in chunk:
+                    writer.write([account["user"], category, account["award"], account["username"],
+                                  expected_expire, updated, balance])
+                progress["rows"] += len(chunk)
+                if on_progress is not None:
+                    on_progress(dict(progress))
+            if progress["rows"] == rows:
+                writer.write([account["user"], category, account["award"], account["username"], expected_expire,
+                              None, None])
+                progress["rows"] += 1
+            progress["accounts_done"] += 1
+            if on_progress is not None:
+                on_progress(dict(progress))
+    finally:
+        writer.close()
+    return {
+        "path": path,
+        "accounts": progress["accounts"],
+        "rows": progress["rows"],
+        "elapsed": time.perf_counter() - started
+    }
+
+
+class BackgroundExport(object):
+    """Run export_balance_history() on a thread. The GUI thread reads its events with poll():
+        * {"event": "progress", "accounts": int, "accounts_done": int, "rows": int}
+        * {"event": "finished", "path": str, "accounts": int, "rows": int, "elapsed": seconds}
+        * {"event": "failed", "error": str}
+    """
+
+    def __init__(self, art_db: ARTDatabase, path: str, user: str = None):
+        """Initial function.
+
+        :param art_db: ART database
+        :param path: .csv or .xlsx file path
+        :param user: name of user. If user is None, all accounts of all users
+        """
+        self.art_db = art_db
+        self.path = path
+        self.user = user
+        self.events = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.finished = False
+
+    def start(self) -> None:
+        """Start the export."""
+        self.thread.start()
+
+    def _run(self) -> None:
+        """Export, then report the result."""
+        try:
+            result = export_balance_history(art_db=self.art_db,
+                                            path=self.path,
+                                            user=self.user,
+                                            on_progress=lambda progress: self.events.put(
+                                                {"event": "progress", **progress}))
+            self.events.put({"event": "finished", **result})
+        except Exception as e:
+            self.events.put({"event": "failed", "error": str(e)})
+        finally:
+            self.art_db.release_connection()
+
+    def poll(self) -> [dict]:
+        """Get all events without waiting. Call from the GUI thread.
+
+        :return: events since the last poll
+        """
+        events = []
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event["event"] in ["finished", "failed"]:
+                self.finished = True
+            events.append(event)
+        return events
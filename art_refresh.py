@@ -0,0 +1,599 @@
+import platform
+import queue
+import threading
+import time
+import urllib.request
+from functools import partial
+
+from art_db import ARTDatabase
+from art_result import STATUS_FAILED, STATUS_OK, CircuitBreaker, get_result, make_result
+from awards._registry import registry
+from awards._resources import ResourceBlocker, get_profile
+from awards._session import SessionStore
+from awards._trace import span, tracer
+
+
+# seconds to wait for Chrome to open its debug port (Chrome is launched in the background at startup)
+CDP_READY_TIMEOUT = 30
+
+
+def wait_for_cdp(cdp_url: str, timeout: float = CDP_READY_TIMEOUT) -> bool:
+    """Wait until Chrome answers on its debug port.
+
+    :param cdp_url: Chrome debug URL, i.e. http://localhost:12345
+    :param timeout: seconds to wait
+    :return: True if Chrome is ready
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(f"{cdp_url}/json/version", timeout=1):
+                return True
+        except OSError:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.2)
+
+
+def get_chrome_command(chrome_executable: str, port: int, headless: bool = False) -> [str]:
+    """Get the command to launch Chrome CDP mode on this platform.
+
+    :param chrome_executable: Chrome executable (Windows only; Configs.chrome_executable)
+    :param port: Chrome debug port
+    :param headless: True to launch Chrome without a window (i.e. a server)
+    :return: command for Popen or None if the platform is not supported
+    """
+    arguments = [f"--remote-debugging-port={port}", "--window-size=1240,800"]
+    if headless:
+        arguments.append("--headless=new")
+    if platform.system() == "Windows":
+        return [chrome_executable] + arguments
+    if platform.system() == "Linux":
+        # I did not test for Linux yet.
+        return ["google-chrome"] + arguments
+    if platform.system() == "Darwin":
+        # Since I do not have a MAC system, I did not test this line.
+        return ["open", "-a", "Google Chrome.app", "--args"] + arguments
+    return None
+
+
+def get_award_data(browser, script: str, account_info: dict, award_info: dict, **kwargs) -> dict:
+    """Run an award script to retrieve the current point balance (traced as a span, see awards._trace).
+    Errors of the award script are raised (see art_result.get_result() for retries and statuses).
+
+    :param browser: Chrome debug browser (Playwright)
+    :param script: name of award script in awards directory
+    :param account_info: account information from database
+    :param award_info: award information from database
+    :param kwargs: additional arguments for awards.XYZ.get_balance() (i.e. context, session, prompt)
+    :return: dict output from awards.XYZ.get_balance()
+    """
+    with span("get_balance", script=script):
+        return registry.get_module(script).get_balance(browser=browser,
+                                                       account_info=account_info,
+                                                       award_info=award_info,
+                                                       **kwargs)
+
+
+class RefreshWorkerPool(object):
+    """Run award scripts on worker threads, each of them connected to Chrome through its own CDP session.
+
+    Playwright sync API objects cannot be shared between threads, so every worker starts its own Playwright
+    and connects to the same Chrome debug port. Results are reported through the events queue:
+        * {"event": "started", "job": job}
+        * {"event": "finished", "job": job, "award_data": dict, "elapsed": seconds, "saved": bool}
+          award_data has status (see art_result); saved is True if the worker wrote the balance to art_db
+        * {"event": "cancelled", "job": job} for a job cancelled before it started
+        * {"event": "prompt", "job": job, "title": str, "message": str, "answer": queue.Queue}
+          when an award script asks for input (i.e. passcode). The worker waits until the reader of
+          events puts the answer (str or None), since only the main thread may show a dialog.
+    """
+
+    def __init__(self, cdp_url: str, workers: int = 4, isolate_contexts: bool = True,
+                 session_store: SessionStore = None, block_resources: str = "no", art_db: ARTDatabase = None,
+                 breaker: CircuitBreaker = None):
+        """Initial function. Start worker threads.
+
+        :param cdp_url: Chrome debug URL, i.e. http://localhost:12345
+        :param workers: number of concurrent pages (or contexts)
+        :param isolate_contexts: True to run every job in a new browser context (separated cookies);
+                                 False to share the first browser context. Jobs of the same award script
+                                 are not run at the same time if a context is shared since they share cookies.
+        :param session_store: saved log in sessions for award scripts supporting it (isolated contexts only)
+        :param block_resources: "yes" to block images/fonts/ads (see awards._resources), "measure" to count only,
+                                "no" to load everything (isolated contexts only)
+        :param art_db: ART database to write balances from the workers (each has its own connection);
+                       None to leave writing to the reader of events
+        :param breaker: circuit breaker pausing failing award programs. If None, a new one for this pool
+        """
+        self.cdp_url = cdp_url
+        self.isolate_contexts = isolate_contexts
+        self.session_store = session_store
+        self.block_resources = block_resources
+        self.art_db = art_db
+        self.breaker = CircuitBreaker() if breaker is None else breaker
+        self.jobs = queue.Queue()
+        self.events = queue.Queue()
+        self._script_locks = {}
+        self._script_locks_lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"art-refresh-{index}", daemon=True)
+            for index in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, job: dict) -> None:
+        """Add a job to run.
+
+        :param job: {user, award, username, account_info, award_info}
+        """
+        self.jobs.put(job)
+
+    def cancel(self, job: dict) -> None:
+        """Cancel a submitted job. A job which is already running is not stopped.
+
+        :param job: submitted job
+        """
+        job["cancelled"] = True
+
+    def ask(self, job: dict, title: str, message: str) -> str | None:
+        """Ask for input of an award script through the events queue and wait for the answer.
+
+        :param job: job of the award script
+        :param title: title of dialog
+        :param message: message of dialog
+        :return: answer or None if there is no answer
+        """
+        answer = queue.Queue(maxsize=1)
+        self.events.put({"event": "prompt", "job": job, "title": title, "message": message, "answer": answer})
+        return answer.get()
+
+    def close(self, wait: bool = True) -> None:
+        """Stop all worker threads after queued jobs are done.
+
+        :param wait: True to wait for worker threads; False to return immediately (i.e. closing the app)
+        """
+        for _ in self._threads:
+            self.jobs.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _get_script_lock(self, script: str) -> threading.Lock:
+        """Get a lock for an award script.
+
+        :param script: name of award script
+        :return: lock shared by all jobs of the script
+        """
+        with self._script_locks_lock:
+            if script not in self._script_locks:
+                self._script_locks[script] = threading.Lock()
+            return self._script_locks[script]
+
+    def _work(self) -> None:
+        """Worker thread: connect to Chrome and run jobs until None is received."""
+        from playwright.sync_api import sync_playwright
+
+        playwright = sync_playwright().start()
+        try:
+            try:
+                if not wait_for_cdp(self.cdp_url):
+                    raise RuntimeError(f"Chrome is not ready at {self.cdp_url}")
+                browser = playwright.chromium.connect_over_cdp(self.cdp_url)
+            except Exception as e:
+                print(f"Refresh worker could not connect to Chrome: {e}")
+                browser = None
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    break
+                if job.get("cancelled", False):
+                    self.events.put({"event": "cancelled", "job": job})
+                    continue
+                self._run_job(browser=browser, job=job)
+        finally:
+            playwright.stop()
+            if self.art_db is not None:
+                self.art_db.release_connection()
+
+    def _attempt(self, browser, job: dict, prompt) -> dict:
+        """Run the award script of a job once (traced, see awards._trace). Errors of the award script are raised.
+
+        :param browser: Chrome debug browser (Playwright) of this worker
+        :param job: {user, award, username, account_info, award_info}
+        :param prompt: function(title, message) -> answer for the award script
+        :return: award_data
+        """
+        with tracer.account(program=job["award"], account=job["username"]):
+            return self._run_script(browser=browser, job=job, prompt=prompt)
+
+    def _run_script(self, browser, job: dict, prompt) -> dict:
+        """Run the award script of a job in a new browser context (or in the shared one).
+
+        :param browser: Chrome debug browser (Playwright) of this worker
+        :param job: {user, award, username, account_info, award_info}
+        :param prompt: function(title, message) -> answer for the award script
+        :return: award_data
+        """
+        script = job["award_info"]["script"]
+        if not self.isolate_contexts:
+            with self._get_script_lock(script):
+                return get_award_data(browser=browser,
+                                      script=script,
+                                      account_info=job["account_info"],
+                                      award_info=job["award_info"],
+                                      prompt=prompt)
+        award_script = registry.get_module(script)
+        with span("new context"):
+            session = None
+            if self.session_store is not None and getattr(award_script, "SUPPORTS_SESSION", False):
+                context, session = self.session_store.new_context(browser=browser,
+                                                                  script=script,
+                                                                  username=job["username"])
+            else:
+                context = browser.new_context()
+            blocker = None
+            profile = get_profile(award_script=award_script)
+            if self.block_resources in ["yes", "measure"] and profile is not None:
+                blocker = ResourceBlocker(profile=profile, dry_run=self.block_resources == "measure")
+                blocker.attach(context)
+        try:
+            award_data = get_award_data(browser=browser,
+                                        script=script,
+                                        account_info=job["account_info"],
+                                        award_info=job["award_info"],
+                                        context=context,
+                                        session=session,
+                                        prompt=prompt)
+            if blocker is not None:
+                award_data["resources"] = blocker.report()
+            return award_data
+        finally:
+            with span("close context"):
+                context.close()
+
+    def _run_job(self, browser, job: dict) -> None:
+        """Run an award script for a job (with retries) and report the result.
+
+        :param browser: Chrome debug browser (Playwright) of this worker
+        :param job: {user, award, username, account_info, award_info}
+        """
+        self.events.put({"event": "started", "job": job})
+        started = time.perf_counter()
+        script = job["award_info"]["script"]
+        if browser is None:
+            award_data = make_result(status=STATUS_FAILED, error=f"Not connected to Chrome at {self.cdp_url}")
+        elif not registry.has_script(script):
+            award_data = make_result(status=STATUS_FAILED, error=f"No award script: {script}")
+        else:
+            award_data = get_result(attempt=partial(self._attempt, browser, job),
+                                    script=script,
+                                    prompt=partial(self.ask, job),
+                                    breaker=self.breaker)
+        elapsed = time.perf_counter() - started
+        saved = False
+        # a failed update keeps the last balance
+        if self.art_db is not None and award_data["status"] == STATUS_OK:
+            try:
+                self.art_db.add_balance(user=job["user"],
+                                        award=job["award"],
+                                        username=job["username"],
+                                        balance=award_data["balance"],
+                                        expire_date=award_data["expire_date"])
+                saved = True
+            except Exception as e:
+                print(f"Could not save the balance of {job['award']} ({job['username']}): {e}")
+            finally:
+                # workers may be more than pooled connections: hold one only while writing
+                self.art_db.release_connection()
+        self.events.put({
+            "event": "finished",
+            "job": job,
+            "award_data": award_data,
+            "elapsed": elapsed,
+            "saved": saved
+        })
+
+
+class BackgroundRefresher(object):
+    """Update balances in the background for the GUI.
+
+    Jobs run on a RefreshWorkerPool (started at the first job). The GUI calls poll() from its own thread
+    (i.e. Tk after()) which writes balances to the database and returns events to show, so the database
+    and the widgets are only used by the GUI thread. An account is never queued twice.
+    """
+
+    def __init__(self, art_db: ARTDatabase, cdp_url: str):
+        """Initial function.
+
+        :param art_db: ART database
+        :param cdp_url: Chrome debug URL, i.e. http://localhost:12345
+        """
+        self.art_db = art_db
+        self.cdp_url = cdp_url
+        self.pool = None
+        # {(user, award, username): job}
+        self.queued = {}
+        self.running = {}
+        # {(user, award, username): status} of the last update of accounts which were not updated
+        self.failed = {}
+
+    @staticmethod
+    def get_key(job: dict) -> tuple:
+        """Get key of the account of a job.
+
+        :param job: {user, award, username, ...}
+        :return: (user, award, username)
+        """
+        return job["user"], job["award"], job["username"]
+
+    def _get_pool(self) -> RefreshWorkerPool:
+        """Get the worker pool. Start it with Configs at the first job.
+
+        :return: RefreshWorkerPool
+        """
+        if self.pool is None:
+            configs = self.art_db.get_configs()
+            self.pool = RefreshWorkerPool(cdp_url=self.cdp_url,
+                                          workers=int(configs["refresh_concurrency"]["conf_value"]),
+                                          session_store=get_session_store(art_db=self.art_db),
+                                          block_resources=configs["block_resources"]["conf_value"].strip().lower())
+        return self.pool
+
+    def submit(self, user: str, award: str, username: str, batch: dict = None) -> bool:
+        """Queue a balance update of an account.
+
+        :param user: name of user
+        :param award: award program
+        :param username: username or ID
+        :param batch: optional dict shared by the jobs of one request (i.e. Update All Balances).
+                      {remaining, cancelled, failed, unsaved, serial_baseline} are updated as its jobs finish
+                      (failed: not updated, see art_result; unsaved: updated but not written).
+        :return: False if the account is already queued or running, or its award program has no award script
+        """
+        key = (user, award, username)
+        if key in self.queued or key in self.running:
+            return False
+        award_info = self.art_db.get_award_info(award=award)
+        if not award_info["has_script"]:
+            return False
+        job = {
+            "user": user,
+            "award": award,
+            "username": username,
+            "account_info": self.art_db.get_account_info(user=user, award=award, username=username),
+            "award_info": award_info,
+            "batch": batch
+        }
+        if batch is not None:
+            batch["remaining"] = batch.get("remaining", 0) + 1
+            batch.setdefault("cancelled", 0)
+            batch.setdefault("failed", 0)
+            batch.setdefault("unsaved", 0)
+            batch.setdefault("serial_baseline", 0)
+        self.queued[key] = job
+        self._get_pool().submit(job)
+        return True
+
+    def cancel(self, user: str, award: str, username: str) -> bool:
+        """Cancel the update of an account. A queued update is removed; the result of a running update is
+        discarded (award scripts cannot be stopped in the middle).
+
+        :param user: name of user
+        :param award: award program
+        :param username: username or ID
+        :return: True if the account was queued or running
+        """
+        key = (user, award, username)
+        job = self.queued.get(key) or self.running.get(key)
+        if job is None:
+            return False
+        self.pool.cancel(job)
+        return True
+
+    def cancel_all(self) -> None:
+        """Cancel all queued and running updates."""
+        for user, award, username in list(self.queued) + list(self.running):
+            self.cancel(user=user, award=award, username=username)
+
+    def get_status(self) -> dict:
+        """Get jobs in progress and accounts which were not updated.
+
+        :return: {running: [(user, award, username)], queued: [(user, award, username)],
+                  failed: {(user, award, username): status (see art_result) or "not saved"}}
+        """
+        return {"running": list(self.running), "queued": list(self.queued), "failed": dict(self.failed)}
+
+    def poll(self, on_prompt=None) -> [dict]:
+        """Handle all events of the worker pool without waiting. Call from the GUI thread.
+
+        Finished balances are written to the database unless cancelled or failed (see art_result).
+
+        :param on_prompt: callback(title, message) -> answer for award scripts asking input (i.e. passcode)
+        :return: events of the worker pool (see RefreshWorkerPool).
+                 "finished" and "cancelled" events have cancelled (True if the result is discarded);
+                 saved of "finished" events is True if the balance was written.
+        """
+        events = []
+        # balances finished since the last poll are written at once
+        balances = []
+        finished = []
+        while self.pool is not None:
+            try:
+                event = self.pool.events.get_nowait()
+            except queue.Empty:
+                break
+            job = event["job"]
+            key = self.get_key(job)
+            if event["event"] == "started":
+                self.queued.pop(key, None)
+                self.running[key] = job
+            elif event["event"] == "prompt":
+                if on_prompt is None or job.get("cancelled", False):
+                    event["answer"].put(None)
+                else:
+                    event["answer"].put(on_prompt(event["title"], event["message"]))
+            elif event["event"] in ["finished", "cancelled"]:
+                self.queued.pop(key, None)
+                self.running.pop(key, None)
+                event["cancelled"] = job.get("cancelled", False)
+                if not event["cancelled"] and event["award_data"]["status"] != STATUS_OK:
+                    # a failed update keeps the last balance
+                    self.failed[key] = event["award_data"]["status"]
+                    print(f"Could not update {job['award']} ({job['username']}): {event['award_data']['error']}")
+                    if job["batch"] is not None:
+                        job["batch"]["failed"] += 1
+                elif not event["cancelled"]:
+                    self.failed.pop(key, None)
+                    finished.append(event)
+                    balances.append({
+                        "user": job["user"],
+                        "award": job["award"],
+                        "username": job["username"],
+                        "balance": event["award_data"]["balance"],
+                        "expire_date": event["award_data"]["expire_date"]
+                    })
+                if job["batch"] is not None:
+                    job["batch"]["remaining"] -= 1
+                    job["batch"]["cancelled"] += 1 if event["cancelled"] else 0
+                    job["batch"]["serial_baseline"] += event.get("elapsed", 0)
+            events.append(event)
+        if len(balances) > 0:
+            saved = True
+            try:
+                self.art_db.add_balances(balances)
+            except Exception as e:
+                saved = False
+                print(f"Could not save {len(balances)} balances: {e}")
+            for event in finished:
+                event["saved"] = saved
+                if not saved:
+                    self.failed[self.get_key(event["job"])] = "not saved"
+                    if event["job"]["batch"] is not None:
+                        event["job"]["batch"]["unsaved"] += 1
+        return events
+
+    def close(self) -> None:
+        """Cancel all updates and stop worker threads without waiting for running award scripts."""
+        if self.pool is None:
+            return
+        self.cancel_all()
+        # answer prompts which are waiting so that workers can finish
+        self.poll()
+        self.pool.close(wait=False)
+
+
+def get_refresh_jobs(art_db: ARTDatabase, user: str = None, accounts: [dict] = None) -> [dict]:
+    """Get jobs to refresh all accounts of a user or of all users.
+
+    :param art_db: ART database
+    :param user: name of user. If user is None, all accounts of all users
+    :param accounts: list of {user, award, username} to refresh instead of all accounts of user
+    :return: list of {user, award, username, account_info, award_info}
+             (accounts of award programs without an award script are skipped)
+    """
+    jobs = []
+    if accounts is None:
+        accounts = art_db.get_accounts(user=user)
+    for account in accounts:
+        award_info = art_db.get_award_info(award=account["award"])
+        if not award_info["has_script"]:
+            continue
+        jobs.append({
+            "user": account["user"],
+            "award": account["award"],
+            "username": account["username"],
+            "account_info": art_db.get_account_info(user=account["user"],
+                                                    award=account["award"],
+                                                    username=account["username"]),
+            "award_info": award_info
+        })
+    return jobs
+
+
+def get_session_store(art_db: ARTDatabase) -> SessionStore | None:
+    """Get saved log in sessions if Configs.session_cache is enabled.
+
+    :param art_db: ART database
+    :return: SessionStore or None if disabled
+    """
+    configs = art_db.get_configs()
+    if configs["session_cache"]["conf_value"].strip().lower() not in ["yes", "y", "true", "1"]:
+        return None
+    return SessionStore(directory=configs["session_directory"]["conf_value"])
+
+
+def refresh_all_balances(art_db: ARTDatabase, cdp_url: str, user: str = None, concurrency: int = None,
+                         isolate_contexts: bool = True, on_result=None, on_prompt=None,
+                         accounts: [dict] = None) -> dict:
+    """Update balances of all accounts of a user (or all users) with concurrent award scripts.
+
+    Balances are written to the database (add_balance) by the workers as each award script finishes;
+    failed updates (see art_result) are not written.
+
+    :param art_db: ART database
+    :param cdp_url: Chrome debug URL, i.e. http://localhost:12345
+    :param user: name of user. If user is None, all accounts of all users
+    :param concurrency: number of concurrent pages. If None, use Configs.refresh_concurrency
+    :param isolate_contexts: run every account in a new browser context (see RefreshWorkerPool)
+    :param on_result: optional callback(job, award_data) called after each update (award_data has status)
+    :param on_prompt: optional callback(title, message) -> answer for award scripts asking input (i.e. passcode).
+                      If None, award scripts get None.
+    :param accounts: list of {user, award, username} to update instead of all accounts of user
+    :return: {accounts, concurrency, wall_clock, serial_baseline, speedup, failed, unsaved, results}
+             failed is the number of accounts which were not updated (results with status other than "ok");
+             unsaved is the number of balances which were updated but not written (saved of results is False).
+             serial_baseline is the sum of each script's time, i.e. the time to update one by one.
+             results has resources (requests & bytes, see ResourceBlocker.report()) if resources are blocked.
+    """
+    configs = art_db.get_configs()
+    if concurrency is None:
+        concurrency = int(configs["refresh_concurrency"]["conf_value"])
+    jobs = get_refresh_jobs(art_db=art_db, user=user, accounts=accounts)
+    started = time.perf_counter()
+    results = []
+    if len(jobs) > 0:
+        pool = RefreshWorkerPool(cdp_url=cdp_url,
+                                 workers=min(concurrency, len(jobs)),
+                                 isolate_contexts=isolate_contexts,
+                                 session_store=get_session_store(art_db=art_db),
+                                 block_resources=configs["block_resources"]["conf_value"].strip().lower(),
+                                 art_db=art_db)
+        for job in jobs:
+            pool.submit(job)
+        while len(results) < len(jobs):
+            event = pool.events.get()
+            if event["event"] == "prompt":
+                event["answer"].put(None if on_prompt is None else on_prompt(event["title"], event["message"]))
+            if event["event"] != "finished":
+                continue
+            job = event["job"]
+            award_data = event["award_data"]
+            results.append({
+                "user": job["user"],
+                "award": job["award"],
+                "username": job["username"],
+                "status": award_data["status"],
+                "error": award_data["error"],
+                "attempts": award_data["attempts"],
+                "balance": award_data["balance"],
+                "saved": event["saved"],
+                "elapsed": event["elapsed"],
+                "resources": award_data.get("resources")
+            })
+            if on_result is not None:
+                on_result(job, award_data)
+        pool.close()
+    wall_clock = time.perf_counter() - started
+    serial_baseline = sum(result["elapsed"] for result in results)
+    return {
+        "accounts": len(jobs),
+        "concurrency": concurrency,
+        "wall_clock": wall_clock,
+        "serial_baseline": serial_baseline,
+        "speedup": serial_baseline / wall_clock if wall_clock > 0 else 0,
+        "failed": sum(1 for result in results if result["status"] != STATUS_OK),
+        "unsaved": sum(1 for result in results if result["status"] == STATUS_OK and not result["saved"]),
+        "results": results
+    }
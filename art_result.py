@@ -0,0 +1,239 @@
+"""Results of award scripts: every update ends with a status, and only "ok" results have a balance to save.
+
+    * ok: award_data of the award script (balance, expire_date, ...)
+    * failed: the award script raised an error or found no balance in every attempt (i.e. the web site changed)
+    * needs_otp: the award script asked a passcode and got no answer (i.e. nobody at a nightly update)
+    * blocked: not tried, since the award program failed too many times in a row (see CircuitBreaker). An update
+      whose own failures paused the award program is failed, not blocked.
+
+A failed attempt is tried again after BACKOFF_SECONDS, doubled at each retry (an award script may set RETRIES
+to change the number of retries of its award program). An attempt which asked a passcode is not tried again
+not to send another passcode. Award scripts start with balance None, and an attempt which ends without a balance
+fails. Results which are not ok have balance None, so they are never written as 0.
+"""
+import asyncio
+import threading
+import time
+
+from awards._registry import registry
+
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+STATUS_NEEDS_OTP = "needs_otp"
+STATUS_BLOCKED = "blocked"
+
+# retries after the first attempt (default of award scripts without RETRIES)
+RETRIES = 2
+# seconds before the first retry; doubled at each retry
+BACKOFF_SECONDS = 5
+# failures in a row which pause an award program
+CIRCUIT_FAILURES = 5
+# seconds an award program is paused
+CIRCUIT_COOLDOWN = 30 * 60
+
+
+def make_result(status: str, error: str = None, attempts: int = 0) -> dict:
+    """Get a result without a balance.
+
+    :param status: STATUS_FAILED, STATUS_NEEDS_OTP or STATUS_BLOCKED
+    :param error: reason
+    :param attempts: attempts made
+    :return: {balance (None), expire_date (None), status, error, attempts}
+    """
+    return {"balance": None, "expire_date": None, "status": status, "error": error, "attempts": attempts}
+
+
+def check_balance(award_data: dict) -> dict:
+    """Check an award script found a balance.
+
+    :param award_data: award_data of an attempt
+    :return: award_data
+    """
+    if award_data.get("balance") is None:
+        # i.e. the balance element was not found; a failed update is not written as 0
+        raise LookupError("No balance found")
+    return award_data
+
+
+def get_retries(script: str) -> int:
+    """Get retries of an award script.
+
+    :param script: name of award script
+    :return: RETRIES of the award script or the default
+    """
+    return getattr(registry.get_module(script), "RETRIES", RETRIES)
+
+
+class CircuitBreaker(object):
+    """Pause an award program after CIRCUIT_FAILURES failed attempts in a row, for CIRCUIT_COOLDOWN seconds.
+    After the pause, one more failure pauses it again. Shared by all workers (thread-safe).
+    """
+
+    def __init__(self, failures: int = CIRCUIT_FAILURES, cooldown: float = CIRCUIT_COOLDOWN):
+        """Initial function.
+
+        :param failures: failures in a row to pause an award program
+        :param cooldown: seconds to pause
+        """
+        self.failures = failures
+        self.cooldown = cooldown
+        # {script: {failures, opened (time.monotonic() when paused or None)}}
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def allow(self, script: str) -> bool:
+        """Check an award script may run.
+
+        :param script: name of award script
+        :return: False if the award program is paused
+        """
+        with self._lock:
+            state = self._states.get(script)
+            if state is None or state["opened"] is None:
+                return True
+            if time.monotonic() - state["opened"] < self.cooldown:
+                return False
+            # try again; one more failure pauses it again
+            state["opened"] = None
+            state["failures"] = self.failures - 1
+            return True
+
+    def record(self, script: str, ok: bool) -> None:
+        """Record an attempt of an award script.
+
+        :param script: name of award script
+        :param ok: True if it succeeded
+        """
+        with self._lock:
+            if ok:
+                self._states.pop(script, None)
+                return
+            state = self._states.setdefault(script, {"failures": 0, "opened": None})
+            state["failures"] += 1
+            if state["failures"] >= self.failures and state["opened"] is None:
+                state["opened"] = time.monotonic()
+                print(f"{script} failed {state['failures']} times in a row; "
+                      f"paused for {self.cooldown / 60:.0f} minutes")
+
+    def get_paused(self) -> [str]:
+        """Get paused award scripts.
+
+        :return: names of award scripts
+        """
+        with self._lock:
+            return [
+                script for script, state in self._states.items()
+                if state["opened"] is not None and time.monotonic() - state["opened"] < self.cooldown
+            ]
+
+
+class _Attempt(object):
+    """One attempt of an award script: its prompt is tracked to tell a missing passcode from an error."""
+
+    def __init__(self, prompt=None):
+        """Initial function.
+
+        :param prompt: function(title, message) -> answer asking input of the award script. If None, no answer
+        """
+        self.prompt = prompt
+        self.answers = []
+
+    def ask(self, title: str, message: str) -> str | None:
+        """Prompt for the award script.
+
+        :param title: title of dialog
+        :param message: message of dialog
+        :return: answer or None
+        """
+        answer = None if self.prompt is None else self.prompt(title, message)
+        self.answers.append(answer)
+        return answer
+
+    def get_failure(self, script: str, error: Exception, breaker: CircuitBreaker = None, attempts: int = 1) -> dict:
+        """Get the result of a failed attempt and record it.
+
+        :param script: name of award script
+        :param error: error of the award script
+        :param breaker: circuit breaker
+        :param attempts: attempts made
+        :return: result. Its status is STATUS_FAILED (retry unless a passcode was asked) or STATUS_NEEDS_OTP
+        """
+        if len(self.answers) > 0 and self.answers[-1] is None:
+            return make_result(status=STATUS_NEEDS_OTP, error=f"No passcode: {error}", attempts=attempts)
+        if breaker is not None:
+            breaker.record(script=script, ok=False)
+        result = make_result(status=STATUS_FAILED, error=f"{type(error).__name__}: {error}", attempts=attempts)
+        # not to send another passcode
+        result["retry"] = len(self.answers) == 0
+        return result
+
+
+def get_result(attempt, script: str, prompt=None, breaker: CircuitBreaker = None, retries: int = None) -> dict:
+    """Run an award script with retries.
+
+    :param attempt: function(prompt) -> award_data running the award script once (errors are raised). An attempt
+                    without a balance (None) fails
+    :param script: name of award script
+    :param prompt: function(title, message) -> answer asking input of the award script
+    :param breaker: circuit breaker shared by updates. If None, award programs are never paused
+    :param retries: retries after the first attempt. If None, see get_retries()
+    :return: award_data with status, error and attempts (see make_result() if not ok)
+    """
+    retries = get_retries(script) if retries is None else retries
+    result = None
+    for index in range(retries + 1):
+        if breaker is not None and not breaker.allow(script):
+            # failed, if its own failures paused the award program
+            if result is not None:
+                return result
+            return make_result(status=STATUS_BLOCKED, error=f"{script} is paused after failures", attempts=index)
+        if index > 0:
+            time.sleep(BACKOFF_SECONDS * 2 ** (index - 1))
+        tracker = _Attempt(prompt=prompt)
+        try:
+            award_data = check_balance(attempt(tracker.ask))
+        except Exception as e:
+            result = tracker.get_failure(script=script, error=e, breaker=breaker, attempts=index + 1)
+            if result.pop("retry", False):
+                continue
+            return result
+        if breaker is not None:
+            breaker.record(script=script, ok=True)
+        return {**award_data, "status": STATUS_OK, "error": None, "attempts": index + 1}
+    return result
+
+
+async def get_result_async(attempt, script: str, prompt=None, breaker: CircuitBreaker = None,
+                           retries: int = None) -> dict:
+    """Run an async award script with retries (see get_result()).
+
+    :param attempt: async function(prompt) -> award_data running the award script once (errors are raised). An
+                    attempt without a balance (None) fails
+    :param script: name of award script
+    :param prompt: function(title, message) -> answer asking input of the award script
+    :param breaker: circuit breaker shared by updates. If None, award programs are never paused
+    :param retries: retries after the first attempt. If None, see get_retries()
+    :return: award_data with status, error and attempts (see make_result() if not ok)
+    """
+    retries = get_retries(script) if retries is None else retries
+    result = None
+    for index in range(retries + 1):
+        if breaker is not None and not breaker.allow(script):
+            # failed, if its own failures paused the award program
+            if result is not None:
+                return result
+            return make_result(status=STATUS_BLOCKED, error=f"{script} is paused after failures", attempts=index)
+        if index > 0:
+            await asyncio.sleep(BACKOFF_SECONDS * 2 ** (index - 1))
+        tracker = _Attempt(prompt=prompt)
+        try:
+            award_data = check_balance(await attempt(tracker.ask))
+        except Exception as e:
+            result = tracker.get_failure(script=script, error=e, breaker=breaker, attempts=index + 1)
+            if result.pop("retry", False):
+                continue
+            return result
+        if breaker is not None:
+            breaker.record(script=script, ok=True)
+        return {**award_data, "status": STATUS_OK, "error": None, "attempts": index + 1}
+    return result
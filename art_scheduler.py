@@ -0,0 +1,202 @@
+"""Update balances automatically: accounts are queued by how soon they need an update.
+
+An account is due when its latest balance is older than the refresh cadence of its award program, or when its
+points expire within EXPIRE_MARGIN_DAYS (updated at most once a day). The queue is a heap ordered by the date an
+account became due, so the most stale balances and the nearest expirations are updated first. Configs:
+    * auto_refresh: yes/no
+    * auto_refresh_days: days between updates, i.e. "7; Marriott Bonvoy=3" (7 days, but 3 for Marriott Bonvoy)
+    * auto_refresh_budget: minutes of a run. Accounts not started in time wait for the next run.
+
+Jobs are dispatched through BackgroundRefresher (award scripts run on its workers), so the GUI is not blocked.
+An account whose last update failed waits FAILURE_BACKOFF (doubled at each failure in a row) before it is
+updated automatically again, and an account which needed a passcode is not updated automatically until it is
+updated by the user (a passcode dialog is not opened at every run while the user is away).
+"""
+import heapq
+import time
+from datetime import date, timedelta
+
+from art_db import ARTDatabase
+from art_refresh import BackgroundRefresher
+from art_result import STATUS_NEEDS_OTP, STATUS_OK
+
+# seconds between scheduled runs (due accounts are checked again after a run)
+SCHEDULE_INTERVAL = 15 * 60
+# days before the expected expire date to update an account regardless of its cadence
+EXPIRE_MARGIN_DAYS = 30
+# seconds before an account whose update failed is updated automatically again; doubled at each failure in a row
+FAILURE_BACKOFF = 60 * 60
+# longest wait after failures
+FAILURE_BACKOFF_MAX = 24 * 60 * 60
+
+
+def parse_cadence(value: str) -> tuple:
+    """Parse Configs.auto_refresh_days.
+
+    :param value: days for all award programs and/or per award program, i.e. "7; Marriott Bonvoy=3"
+    :return: (default days, {award: days})
+    """
+    default_days = 7
+    award_days = {}
+    for part in value.split(";"):
+        part = part.strip()
+        if part == "":
+            continue
+        award, _, days = part.rpartition("=")
+        try:
+            days = max(1, int(days))
+        except ValueError:
+            print(f"Ignored automatic update cadence: {part}")
+            continue
+        if award.strip() == "":
+            default_days = days
+        else:
+            award_days[award.strip()] = days
+    return default_days, award_days
+
+
+def get_due_date(account: dict, cadence_days: int) -> date:
+    """Get the date an account needs an update.
+
+    :param account: {updated, expected_expire} (see ARTDatabase.get_refresh_candidates())
+    :param cadence_days: days between updates of the award program
+    :return: due date. date.min if the account has no balance yet
+    """
+    if account["updated"] is None:
+        return date.min
+    due_date = account["updated"] + timedelta(days=cadence_days)
+    if account["expected_expire"] is not None:
+        due_date = min(due_date, account["expected_expire"] - timedelta(days=EXPIRE_MARGIN_DAYS))
+    # once a day at most (a balance about to expire stays due until the next day)
+    return max(due_date, account["updated"] + timedelta(days=1))
+
+
+def get_due_accounts(art_db: ARTDatabase, today: date = None) -> [dict]:
+    """Get accounts which need an update, most urgent first.
+
+    :param art_db: ART database
+    :param today: date to compare with. If None, today
+    :return: list of {user, award, username, updated, expected_expire, due_date}
+    """
+    today = date.today() if today is None else today
+    cadence = art_db.get_configs("auto_refresh_days")["auto_refresh_days"]["conf_value"]
+    default_days, award_days = parse_cadence(cadence)
+    queue = []
+    for account in art_db.get_refresh_candidates():
+        due_date = get_due_date(account=account, cadence_days=award_days.get(account["award"], default_days))
+        if due_date <= today:
+            # the older balance first if due on the same date
+            heapq.heappush(queue, (due_date, account["updated"] or date.min, len(queue), account))
+    due_accounts = []
+    while len(queue) > 0:
+        due_date, _, _, account = heapq.heappop(queue)
+        due_accounts.append({**account, "due_date": due_date})
+    return due_accounts
+
+
+class RefreshScheduler(object):
+    """Update due accounts on BackgroundRefresher within a time budget. Call tick() from the GUI thread
+    (i.e. after BackgroundRefresher.poll()); it does not wait for award scripts.
+
+    Jobs are submitted a few at a time (up to Configs.refresh_concurrency of the run at once), so balances the
+    user asks for are not queued behind a whole run and no job starts after the budget is over.
+    """
+
+    def __init__(self, art_db: ARTDatabase, refresher: BackgroundRefresher):
+        """Initial function. The first run starts at the first tick().
+
+        :param art_db: ART database
+        :param refresher: background refresher of the GUI
+        """
+        self.art_db = art_db
+        self.refresher = refresher
+        # {started, deadline, accounts (not submitted yet), batch} of the current run
+        self.run = None
+        self.next_run = time.monotonic()
+        # {(user, award, username): {status, failures, retry_at (time.monotonic())}} of accounts whose last
+        # update (automatic or not) was not ok
+        self.attempts = {}
+
+    def is_enabled(self) -> bool:
+        """Check Configs.auto_refresh.
+
+        :return: True if balances are updated automatically
+        """
+        value = self.art_db.get_configs("auto_refresh")["auto_refresh"]["conf_value"]
+        return value.strip().lower() in ["yes", "y", "true", "1"]
+
+    def record(self, events: [dict]) -> None:
+        """Record the last update of accounts. Call with the events of BackgroundRefresher.poll().
+
+        :param events: events of BackgroundRefresher.poll()
+        """
+        for event in events:
+            if event["event"] != "finished" or event["cancelled"]:
+                continue
+            key = BackgroundRefresher.get_key(event["job"])
+            status = event["award_data"]["status"]
+            if status == STATUS_OK:
+                self.attempts.pop(key, None)
+                continue
+            failures = self.attempts.get(key, {}).get("failures", 0) + 1
+            self.attempts[key] = {
+                "status": status,
+                "failures": failures,
+                "retry_at": time.monotonic() + min(FAILURE_BACKOFF * 2 ** (failures - 1), FAILURE_BACKOFF_MAX)
+            }
+
+    def is_held(self, account: dict) -> bool:
+        """Check an account waits after its last update was not ok.
+
+        :param account: {user, award, username}
+        :return: True if it needed a passcode, or failed and its backoff is not over
+        """
+        attempt = self.attempts.get((account["user"], account["award"], account["username"]))
+        if attempt is None:
+            return False
+        return attempt["status"] == STATUS_NEEDS_OTP or time.monotonic() < attempt["retry_at"]
+
+    def start_run(self) -> None:
+        """Queue due accounts for a run."""
+        configs = self.art_db.get_configs()
+        now = time.monotonic()
+        self.run = {
+            "started": now,
+            "deadline": now + float(configs["auto_refresh_budget"]["conf_value"]) * 60,
+            "concurrency": int(configs["refresh_concurrency"]["conf_value"]),
+            "accounts": [account for account in get_due_accounts(art_db=self.art_db) if not self.is_held(account)],
+            # scheduled runs are not reported in a dialog (see ART.poll_refresher)
+            "batch": {"remaining": 0, "reported": True},
+            "submitted": 0
+        }
+
+    def finish_run(self) -> None:
+        """End the current run and schedule the next one."""
+        run = self.run
+        print(f"DEBUG MODE >> Automatic update: {run['submitted']} accounts in "
+              f"{time.monotonic() - run['started']:.1f} s, {len(run['accounts'])} left for the next run")
+        self.run = None
+        self.next_run = time.monotonic() + SCHEDULE_INTERVAL
+
+    def tick(self) -> bool:
+        """Start a run if it is time, then submit due accounts while the run has budget.
+
+        :return: True if any account was submitted
+        """
+        if self.run is None:
+            if time.monotonic() < self.next_run or not self.is_enabled():
+                return False
+            self.start_run()
+        run = self.run
+        submitted = False
+        while (len(run["accounts"]) > 0 and run["batch"]["remaining"] < run["concurrency"]
+               and time.monotonic() < run["deadline"]):
+            account = run["accounts"].pop(0)
+            # False if it is already being updated (i.e. by the user) or its award script was removed
+            if self.refresher.submit(user=account["user"], award=account["award"], username=account["username"],
+                                     batch=run["batch"]):
+                run["submitted"] += 1
+                submitted = True
+        if run["batch"]["remaining"] == 0 and (len(run["accounts"]) == 0 or time.monotonic() >= run["deadline"]):
+            self.finish_run()
+        return submitted
@@ -8,6 +8,7 @@ How to use:
 """
 
 from importlib import import_module
+import os
 import sys
 
 if __name__ == "__main__":
@@ -23,7 +24,9 @@ if __name__ == "__main__":
     playwright = sync_playwright().start()
     browser = playwright.chromium.connect_over_cdp(f"http://localhost:{port}")
 
-    script = import_module(sys.argv[1])
+    # award scripts import shared helpers from awards package
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    script = import_module(f"awards.{sys.argv[1]}")
     account_info = {}
     for arg in sys.argv[2:]:
         account_info[arg.split("=")[0]] = arg.split("=")[1]
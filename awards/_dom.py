@@ -0,0 +1,99 @@
+"""Element lookup helpers for award scripts.
+
+Looping over page.query_selector_all() and calling inner_text() on every element costs one CDP round trip
+per element (thousands for "div"). These helpers find, click, fill and read elements by text or role
+with a single page.evaluate() or locator call per operation.
+
+target can be a page, a frame or a locator.
+"""
+import re
+
+
+def read_texts(target, selector: str, contains: str = None) -> [str]:
+    """Read innerText of all matching elements at once.
+
+    :param target: page, frame or locator to search
+    :param selector: CSS selector
+    :param contains: if set, only texts containing this string (filtered in the page)
+    :return: list of innerText
+    """
+    return target.locator(selector).evaluate_all(
+        "(elements, contains) => elements"
+        "   .map(element => element.innerText || '')"
+        "   .filter(text => contains === null || text.includes(contains))",
+        contains
+    )
+
+
+def search_text(target, selector: str, pattern: str, contains: str = None) -> re.Match | None:
+    """Find the first matching element text for a regular expression.
+
+    :param target: page, frame or locator to search
+    :param selector: CSS selector
+    :param pattern: Python regular expression
+    :param contains: if set, only texts containing this string are sent back from the page
+    :return: match of the first matching text or None
+    """
+    regex = re.compile(pattern)
+    return next(
+        (match for match in map(regex.search, read_texts(target, selector, contains)) if match is not None),
+        None
+    )
+
+
+def read_text(target, selector: str) -> str:
+    """Read innerText of the first matching element.
+
+    :param target: page, frame or locator to search
+    :param selector: CSS selector
+    :return: innerText
+    """
+    return target.locator(selector).first.inner_text()
+
+
+def by_text(target, selector: str, text: str, exact: bool = True, visible: bool = False):
+    """Get a locator of elements by text.
+
+    :param target: page, frame or locator to search
+    :param selector: CSS selector
+    :param text: text of element
+    :param exact: True to match the whole text (whitespace trimmed); False to match a substring
+    :param visible: True for visible elements only
+    :return: Playwright locator of the first matching element
+    """
+    has_text = re.compile(rf"^\s*{re.escape(text)}\s*$") if exact else text
+    if visible:
+        selector = f"{selector} >> visible=true"
+    return target.locator(selector, has_text=has_text).first
+
+
+def click_text(target, selector: str, text: str, exact: bool = True, visible: bool = False) -> None:
+    """Click an element by text.
+
+    :param target: page, frame or locator to search
+    :param selector: CSS selector
+    :param text: text of element
+    :param exact: True to match the whole text; False to match a substring
+    :param visible: True for visible elements only
+    """
+    by_text(target=target, selector=selector, text=text, exact=exact, visible=visible).click()
+
+
+def click_role(target, role: str, name: str) -> None:
+    """Click an element by ARIA role and accessible name.
+
+    :param target: page, frame or locator to search
+    :param role: ARIA role, i.e. "button", "link"
+    :param name: accessible name
+    """
+    target.get_by_role(role, name=name).first.click()
+
+
+def fill(target, selector: str, value: str) -> None:
+    """Fill an input.
+
+    :param target: page, frame or locator to search
+    :param selector: CSS selector of the input
+    :param value: text to fill
+    """
+    target.locator(selector).first.fill(value)
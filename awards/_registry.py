@@ -0,0 +1,139 @@
+"""Registry of award scripts: modules in awards directory whose name does not start with "_".
+
+Each award script describes its award program in AWARD_PROGRAM:
+
+    AWARD_PROGRAM = {
+        "category": "Credit Cards",              # one of ARTDatabase.AWARD_CATEGORIES
+        "award": "Chase Ultimate Rewards",       # name shown in ART (Awards.award)
+        "expire": 0,                             # points expire in months of no activity (0 for not expire)
+        "note": "",
+        "required_fields": [["username", "Username"], ["password", "Password"]]   # [name, label] to log in
+    }
+
+AWARD_PROGRAM must be a literal: it is read from the file without importing the award script, so that
+describing award programs does not need the libraries of every award script. ARTDatabase syncs them to
+Awards table (see ARTDatabase.sync_award_programs()). The manifest hash covers the files of all award
+scripts, so the sync is skipped at startup unless a script is changed. Award scripts are imported once,
+when they are first used, and kept loaded.
+"""
+import ast
+import hashlib
+import os
+import threading
+from importlib import import_module
+
+AWARDS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+class AwardRegistry(object):
+    """Discover, describe and load award scripts."""
+
+    def __init__(self, directory: str = AWARDS_DIRECTORY, package: str = "awards"):
+        """Initial function. Nothing is read until it is needed.
+
+        :param directory: directory of award scripts
+        :param package: package name of award scripts
+        """
+        self.directory = directory
+        self.package = package
+        self._scripts = None
+        self._manifest_hash = None
+        self._modules = {}
+        self._lock = threading.Lock()
+
+    def get_scripts(self) -> [str]:
+        """Get names of all award scripts (files are listed once).
+
+        :return: names of award scripts, i.e. ["aa", "alaska", ...]
+        """
+        if self._scripts is None:
+            self._scripts = sorted(
+                file_name[:-len(".py")] for file_name in os.listdir(self.directory)
+                if file_name.endswith(".py") and not file_name.startswith("_")
+            )
+        return self._scripts
+
+    def has_script(self, script: str) -> bool:
+        """Check an award script exists.
+
+        :param script: name of award script
+        :return: True if exists
+        """
+        return script in self.get_scripts()
+
+    def get_manifest_hash(self) -> str:
+        """Get a hash of all award script files. It changes when a script is added, removed or changed.
+
+        :return: SHA-256 hex digest
+        """
+        if self._manifest_hash is None:
+            digest = hashlib.sha256()
+            for script in self.get_scripts():
+                digest.update(script.encode())
+                digest.update(hashlib.sha256(self._read(script)).digest())
+            self._manifest_hash = digest.hexdigest()
+        return self._manifest_hash
+
+    def _read(self, script: str) -> bytes:
+        """Read the file of an award script.
+
+        :param script: name of award script
+        :return: file content
+        """
+        with open(os.path.join(self.directory, f"{script}.py"), "rb") as f:
+            return f.read()
+
+    def get_award_program(self, script: str) -> dict | None:
+        """Read AWARD_PROGRAM of an award script without importing it.
+
+        :param script: name of award script
+        :return: AWARD_PROGRAM or None if the award script has none
+        """
+        for node in ast.parse(self._read(script)).body:
+            if isinstance(node, ast.Assign) and any(
+                    isinstance(target, ast.Name) and target.id == "AWARD_PROGRAM" for target in node.targets):
+                return ast.literal_eval(node.value)
+        return None
+
+    def get_module(self, script: str):
+        """Get the module of an award script. It is imported at the first call only.
+
+        :param script: name of award script
+        :return: module
+        """
+        module = self._modules.get(script)
+        if module is None:
+            if not self.has_script(script):
+                raise ModuleNotFoundError(f"No award script: {script}")
+            with self._lock:
+                module = self._modules.get(script)
+                if module is None:
+                    module = import_module(f"{self.package}.{script}")
+                    self._modules[script] = module
+        return module
+
+    def get_programs(self) -> [dict]:
+        """Get award programs described by all award scripts.
+
+        :return: list of {script, category, award, expire, note, required_field_names, required_field_displays}
+        """
+        programs = []
+        for script in self.get_scripts():
+            program = self.get_award_program(script)
+            if program is None:
+                print(f"Award script {script} has no AWARD_PROGRAM; it is not listed")
+                continue
+            programs.append({
+                "script": script,
+                "category": program["category"],
+                "award": program["award"],
+                "expire": program["expire"],
+                "note": program.get("note", ""),
+                "required_field_names": [name for name, _ in program["required_fields"]],
+                "required_field_displays": [label for _, label in program["required_fields"]]
+            })
+        return programs
+
+
+# award scripts of ART
+registry = AwardRegistry()
@@ -0,0 +1,170 @@
+"""Record an award script against the live site once, then replay it offline.
+
+record() runs get_balance() in a browser context which saves every response to a HAR file, together with
+a JSON file of what else the run needs (account info, award info, passcode answers and the balance found).
+replay() serves the HAR file through Playwright routing (route_from_har): requests which are not in the
+recording are aborted, so get_balance() runs the same way on a machine without network.
+
+Recordings contain passwords and session cookies of the account. They are saved in RECORDING_DIRECTORY
+(not in the repository) and only the owner can read them.
+
+How to use:
+    python awards/_replay.py record <script name> <arg> <arg> ...
+        arg: (account_info field name)=(value), as _awards_script_test.py
+    python awards/_replay.py replay <script name>
+"""
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+RECORDING_DIRECTORY = "~/.art/recordings"
+
+
+def get_paths(script: str, directory: str = RECORDING_DIRECTORY) -> [str, str]:
+    """Get file paths of a recording.
+
+    :param script: name of award script
+    :param directory: directory of recordings
+    :return: [HAR file path, JSON file path]
+    """
+    directory = os.path.expanduser(directory)
+    return [os.path.join(directory, f"{script}.har"), os.path.join(directory, f"{script}.json")]
+
+
+def get_recorded_scripts(directory: str = RECORDING_DIRECTORY) -> [str]:
+    """Get award scripts which have a recording.
+
+    :param directory: directory of recordings
+    :return: names of award scripts
+    """
+    directory = os.path.expanduser(directory)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        file_name[:-len(".json")] for file_name in os.listdir(directory)
+        if file_name.endswith(".json") and os.path.exists(os.path.join(directory, file_name[:-len(".json")] + ".har"))
+    )
+
+
+def record(browser, script: str, account_info: dict, award_info: dict, directory: str = RECORDING_DIRECTORY,
+           prompt=None) -> dict:
+    """Run an award script against the live site and record it.
+
+    :param browser: Playwright browser (launched or connected over CDP)
+    :param script: name of award script
+    :param account_info: account information (real credentials)
+    :param award_info: award information
+    :param directory: directory of recordings
+    :param prompt: function(title, message) asking a passcode. If None, the default of the award script
+    :return: dict output from awards.XYZ.get_balance()
+    """
+    har_path, meta_path = get_paths(script=script, directory=directory)
+    os.makedirs(os.path.dirname(har_path), mode=0o700, exist_ok=True)
+    answers = []
+
+    def recording_prompt(title: str, message: str) -> str | None:
+        if prompt is None:
+            from tkinter import simpledialog
+            answer = simpledialog.askstring(title, message)
+        else:
+            answer = prompt(title, message)
+        answers.append(answer)
+        return answer
+
+    # imported here: awards package is on the path only after __main__ adds it
+    from awards._registry import registry
+
+    award_script = registry.get_module(script)
+    # embed response bodies so that one file is the whole recording
+    context = browser.new_context(record_har_path=har_path, record_har_content="embed")
+    try:
+        award_data = award_script.get_balance(browser=browser,
+                                              account_info=account_info,
+                                              award_info=award_info,
+                                              context=context,
+                                              prompt=recording_prompt)
+    finally:
+        # HAR file is written when the context is closed
+        context.close()
+    with open(meta_path, "w") as f:
+        json.dump({
+            "script": script,
+            "recorded": datetime.now().isoformat(timespec="seconds"),
+            "account_info": account_info,
+            "award_info": award_info,
+            "answers": answers,
+            "balance": award_data["balance"],
+            "expire_date": None if award_data["expire_date"] is None else award_data["expire_date"].isoformat()
+        }, f, indent=2, default=str)
+    for path in [har_path, meta_path]:
+        os.chmod(path, 0o600)
+    return award_data
+
+
+def load_recording(script: str, directory: str = RECORDING_DIRECTORY) -> dict:
+    """Load the JSON file of a recording.
+
+    :param script: name of award script
+    :param directory: directory of recordings
+    :return: {script, recorded, account_info, award_info, answers, balance, expire_date}
+    """
+    with open(get_paths(script=script, directory=directory)[1]) as f:
+        return json.load(f)
+
+
+def replay(browser, script: str, directory: str = RECORDING_DIRECTORY, **kwargs) -> dict:
+    """Run an award script against its recording (no network).
+
+    :param browser: Playwright browser, i.e. a headless Chromium launched by Playwright
+    :param script: name of award script
+    :param directory: directory of recordings
+    :param kwargs: additional arguments for awards.XYZ.get_balance()
+    :return: dict output from awards.XYZ.get_balance() with recording ({balance, expire_date} recorded)
+             and elapsed (seconds)
+    """
+    har_path = get_paths(script=script, directory=directory)[0]
+    recording = load_recording(script=script, directory=directory)
+    answers = list(recording["answers"])
+    from awards._registry import registry
+
+    award_script = registry.get_module(script)
+
+    context = browser.new_context()
+    context.route_from_har(har_path, not_found="abort")
+    try:
+        started = time.perf_counter()
+        award_data = award_script.get_balance(browser=browser,
+                                              account_info=recording["account_info"],
+                                              award_info=recording["award_info"],
+                                              context=context,
+                                              prompt=lambda title, message: answers.pop(0) if answers else None,
+                                              **kwargs)
+        award_data["elapsed"] = time.perf_counter() - started
+    finally:
+        context.close()
+    award_data["recording"] = {"balance": recording["balance"], "expire_date": recording["expire_date"]}
+    return award_data
+
+
+if __name__ == "__main__":
+    from playwright.sync_api import sync_playwright
+
+    # award scripts import shared helpers from awards package
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    command, script_name = sys.argv[1], sys.argv[2]
+    playwright = sync_playwright().start()
+    if command == "record":
+        # a real Chrome window: some sites block headless browsers
+        browser = playwright.chromium.launch(channel="chrome", headless=False)
+        info = {}
+        for arg in sys.argv[3:]:
+            info[arg.split("=")[0]] = arg.split("=")[1]
+        # use a dummy expire date
+        print(record(browser=browser, script=script_name, account_info=info, award_info={"expire": 12}))
+    else:
+        browser = playwright.chromium.launch()
+        print(replay(browser=browser, script=script_name))
+    browser.close()
+    playwright.stop()
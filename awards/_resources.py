@@ -0,0 +1,136 @@
+"""Block resources award scripts do not need (images, fonts, video, ads and analytics beacons).
+
+A ResourceBlocker is attached to the browser context of an award script with route interception.
+Each award script may define RESOURCE_PROFILE to change the default profile:
+
+    RESOURCE_PROFILE = {
+        "block_types": ["image", "media", "font"],     # Playwright resource types to block
+        "allow_patterns": ["/login/captcha/"],          # URL substrings never blocked (checked first)
+        "deny_patterns": ["tracking.example.com"],      # URL substrings always blocked
+    }
+
+Set RESOURCE_PROFILE = None if a site does not work with blocked resources.
+"""
+
+# URL substrings of well-known ads, analytics & session replay services
+AD_AND_ANALYTICS_PATTERNS = [
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com", "google-analytics.com",
+    "googletagmanager.com", "analytics.google.com", "facebook.net", "connect.facebook.com", "bat.bing.com",
+    "ads.linkedin.com", "snap.licdn.com", "analytics.tiktok.com", "ads-twitter.com", "static.ads-twitter.com",
+    "hotjar.com", "quantummetric.com", "contentsquare.net", "fullstory.com", "clarity.ms", "demdex.net",
+    "omtrdc.net", "adobedtm.com", "everesttech.net", "criteo.com", "taboola.com", "outbrain.com",
+    "pinterest.com/ct", "scorecardresearch.com", "nr-data.net", "js-agent.newrelic.com", "optimizely.com",
+    "siteintercept.qualtrics.com", "tealiumiq.com", "tags.tiqcdn.com", "branch.io"
+]
+
+DEFAULT_PROFILE = {
+    "block_types": ["image", "media", "font"],
+    "allow_patterns": [],
+    "deny_patterns": AD_AND_ANALYTICS_PATTERNS
+}
+
+
+def get_profile(award_script) -> dict | None:
+    """Get resource blocking profile of an award script (module).
+
+    :param award_script: award script module
+    :return: profile (DEFAULT_PROFILE merged with RESOURCE_PROFILE) or None if the script disables blocking
+    """
+    profile = getattr(award_script, "RESOURCE_PROFILE", {})
+    if profile is None:
+        return None
+    return {
+        "block_types": profile.get("block_types", DEFAULT_PROFILE["block_types"]),
+        "allow_patterns": profile.get("allow_patterns", []),
+        "deny_patterns": DEFAULT_PROFILE["deny_patterns"] + profile.get("deny_patterns", [])
+    }
+
+
+class ResourceBlocker(object):
+    """Route interception blocking resources by type and URL pattern, counting requests and bytes."""
+
+    def __init__(self, profile: dict, dry_run: bool = False):
+        """Initial function.
+
+        :param profile: {block_types, allow_patterns, deny_patterns}
+        :param dry_run: True to load everything but count what would be blocked, including its size
+                        (the bytes blocking saves cannot be known without loading them)
+        """
+        self.profile = profile
+        self.dry_run = dry_run
+        self.requests = 0
+        self.blocked_requests = {}
+        self.loaded_bytes = 0
+        self.blocked_bytes = 0
+        self._would_block = set()
+
+    def attach(self, context) -> None:
+        """Start blocking resources of all pages of a browser context.
+
+        :param context: browser context (or a page)
+        """
+        context.route("**/*", self._on_route)
+        context.on("response", self._on_response)
+
+    async def attach_async(self, context) -> None:
+        """Start blocking resources of all pages of a browser context of Playwright async API.
+
+        :param context: browser context (or a page)
+        """
+        await context.route("**/*", self._on_route)
+        context.on("response", self._on_response)
+
+    def is_blocked(self, url: str, resource_type: str) -> bool:
+        """Check a request is blocked by the profile.
+
+        :param url: request URL
+        :param resource_type: Playwright resource type, i.e. "image", "script"
+        :return: True if blocked
+        """
+        if any(pattern in url for pattern in self.profile["allow_patterns"]):
+            return False
+        if resource_type in self.profile["block_types"]:
+            return True
+        # never block the page itself
+        if resource_type == "document":
+            return False
+        return any(pattern in url for pattern in self.profile["deny_patterns"])
+
+    def _on_route(self, route):
+        """Route handler: abort or continue a request.
+
+        :param route: Playwright route
+        :return: output of abort()/continue_() (a coroutine Playwright awaits for async API routes)
+        """
+        request = route.request
+        self.requests += 1
+        if self.is_blocked(url=request.url, resource_type=request.resource_type):
+            self.blocked_requests[request.resource_type] = self.blocked_requests.get(request.resource_type, 0) + 1
+            if not self.dry_run:
+                return route.abort("blockedbyclient")
+            self._would_block.add(request.url)
+        return route.continue_()
+
+    def _on_response(self, response) -> None:
+        """Response handler: count loaded bytes by Content-Length (no extra round trip).
+
+        :param response: Playwright response
+        """
+        size = int(response.headers.get("content-length", 0) or 0)
+        self.loaded_bytes += size
+        if response.url in self._would_block:
+            self.blocked_bytes += size
+
+    def report(self) -> dict:
+        """Get requests and bytes of a scrape.
+
+        :return: {requests, blocked_requests (by resource type), loaded_bytes, blocked_bytes, dry_run}
+                 blocked_bytes is None unless dry run: blocked requests have no response to measure
+        """
+        return {
+            "requests": self.requests,
+            "blocked_requests": dict(self.blocked_requests),
+            "loaded_bytes": self.loaded_bytes,
+            "blocked_bytes": self.blocked_bytes if self.dry_run else None,
+            "dry_run": self.dry_run
+        }
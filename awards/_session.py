@@ -0,0 +1,98 @@
+"""Persistent browser sessions per account.
+
+Logging in costs 10-30 seconds per award program and sometimes triggers a passcode (OTP) prompt.
+SessionStore saves Playwright storage state (cookies and localStorage) per account, so the next update
+can start from a logged-in browser context. Award scripts which support it (SUPPORTS_SESSION = True)
+receive an AccountSession as kwargs["session"]:
+
+    session = kwargs.get("session")
+    if session is None or not session.is_valid(page=page, wait=wait, url=ACCOUNT_URL, selector=LOGGED_IN):
+        log_in(page=page, wait=wait, account_info=account_info)
+    ...
+    if session is None:
+        log_out(page=page, wait=wait)
+    else:
+        session.save()
+"""
+import hashlib
+import os
+
+
+class SessionStore(object):
+    """Directory of Playwright storage state files, one per award script and username."""
+
+    def __init__(self, directory: str):
+        """Initial function.
+
+        :param directory: directory to save storage state files
+        """
+        self.directory = os.path.expanduser(directory)
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    def get_path(self, script: str, username: str) -> str:
+        """Get storage state file path of an account. Username is hashed not to be exposed in a file name.
+
+        :param script: award script name
+        :param username: username or ID
+        :return: file path
+        """
+        digest = hashlib.sha256(username.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, f"{script}_{digest}.json")
+
+    def new_context(self, browser, script: str, username: str):
+        """Create a browser context with a saved session of an account (if any).
+
+        :param browser: Chrome debug browser (Playwright)
+        :param script: award script name
+        :param username: username or ID
+        :return: [browser context, AccountSession]
+        """
+        path = self.get_path(script=script, username=username)
+        restored = os.path.exists(path)
+        context = browser.new_context(storage_state=path) if restored else browser.new_context()
+        return context, AccountSession(context=context, path=path, restored=restored)
+
+
+class AccountSession(object):
+    """Saved session of an account in a browser context."""
+
+    def __init__(self, context, path: str, restored: bool):
+        """Initial function.
+
+        :param context: browser context of the account
+        :param path: storage state file path
+        :param restored: True if the context was created with a saved session
+        """
+        self.context = context
+        self.path = path
+        self.restored = restored
+        self.reused = False
+
+    def is_valid(self, page, wait, url: str, selector: str, timeout: float = 8) -> bool:
+        """Check a restored session is still logged in: open a page which needs log in and wait for an element
+        which is only shown to logged-in members. An expired session is discarded.
+
+        :param page: Playwright page
+        :param wait: PageWaiter of the page
+        :param url: page which needs log in (i.e. account overview)
+        :param selector: element shown only when logged in
+        :param timeout: seconds to wait for the element
+        :return: True if logged in
+        """
+        if not self.restored:
+            return False
+        page.goto(url)
+        self.reused = wait.for_selector(selector, state="attached", timeout=timeout, required=False) is not None
+        if not self.reused:
+            self.discard()
+        return self.reused
+
+    def save(self) -> None:
+        """Save cookies and localStorage of the context. Only the owner can read the file."""
+        self.context.storage_state(path=self.path)
+        os.chmod(self.path, 0o600)
+
+    def discard(self) -> None:
+        """Remove the saved session."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
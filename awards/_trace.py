@@ -0,0 +1,207 @@
+"""Tracing spans of balance updates, saved as Chrome trace-event JSON (open in chrome://tracing or Perfetto).
+
+Each award program is a process and each account a thread of the trace, so the phases of every update are shown
+on a timeline. Waits of PageWaiter are recorded as spans too. Tracing is off until tracer.start() is called
+(Configs.trace_file in ART, --trace of art_cli.py); when it is off, spans cost one check.
+
+How to use in an award script (phases follow one another; starting a phase ends the previous one):
+    phases = Phases()
+    phases.start("goto")
+    page.goto("https://www.example.com")
+    phases.start("login")
+    ...
+    phases.start("extract balance")
+    ...
+    phases.start("logout")
+    ...
+    phases.end()
+
+Any other part can be marked with a span:
+    with span("2fa wait"):
+        passcode = prompt("Passcode", "Please enter passcode:")
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# (pid, tid) of the account being updated; tasks and threads have their own
+_account = contextvars.ContextVar("art_trace_account", default=None)
+# open Phases of the account being updated (ended if the award script fails)
+_phases = contextvars.ContextVar("art_trace_phases", default=None)
+
+
+class Tracer(object):
+    """Collect spans as Chrome trace events. Thread-safe."""
+
+    def __init__(self):
+        """Initial function. Tracing is off."""
+        self.enabled = False
+        self.events = []
+        self._origin = time.perf_counter()
+        # {award program: pid}, {(award program, account): tid}
+        self._pids = {}
+        self._tids = {}
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start tracing. Spans recorded before are dropped."""
+        with self._lock:
+            self.events = []
+            self._pids = {}
+            self._tids = {}
+            self._origin = time.perf_counter()
+            self.enabled = True
+
+    def stop(self) -> None:
+        """Stop tracing. Recorded spans are kept until start()."""
+        self.enabled = False
+
+    def _get_ids(self, program: str, account: str) -> tuple:
+        """Get trace process and thread IDs of an account. Names are added to the trace at the first use.
+
+        :param program: award program
+        :param account: username or ID
+        :return: (pid, tid)
+        """
+        with self._lock:
+            if program not in self._pids:
+                self._pids[program] = len(self._pids) + 1
+                self.events.append({"name": "process_name", "ph": "M", "pid": self._pids[program], "tid": 0,
+                                    "args": {"name": program}})
+            pid = self._pids[program]
+            if (program, account) not in self._tids:
+                self._tids[(program, account)] = len(self._tids) + 1
+                self.events.append({"name": "thread_name", "ph": "M", "pid": pid,
+                                    "tid": self._tids[(program, account)], "args": {"name": account}})
+            return pid, self._tids[(program, account)]
+
+    def add(self, name: str, category: str, started: float, elapsed: float, args: dict = None) -> None:
+        """Add a span.
+
+        :param name: name of span
+        :param category: category of span, i.e. "phase" or "wait"
+        :param started: time.perf_counter() at the start
+        :param elapsed: seconds
+        :param args: values shown with the span
+        """
+        if not self.enabled:
+            return
+        # spans outside of an account update (i.e. tests) are on the thread which ran them
+        pid, tid = _account.get() or (0, threading.get_ident())
+        with self._lock:
+            self.events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (started - self._origin) * 1000000,
+                "dur": elapsed * 1000000,
+                "pid": pid,
+                "tid": tid,
+                "args": args or {}
+            })
+
+    @contextmanager
+    def span(self, name: str, category: str = "phase", **args):
+        """Record a span of the with block. An error of the block is recorded in args and raised.
+
+        :param name: name of span
+        :param category: category of span
+        :param args: values shown with the span
+        """
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            args["error"] = type(e).__name__
+            raise
+        finally:
+            self.add(name=name, category=category, started=started, elapsed=time.perf_counter() - started, args=args)
+
+    @contextmanager
+    def account(self, program: str, account: str, **args):
+        """Record the update of an account; spans in the with block are on its row of the trace.
+
+        :param program: award program
+        :param account: username or ID
+        :param args: values shown with the span (i.e. attempt)
+        """
+        if not self.enabled:
+            yield
+            return
+        account_token = _account.set(self._get_ids(program=program, account=account))
+        phases_token = _phases.set([])
+        try:
+            with self.span(name=program, category="account", **args):
+                try:
+                    yield
+                finally:
+                    # phases left open by an error
+                    for phases in _phases.get():
+                        phases.end(error=True)
+        finally:
+            _phases.reset(phases_token)
+            _account.reset(account_token)
+
+    def save(self, path: str) -> int:
+        """Write recorded spans as Chrome trace-event JSON.
+
+        :param path: JSON file
+        :return: number of spans
+        """
+        with self._lock:
+            events = list(self.events)
+        directory = os.path.dirname(os.path.expanduser(path))
+        if directory != "":
+            os.makedirs(directory, exist_ok=True)
+        with open(os.path.expanduser(path), "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return sum(1 for event in events if event["ph"] == "X")
+
+
+class Phases(object):
+    """Phases of an award script which follow one another: starting a phase ends the previous one."""
+
+    def __init__(self, trace: Tracer = None):
+        """Initial function.
+
+        :param trace: tracer. If None, the tracer of ART
+        """
+        self.tracer = tracer if trace is None else trace
+        # (name, time.perf_counter() at the start) of the open phase
+        self.current = None
+
+    def start(self, name: str) -> None:
+        """End the open phase and start a phase.
+
+        :param name: name of phase, i.e. "goto", "login", "extract balance", "extract activity" or "logout"
+        """
+        self.end()
+        if not self.tracer.enabled:
+            return
+        self.current = (name, time.perf_counter())
+        opened = _phases.get()
+        if opened is not None and self not in opened:
+            opened.append(self)
+
+    def end(self, error: bool = False) -> None:
+        """End the open phase.
+
+        :param error: True if the phase ended by an error
+        """
+        if self.current is None:
+            return
+        name, started = self.current
+        self.current = None
+        self.tracer.add(name=name, category="phase", started=started, elapsed=time.perf_counter() - started,
+                        args={"error": True} if error else None)
+
+
+# tracer of ART
+tracer = Tracer()
+span = tracer.span
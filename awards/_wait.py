@@ -0,0 +1,205 @@
+"""Condition-driven waits for award scripts.
+
+Award scripts should wait for what the next step needs (a selector, a text, a URL change or network idle)
+instead of sleeping a fixed time. PageWaiter keeps a per-program deadline and records how long each wait took
+(also as spans of the trace, see awards._trace).
+
+How to use:
+    wait = PageWaiter(page=page, deadline=WAIT_DEADLINE)
+    page.goto("https://www.example.com")
+    wait.for_selector("button#login")
+    ...
+    award_data["waits"] = wait.timings
+"""
+import inspect
+import time
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from awards._trace import tracer
+
+
+class PageWaiter(object):
+    """Condition-driven waits on a Playwright page with a deadline for the whole award script."""
+
+    def __init__(self, page, deadline: float = 120, timeout: float = 20):
+        """Initial function.
+
+        :param page: Playwright page
+        :param deadline: seconds all waits of this page may take in total (per-program deadline)
+        :param timeout: default seconds for a single wait
+        """
+        self.page = page
+        self.deadline = time.monotonic() + deadline
+        self.timeout = timeout
+        # list of {wait, elapsed, ok}
+        self.timings = []
+
+    def _get_timeout(self, timeout: float | None) -> float:
+        """Get timeout of a wait in milliseconds, limited by the deadline.
+
+        :param timeout: seconds for this wait. If None, use the default timeout
+        :return: timeout in milliseconds
+        """
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise PlaywrightTimeoutError("Award script deadline exceeded")
+        return min(self.timeout if timeout is None else timeout, remaining) * 1000
+
+    def _record(self, name: str, started: float, ok: bool) -> None:
+        """Record the elapsed time of a wait in timings and in the trace (see awards._trace).
+
+        :param name: description of the wait
+        :param started: time.perf_counter() at the start of the wait
+        :param ok: False if the wait timed out
+        """
+        elapsed = time.perf_counter() - started
+        self.timings.append({"wait": name, "elapsed": elapsed, "ok": ok})
+        tracer.add(name=name, category="wait", started=started, elapsed=elapsed, args={"ok": ok})
+
+    def _wait(self, name: str, condition, timeout: float | None, required: bool):
+        """Run a wait condition and record the elapsed time.
+
+        :param name: description of the wait (for timings)
+        :param condition: function(timeout in milliseconds) to wait for
+        :param timeout: seconds for this wait. If None, use the default timeout
+        :param required: if True, raise TimeoutError on timeout; otherwise return None
+        :return: output of condition (True if the condition has no output) or None on timeout
+        """
+        started = time.perf_counter()
+        try:
+            result = condition(self._get_timeout(timeout))
+            self._record(name=name, started=started, ok=True)
+            return True if result is None else result
+        except PlaywrightTimeoutError:
+            self._record(name=name, started=started, ok=False)
+            if required:
+                raise
+            return None
+
+    def for_selector(self, selector: str, state: str = "visible", frame=None, timeout: float = None,
+                     required: bool = True):
+        """Wait for an element.
+
+        :param selector: CSS (or Playwright) selector
+        :param state: "attached", "detached", "visible" or "hidden"
+        :param frame: frame to search instead of the page
+        :param timeout: seconds for this wait. If None, use the default timeout
+        :param required: if True, raise TimeoutError on timeout; otherwise return None
+        :return: element handle (True for "detached" and "hidden")
+        """
+        target = self.page if frame is None else frame
+        return self._wait(
+            name=f"selector {selector}",
+            condition=lambda ms: target.wait_for_selector(selector, state=state, timeout=ms),
+            timeout=timeout,
+            required=required
+        )
+
+    def for_text(self, text: str, frame=None, timeout: float = None, required: bool = True):
+        """Wait for a visible text.
+
+        :param text: text to find (substring, case-insensitive)
+        :param frame: frame to search instead of the page
+        :param timeout: seconds for this wait. If None, use the default timeout
+        :param required: if True, raise TimeoutError on timeout; otherwise return None
+        :return: True if the text is found
+        """
+        target = self.page if frame is None else frame
+        return self._wait(
+            name=f"text {text}",
+            condition=lambda ms: target.get_by_text(text).first.wait_for(state="visible", timeout=ms),
+            timeout=timeout,
+            required=required
+        )
+
+    def for_url(self, url, timeout: float = None, required: bool = True):
+        """Wait for the page URL.
+
+        :param url: URL glob pattern, regex or function(url) -> bool
+        :param timeout: seconds for this wait. If None, use the default timeout
+        :param required: if True, raise TimeoutError on timeout; otherwise return None
+        :return: True if the URL matches
+        """
+        return self._wait(
+            name=f"url {url}",
+            condition=lambda ms: self.page.wait_for_url(url, wait_until="commit", timeout=ms),
+            timeout=timeout,
+            required=required
+        )
+
+    def for_url_change(self, timeout: float = None, required: bool = True):
+        """Wait until the page URL is different from the current URL.
+
+        :param timeout: seconds for this wait. If None, use the default timeout
+        :param required: if True, raise TimeoutError on timeout; otherwise return None
+        :return: True if the URL is changed
+        """
+        current_url = self.page.url
+        return self._wait(
+            name=f"url change from {current_url}",
+            condition=lambda ms: self.page.wait_for_url(
+                lambda url: url != current_url, wait_until="commit", timeout=ms
+            ),
+            timeout=timeout,
+            required=required
+        )
+
+    def for_frame(self, url: str, timeout: float = None, required: bool = True):
+        """Wait for a frame (i.e. iframe of a login form) to navigate to a URL.
+
+        :param url: URL of the frame
+        :param timeout: seconds for this wait. If None, use the default timeout
+        :param required: if True, raise TimeoutError on timeout; otherwise return None
+        :return: frame
+        """
+        return self._wait(
+            name=f"frame {url}",
+            condition=lambda ms: self.page.frame(url=url) or self.page.wait_for_event(
+                "framenavigated", predicate=lambda frame: frame.url == url, timeout=ms
+            ),
+            timeout=timeout,
+            required=required
+        )
+
+    def for_network_idle(self, timeout: float = 10, required: bool = False):
+        """Wait until there is no network connection for at least 500 ms.
+
+        Many sites keep analytics requests open, so this wait is not required by default.
+
+        :param timeout: seconds for this wait
+        :param required: if True, raise TimeoutError on timeout; otherwise return None
+        :return: True if network is idle
+        """
+        return self._wait(
+            name="network idle",
+            condition=lambda ms: self.page.wait_for_load_state("networkidle", timeout=ms),
+            timeout=timeout,
+            required=required
+        )
+
+
+class AsyncPageWaiter(PageWaiter):
+    """PageWaiter for Playwright async API pages. Every wait must be awaited, i.e. await wait.for_selector()."""
+
+    async def _wait(self, name: str, condition, timeout: float | None, required: bool):
+        """Run a wait condition and record the elapsed time.
+
+        :param name: description of the wait (for timings)
+        :param condition: function(timeout in milliseconds) to wait for
+        :param timeout: seconds for this wait. If None, use the default timeout
+        :param required: if True, raise TimeoutError on timeout; otherwise return None
+        :return: output of condition (True if the condition has no output) or None on timeout
+        """
+        started = time.perf_counter()
+        try:
+            result = condition(self._get_timeout(timeout))
+            if inspect.isawaitable(result):
+                result = await result
+            self._record(name=name, started=started, ok=True)
+            return True if result is None else result
+        except PlaywrightTimeoutError:
+            self._record(name=name, started=started, ok=False)
+            if required:
+                raise
+            return None
@@ -1,96 +1,96 @@
 import re
 from datetime import datetime
 
+from awards._dom import by_text, click_text, fill, read_text
+from awards._trace import Phases
+from awards._wait import PageWaiter
+
+# award program of this script (synced to Awards table, see awards/_registry.py)
+AWARD_PROGRAM = {
+    "category": "Airlines",
+    "award": "American Airlines AAdvantage",
+    "expire": 24,
+    "note": "",
+    "required_fields": [["username", "Username"], ["password", "Password"], ["lastname", "Last Name"]]
+}
+
+# seconds all waits of an AA update may take
+WAIT_DEADLINE = 120
+
 
 def get_balance(browser, account_info: dict, **kwargs) -> dict:
     """Get the current points/mileage balance and expected expire date.
 
     :param browser: Chrome debug browser (Playwright)
     :param account_info: account information from database
-    :return: current points/mileages balance, expected expire date (None for not expired or unknonw)
+    :param kwargs: context - browser context to open a page in (default: the first context of browser)
+    :return: current points/mileages balance, expected expire date (None for not expired or unknonw),
+             timings of waits
     """
 
-    context = browser.contexts[0]
+    context = kwargs.get("context") or browser.contexts[0]
     page = context.new_page()
-    award_data = {"balance": 0, "expire_date": None}
+    wait = PageWaiter(page=page, deadline=WAIT_DEADLINE)
+    award_data = {"balance": None, "expire_date": None}
+    phases = Phases()
 
+    phases.start("goto")
     page.goto("https://www.aa.com")
-    page.wait_for_timeout(3000)
+    wait.for_selector("hp-header-button")
 
+    phases.start("login")
     # log in
-    try:
-        next(
-            (button for button in page.query_selector_all("hp-header-button")
-                if button.inner_text() == "Log in" and button.is_visible()),
-            None
-        ).click()
-        page.wait_for_timeout(3000)
-    except AttributeError:
+    login_button = by_text(page, "hp-header-button", "Log in", visible=True)
+    if login_button.count() == 0:
         # log out if previously logged in
-        dropdown = next(
-            (dropdown for dropdown in page.query_selector_all("adc-account-dropdown") if dropdown.is_visible()),
-            None
-        )
+        dropdown = page.locator("adc-account-dropdown >> visible=true").first
         dropdown.click()
-        page.wait_for_timeout(1000)
-        next(
-            (button for button in dropdown.query_selector_all("hp-account-dropdown-button")
-                if button.is_visible() and button.inner_text() == "Log out"),
-            None
-        ).click()
-        page.wait_for_timeout(3000)
-        # log in again
-        next(
-            (button for button in page.query_selector_all("hp-header-button")
-             if button.inner_text() == "Log in" and button.is_visible()),
-            None
-        ).click()
-        page.wait_for_timeout(3000)
+        wait.for_selector("hp-account-dropdown-button:has-text('Log out')")
+        click_text(dropdown, "hp-account-dropdown-button", "Log out", visible=True)
+        wait.for_selector("hp-header-button:has-text('Log in')")
+    # log in
+    login_button.click()
+    wait.for_selector("ail-input#username")
 
-    input_username = page.query_selector("ail-input#username")
-    input_username.click()
-    input_username.query_selector("input").fill(account_info["username"])
-    input_password = page.query_selector("ail-input#password")
-    input_password.click()
-    input_password.query_selector("input").fill(account_info["password"])
+    fill(page, "ail-input#username input", account_info["username"])
+    fill(page, "ail-input#password input", account_info["password"])
     page.query_selector("button#button_login").click()
-    page.wait_for_timeout(5000)
+    wait.for_selector("hp-account-dropdown-button")
 
+    phases.start("extract balance")
     # go to account
-    next(
-        (button for button in page.query_selector_all("hp-account-dropdown-button") if button.is_visible()),
-        None
-    ).click()
-    page.wait_for_timeout(2000)
-    next(
-        (button for button in page.query_selector_all("hp-account-dropdown-button")
-            if button.is_visible() and button.inner_text() == "Personal account"),
-        None
-    ).click()
-    page.wait_for_timeout(5000)
-    text = page.query_selector("div[data-testid='award-miles-balance-text']").inner_text()
+    page.locator("hp-account-dropdown-button >> visible=true").first.click()
+    wait.for_selector("hp-account-dropdown-button:has-text('Personal account')")
+    click_text(page, "hp-account-dropdown-button", "Personal account", visible=True)
+    wait.for_selector("div[data-testid='award-miles-balance-text']")
+    text = read_text(page, "div[data-testid='award-miles-balance-text']")
     award_data["balance"] = int(
         re.search(r"\s+(?P<miles>[\d,]+)\s+", text).group("miles").replace(",", "")
     )
 
+    phases.start("extract activity")
     # AA mileages do not expire for AA credit card holders.
-    text = page.query_selector("div[data-testid='award-miles-balance-section']").inner_text()
+    text = read_text(page, "div[data-testid='award-miles-balance-section']")
     if "no miles expiration" not in text:
         award_data["expire_date"] = datetime.strptime(
             re.search(r"expire on\s+(?P<expire_date>[A-Za-z]{3}\s+\d{1,2},\s+\d{4})", text).group("expire_date"),
             "%b %d, %Y"
         )
 
+    phases.start("logout")
     if page.query_selector("li#headerCustomerInfo").is_visible():
         page.query_selector("li#headerCustomerInfo").query_selector("button").click()
-        page.wait_for_timeout(2000)
+        wait.for_selector("li#headerCustomerInfo p#logout-button")
         page.query_selector("li#headerCustomerInfo").query_selector("p#logout-button").click()
     else:
         page.query_selector("li#utilityCustomerInfo").query_selector("a").click()
-        page.wait_for_timeout(2000)
+        wait.for_selector("li#utilityCustomerInfo a >> nth=1")
         page.query_selector("li#utilityCustomerInfo").query_selector_all("a")[1].click()
 
-    page.wait_for_timeout(5000)
+    wait.for_url_change(required=False)
+    wait.for_network_idle()
     page.close()
 
+    phases.end()
+    award_data["waits"] = wait.timings
     return award_data
@@ -1,19 +1,41 @@
+from awards._trace import Phases
+from awards._wait import PageWaiter
+
+# award program of this script (synced to Awards table, see awards/_registry.py)
+AWARD_PROGRAM = {
+    "category": "Airlines",
+    "award": "Alaska Airlines Mileage Plan",
+    "expire": 0,
+    "note": "",
+    "required_fields": [["username", "Username"], ["password", "Password"]]
+}
+
+# seconds all waits of an Alaska Airlines update may take
+WAIT_DEADLINE = 120
+
+
 def get_balance(browser, account_info: dict, **kwargs) -> dict:
     """Get the current points/mileage balance and expected expire date.
 
     :param browser: Chrome debug browser (Playwright)
     :param account_info: account information from database
-    :return: current points/mileages balance, expected expire date (None for not expired or unknonw)
+    :param kwargs: context - browser context to open a page in (default: the first context of browser)
+    :return: current points/mileages balance, expected expire date (None for not expired or unknonw),
+             timings of waits
     """
 
-    context = browser.contexts[0]
+    context = kwargs.get("context") or browser.contexts[0]
     page = context.new_page()
-    award_data = {"balance": 0, "expire_date": None}
+    wait = PageWaiter(page=page, deadline=WAIT_DEADLINE)
+    award_data = {"balance": None, "expire_date": None}
+    phases = Phases()
 
     # log in
+    phases.start("goto")
     page.goto("https://www.alaskaair.com")
-    page.wait_for_timeout(3000)
+    wait.for_selector("ul.top-menu-list, div[data-testid='HeaderMobile']")
 
+    phases.start("login")
     if page.query_selector("ul.top-menu-list").is_visible():
         # desktop mode
         top_menu_list = page.query_selector("ul.top-menu-list")
@@ -22,18 +44,19 @@ def get_balance(browser, account_info: dict, **kwargs) -> dict:
             i for i in top_menu_list.query_selector("form").query_selector_all("input")
             if i.get_attribute("type") != "hidden"
         ]
-        page.wait_for_timeout(1000)
+        wait.for_selector("ul.top-menu-list form input:not([type='hidden'])")
         inputs[0].click()
         inputs[0].fill(account_info["username"])
-        page.wait_for_timeout(2000)
         inputs[1].click()
         inputs[1].fill(account_info["password"])
         top_menu_list.query_selector("form").query_selector("button").click()
-        page.wait_for_timeout(3000)
+        wait.for_selector("div.mp-info")
 
+        phases.start("extract balance")
         award_data["balance"] = int(
             page.query_selector("div.mp-info").inner_text().splitlines()[0].split(":")[1].strip().replace(",", "")
         )
+        phases.start("logout")
         # logout
         top_menu_list = page.query_selector("ul.top-menu-list")
         account_menu = next(
@@ -41,7 +64,7 @@ def get_balance(browser, account_info: dict, **kwargs) -> dict:
             None
         )
         account_menu.click()
-        page.wait_for_timeout(1000)
+        wait.for_selector("ul.top-menu-list li:has-text('Hi, ') li a")
         account_menu.query_selector_all("li")[-1].query_selector("a").click()
     else:
         page.query_selector("div[data-testid='HeaderMobile']")\
@@ -50,34 +73,36 @@ def get_balance(browser, account_info: dict, **kwargs) -> dict:
         mob_menu = page.query_selector("div.nav-mobile-menu")
         next((s for s in mob_menu.query_selector_all("li")
               if "Sign in/Sign up" == s.inner_text()), None).click()
-        page.wait_for_timeout(1000)
+        wait.for_selector("div.nav-mobile-menu input[name='UserId']")
         mob_menu.query_selector("input[name='UserId']").click()
         mob_menu.query_selector("input[name='UserId']").fill(account_info["username"])
-        page.wait_for_timeout(1000)
         mob_menu.query_selector("input[name='Password']").click()
         mob_menu.query_selector("input[name='Password']").fill(account_info["password"])
-        page.wait_for_timeout(1000)
         if mob_menu.query_selector("input[name='RememberMe']").is_checked():
             mob_menu.query_selector("input[name='RememberMe']").click()
         next(
             (button for button in mob_menu.query_selector_all("button") if button.inner_text() == "SIGN IN"),
             None
         ).click()
-        page.wait_for_timeout(3000)
+        wait.for_selector("div.mp-info")
 
+        phases.start("extract balance")
         award_data["balance"] = int(
             page.query_selector("div.mp-info").inner_text().splitlines()[0].split(":")[1].strip().replace(",", "")
         )
+        phases.start("logout")
         # logout
         page.query_selector("div[data-testid='HeaderMobile']")\
             .query_selector("div#hf-nav-top")\
             .query_selector_all("li")[2].click()
         mob_menu = page.query_selector("div.nav-mobile-menu")
         next((s for s in mob_menu.query_selector_all("li") if s.inner_text().startswith("Hi,")), None).click()
-        page.wait_for_timeout(2000)
+        wait.for_selector("div.nav-mobile-menu li:text-is('Sign out')")
         next((s for s in mob_menu.query_selector_all("li") if s.inner_text() == "Sign out"), None).click()
 
-    page.wait_for_timeout(3000)
+    wait.for_network_idle()
     page.close()
 
+    phases.end()
+    award_data["waits"] = wait.timings
     return award_data
@@ -1,64 +1,79 @@
 import re
 
+from awards._dom import by_text, read_texts, search_text
+from awards._trace import Phases
+from awards._wait import PageWaiter
+
+# award program of this script (synced to Awards table, see awards/_registry.py)
+AWARD_PROGRAM = {
+    "category": "Credit Cards",
+    "award": "Amex Membership Rewards",
+    "expire": 0,
+    "note": "",
+    "required_fields": [["username", "Username"], ["password", "Password"]]
+}
+
+# seconds all waits of an Amex update may take
+WAIT_DEADLINE = 120
+
 
 def get_balance(browser, account_info: dict, **kwargs) -> dict:
     """Get the current points/mileage balance and expected expire date.
 
     :param browser: Chrome debug browser (Playwright)
     :param account_info: account information from database
-    :return: current points/mileages balance, expected expire date (None for not expired or unknonw)
+    :param kwargs: context - browser context to open a page in (default: the first context of browser)
+    :return: current points/mileages balance, expected expire date (None for not expired or unknonw),
+             timings of waits
     """
 
-    context = browser.contexts[0]
+    context = kwargs.get("context") or browser.contexts[0]
     page = context.new_page()
-    award_data = {"balance": 0, "expire_date": None}
+    wait = PageWaiter(page=page, deadline=WAIT_DEADLINE)
+    award_data = {"balance": None, "expire_date": None}
+    phases = Phases()
 
     # log in
+    phases.start("goto")
     page.goto("https://www.americanexpress.com/")
-    page.wait_for_timeout(3000)
+    phases.start("login")
     page.get_by_role("link", name="Log In").click()
-    page.wait_for_timeout(3000)
+    wait.for_selector("[data-testid='userid-input']")
     page.get_by_test_id("userid-input").fill(account_info["username"])
     page.get_by_test_id("password-input").fill(account_info["password"])
     page.get_by_test_id("submit-button").click()
-    page.wait_for_timeout(5000)
+    wait.for_selector("div.nav section")
 
+    phases.start("extract balance")
     # main page
     ###sec = next((page.query_selector_all("div.nav")), None).query_selector_all("section")[0]
-    sec = page.query_selector("div.nav").query_selector("section")
+    sec = page.locator("div.nav section").first
     sec.click()
-    # find cards only
-    card_accounts = next((sel for sel in page.query_selector_all('ul') if "ACCOUNTS" in sel.inner_text()), None)
-    cards = [
-        card for card in card_accounts.query_selector_all('div')
-        if "Card" in card.inner_text() and card.get_attribute('id') is not None
-    ]
-    card_names = [card.inner_text().replace('\n', '') for card in cards]
+    # find cards only: div with id in ACCOUNTS list
+    card_accounts = by_text(page, "ul", "ACCOUNTS", exact=False)
+    card_names = [card.replace('\n', '') for card in read_texts(card_accounts, "div[id]", contains="Card")]
     sec.click()
 
     # run each card
     for card_name in card_names:
         sec.click()
-        card_accounts = next((sel for sel in page.query_selector_all('ul') if "ACCOUNTS" in sel.inner_text()), None)
-        cards = [
-            card for card in card_accounts.query_selector_all('div')
-            if "Card" in card.inner_text() and card.get_attribute('id') is not None
-        ]
-        card = next((card for card in cards if card_name == card.inner_text().replace('\n', '')), None)
-        card.click()
-        page.wait_for_timeout(5000)
-        for div_row in page.query_selector_all("div.row"):
-            if "Hilton" not in card_name and "Delta" not in card_name:
-                regex = re.search(
-                    r"Membership Rewards® Points\s+(?P<pts>[\d+,]+)\s+Explore Rewards$",
-                    div_row.inner_text()
-                )
-                if regex is not None:
-                    award_data["balance"] = int(regex.group('pts').replace(',', ''))
+        card_accounts = by_text(page, "ul", "ACCOUNTS", exact=False)
+        cards = [card.replace('\n', '') for card in read_texts(card_accounts, "div[id]")]
+        card_accounts.locator("div[id]").nth(cards.index(card_name)).click()
+        wait.for_network_idle()
+        wait.for_text("Membership Rewards", required=False)
+        if "Hilton" not in card_name and "Delta" not in card_name:
+            regex = search_text(page, "div.row",
+                                r"Membership Rewards® Points\s+(?P<pts>[\d+,]+)\s+Explore Rewards$",
+                                contains="Membership Rewards")
+            if regex is not None:
+                award_data["balance"] = int(regex.group('pts').replace(',', ''))
 
+    phases.start("logout")
     # sign out
     page.goto("https://www.americanexpress.com/en-us/account/logout")
-    page.wait_for_timeout(2000)
     page.close()
 
+    phases.end()
+    award_data["waits"] = wait.timings
     return award_data
@@ -1,6 +1,21 @@
 import re
 from datetime import datetime
 
+from awards._trace import Phases
+from awards._wait import AsyncPageWaiter, PageWaiter
+
+# award program of this script (synced to Awards table, see awards/_registry.py)
+AWARD_PROGRAM = {
+    "category": "Airlines",
+    "award": "Avianca LifeMiles",
+    "expire": 12,
+    "note": "Expire in 24 months for elite members or accrued via a co-branded card.",
+    "required_fields": [["username", "Username"], ["password", "Password"]]
+}
+
+# seconds all waits of an Avianca update may take
+WAIT_DEADLINE = 120
+
 
 def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict:
     """Get the current points/mileage balance and expected expire date.
@@ -8,30 +23,37 @@ def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict
     :param browser: Chrome debug browser (Playwright)
     :param account_info: account information from database
     :param award_info: award information from database
-    :return: current points/mileages balance, expected expire date (None for not expired or unknonw)
+    :param kwargs: context - browser context to open a page in (default: the first context of browser)
+    :return: current points/mileages balance, expected expire date (None for not expired or unknonw),
+             timings of waits
     """
 
-    context = browser.contexts[0]
+    context = kwargs.get("context") or browser.contexts[0]
     page = context.new_page()
-    award_data = {"balance": 0, "expire_date": None}
+    wait = PageWaiter(page=page, deadline=WAIT_DEADLINE)
+    award_data = {"balance": None, "expire_date": None}
+    phases = Phases()
 
+    phases.start("goto")
     page.goto("https://www.lifemiles.com/account/overview")
-    page.wait_for_timeout(5000)
+    wait.for_selector("a#social-Lifemiles")
 
+    phases.start("login")
     # log in
     page.query_selector("a#social-Lifemiles").click()
-    page.wait_for_timeout(5000)
+    wait.for_selector("div.authentication-ui-Lifemiles_inputMargin input")
     username_input = page.query_selector_all("div.authentication-ui-Lifemiles_inputMargin")[0]
     username_input.click()
     username_input.query_selector("input").fill(account_info["username"])
     password_input = page.query_selector_all("div.authentication-ui-Lifemiles_inputMargin")[1]
     password_input.click()
     password_input.query_selector("input").fill(account_info["password"] )
-    page.wait_for_timeout(1000)
     username_input.click()
+    wait.for_selector("button#Login-confirm:enabled")
     page.query_selector("button#Login-confirm").click()
-    page.wait_for_timeout(10000)
+    wait.for_selector("div[data-cy='OverviewPointsExpirationDateTxt']", timeout=30)
 
+    phases.start("extract balance")
     # get mileage balance and expire date
     text = page.query_selector("div[data-cy='OverviewTitleTxt']").inner_text()
     award_data["balance"] = int(
@@ -41,13 +63,73 @@ def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict
         page.query_selector("div[data-cy='OverviewPointsExpirationDateTxt']").inner_text().split(":")[1].strip(),
         "%b %d, %Y"
     )
-    page.wait_for_timeout(3000)
 
+    phases.start("logout")
     # log out
     page.query_selector("div.menu-ui-Menu_button").click()
-    page.wait_for_timeout(1000)
+    wait.for_selector("div#ProfileTooltipId button")
     page.query_selector("div#ProfileTooltipId").query_selector("button").click()
-    page.wait_for_timeout(5000)
+    wait.for_url_change(required=False)
     page.close()
 
+    phases.end()
+    award_data["waits"] = wait.timings
+    return award_data
+
+
+async def get_balance_async(browser, account_info: dict, award_info: dict, **kwargs) -> dict:
+    """Get the current points/mileage balance and expected expire date (Playwright async API).
+
+    :param browser: Chrome debug browser (Playwright async API)
+    :param account_info: account information from database
+    :param award_info: award information from database
+    :param kwargs: context - browser context to open a page in (default: the first context of browser)
+    :return: current points/mileages balance, expected expire date (None for not expired or unknonw),
+             timings of waits
+    """
+
+    context = kwargs.get("context") or browser.contexts[0]
+    page = await context.new_page()
+    wait = AsyncPageWaiter(page=page, deadline=WAIT_DEADLINE)
+    award_data = {"balance": None, "expire_date": None}
+    phases = Phases()
+
+    phases.start("goto")
+    await page.goto("https://www.lifemiles.com/account/overview")
+    await wait.for_selector("a#social-Lifemiles")
+
+    phases.start("login")
+    # log in
+    await page.locator("a#social-Lifemiles").first.click()
+    await wait.for_selector("div.authentication-ui-Lifemiles_inputMargin input")
+    username_input = page.locator("div.authentication-ui-Lifemiles_inputMargin").nth(0)
+    await username_input.click()
+    await username_input.locator("input").fill(account_info["username"])
+    password_input = page.locator("div.authentication-ui-Lifemiles_inputMargin").nth(1)
+    await password_input.click()
+    await password_input.locator("input").fill(account_info["password"])
+    await username_input.click()
+    await wait.for_selector("button#Login-confirm:enabled")
+    await page.locator("button#Login-confirm").first.click()
+    await wait.for_selector("div[data-cy='OverviewPointsExpirationDateTxt']", timeout=30)
+
+    phases.start("extract balance")
+    # get mileage balance and expire date
+    text = await page.locator("div[data-cy='OverviewTitleTxt']").first.inner_text()
+    award_data["balance"] = int(
+        re.search(r"\s(?P<miles>[\d,]+)$", text).group("miles").replace(",", "")
+    )
+    expire_text = await page.locator("div[data-cy='OverviewPointsExpirationDateTxt']").first.inner_text()
+    award_data["expire_date"] = datetime.strptime(expire_text.split(":")[1].strip(), "%b %d, %Y")
+
+    phases.start("logout")
+    # log out
+    await page.locator("div.menu-ui-Menu_button").first.click()
+    await wait.for_selector("div#ProfileTooltipId button")
+    await page.locator("div#ProfileTooltipId button").first.click()
+    await wait.for_url_change(required=False)
+    await page.close()
+
+    phases.end()
+    award_data["waits"] = wait.timings
     return award_data
@@ -1,57 +1,111 @@
 from tkinter import simpledialog
 import re
 
+from awards._dom import by_text, click_text, read_texts
+from awards._trace import Phases, span
+from awards._wait import PageWaiter
 
-def get_balance(browser, account_info: dict, **kwargs) -> dict:
-    """Get the current points/mileage balance and expected expire date.
+# award program of this script (synced to Awards table, see awards/_registry.py)
+AWARD_PROGRAM = {
+    "category": "Credit Cards",
+    "award": "Bilt",
+    "expire": 0,
+    "note": "",
+    "required_fields": [["email", "Email"]]
+}
 
-    :param browser: Chrome debug browser (Playwright)
-    :param account_info: account information from database
-    :return: current points/mileages balance, expected expire date (None for not expired or unknonw)
-    """
+# seconds all waits of a Bilt update may take
+WAIT_DEADLINE = 180
+# a saved session (cookies) can be reused instead of logging in
+SUPPORTS_SESSION = True
 
-    context = browser.contexts[0]
-    page = context.new_page()
-    award_data = {"balance": 0, "expire_date": None}
 
+def log_in(page, wait: PageWaiter, account_info: dict, prompt=simpledialog.askstring) -> None:
+    """Log in to Bilt with a passcode sent to email.
+
+    :param page: Playwright page
+    :param wait: PageWaiter of the page
+    :param account_info: account information from database
+    :param prompt: function(title, message) asking the passcode
+    """
     page.goto("https://www.biltrewards.com/account")
-    page.wait_for_timeout(3000)
+    wait.for_network_idle()
 
     # log in: browser may go to login page directly
-    login_selector = [q for q in page.query_selector_all("div") if "SIGN UP / LOG IN" == q.inner_text()]
-    if len(login_selector) > 0:
-        next((q for q in page.query_selector_all("div") if "SIGN UP / LOG IN" == q.inner_text()), None).click()
-        page.wait_for_timeout(3000)
-    next((q for q in page.query_selector_all("div") if "Email" == q.inner_text()), None).click()
-    page.wait_for_timeout(3000)
-    username_input = next((q for q in page.query_selector_all("div") if "Your email" == q.inner_text()), None)
-    username_input.click()
-    username_input.query_selector("input").fill(account_info["email"])
-    next((q for q in page.query_selector_all("div") if "Next" == q.inner_text()), None).click()
+    login_selector = by_text(page, "div", "SIGN UP / LOG IN")
+    if login_selector.count() > 0:
+        login_selector.click()
+    wait.for_selector("div:text-is('Email')")
+    click_text(page, "div", "Email")
+    wait.for_selector("div:text-is('Your email')")
+    by_text(page, "div", "Your email").locator("input").fill(account_info["email"])
+    click_text(page, "div", "Next")
 
     # log in with email
-    passcode = simpledialog.askstring(title="Login with email",
-                                      prompt="Please enter passcode from Bilt to your email:")
+    with span("2fa wait"):
+        passcode = prompt("Login with email", "Please enter passcode from Bilt to your email:")
     ###passcode_inputs = next((page.query_selector_all("form")), None).query_selector_all("input")
+    wait.for_selector("form input")
     passcode_inputs = page.query_selector("form").query_selector_all("input")
     for index in range(0, len(passcode_inputs)):
         passcode_inputs[index].click()
         passcode_inputs[index].fill(passcode[index])
-    page.wait_for_timeout(5000)
+    wait.for_selector("a:has-text('Your status')")
+
+
+def log_out(page, wait: PageWaiter) -> None:
+    """Log out from any Bilt page.
+
+    :param page: Playwright page
+    :param wait: PageWaiter of the page
+    """
+    page.locator("a[href='/logout']").last.click()
+    wait.for_selector("button:text-is('Logout')")
+    click_text(page, "button", "Logout")
+    wait.for_url_change(required=False)
+
+
+def get_balance(browser, account_info: dict, **kwargs) -> dict:
+    """Get the current points/mileage balance and expected expire date.
+
+    :param browser: Chrome debug browser (Playwright)
+    :param account_info: account information from database
+    :param kwargs: context - browser context to open a page in (default: the first context of browser)
+                   session - saved session (AccountSession) to skip log in and log out
+                   prompt - function(title, message) asking a passcode (default: Tk dialog)
+    :return: current points/mileages balance, expected expire date (None for not expired or unknonw),
+             timings of waits
+    """
+
+    context = kwargs.get("context") or browser.contexts[0]
+    session = kwargs.get("session")
+    prompt = kwargs.get("prompt") or simpledialog.askstring
+    page = context.new_page()
+    wait = PageWaiter(page=page, deadline=WAIT_DEADLINE)
+    award_data = {"balance": None, "expire_date": None}
+    phases = Phases()
+
+    phases.start("login")
+    # log in unless the saved session is still logged in
+    if session is None or not session.is_valid(page=page, wait=wait, url="https://www.biltrewards.com/account",
+                                                selector="a:has-text('Your status')"):
+        log_in(page=page, wait=wait, account_info=account_info, prompt=prompt)
 
-    # expect that account is still logged in
-    for a in page.query_selector_all("a"):
-        text = a.inner_text()
-        if "points" in text and "Your status" in text:
+    phases.start("extract balance")
+    for text in read_texts(page, "a", contains="Your status"):
+        if "points" in text:
             award_data["balance"] = int(
                 re.search(r"\s(?P<points>[\d,]+) points",text).group("points").replace(",", "")
             )
 
-    # logout
-    [a for a in page.query_selector_all("a") if a.get_attribute("href") == "/logout"][-1].click()
-    page.wait_for_timeout(3000)
-    next((button for button in page.query_selector_all("button") if button.inner_text() == "Logout"), None).click()
-    page.wait_for_timeout(3000)
+    phases.start("logout")
+    # logout: a saved session stays logged in for the next update
+    if session is None:
+        log_out(page=page, wait=wait)
+    else:
+        session.save()
     page.close()
 
+    phases.end()
+    award_data["waits"] = wait.timings
     return award_data
@@ -1,27 +1,51 @@
+from awards._trace import Phases
+from awards._wait import AsyncPageWaiter, PageWaiter
+
+# award program of this script (synced to Awards table, see awards/_registry.py)
+AWARD_PROGRAM = {
+    "category": "Credit Cards",
+    "award": "Chase Ultimate Rewards",
+    "expire": 0,
+    "note": "",
+    "required_fields": [["username", "Username"], ["password", "Password"]]
+}
+
+# seconds all waits of a Chase update may take
+WAIT_DEADLINE = 120
+
+
 def get_balance(browser, account_info: dict, **kwargs) -> dict:
     """Get the current points/mileage balance and expected expire date.
 
     :param browser: Chrome debug browser (Playwright)
     :param account_info: account information from database
-    :return: current points/mileages balance, expected expire date (None for not expired or unknonw)
+    :param kwargs: context - browser context to open a page in (default: the first context of browser)
+    :return: current points/mileages balance, expected expire date (None for not expired or unknonw),
+             timings of waits
     """
 
-    context = browser.contexts[0]
+    context = kwargs.get("context") or browser.contexts[0]
     page = context.new_page()
-    award_data = {"balance": 0, "expire_date": None}
+    wait = PageWaiter(page=page, deadline=WAIT_DEADLINE)
+    award_data = {"balance": None, "expire_date": None}
+    phases = Phases()
 
+    phases.start("goto")
     # directly go to Chase UR page
     page.goto("https://ultimaterewardspoints.chase.com")
-    page.wait_for_timeout(5000)
+    phases.start("login")
+    # locators wait for the login form
     page.get_by_label("Username").fill(account_info["username"])
     page.get_by_label("Password").fill(account_info["password"])
     page.get_by_role("button", name="Sign in").click()
-    page.wait_for_timeout(5000)
+    wait.for_url_change()
+    wait.for_selector("li")
 
+    phases.start("extract balance")
     # select the first card of the list
     ###page.query_selector_all('li')[0].click()
     page.query_selector('li').click()
-    page.wait_for_timeout(5000)
+    wait.for_selector("div.list-item--selectable", state="attached")
 
     # list all UR cards
     ur_cards = []
@@ -37,14 +61,81 @@ def get_balance(browser, account_info: dict, **kwargs) -> dict:
         page.query_selector('button.card-selector-button').click()
         card.click()
         page.get_by_role("button", name="Confirm").click()
-        page.wait_for_timeout(5000)
+        wait.for_selector("div.points-balance")
+        wait.for_network_idle()
         # find points balance
         points_balance = page.query_selector('div.points-balance').inner_text().splitlines()
-        award_data["balance"] += int(points_balance[0].replace(',', ''))
+        award_data["balance"] = (award_data["balance"] or 0) + int(points_balance[0].replace(',', ''))
 
+    phases.start("logout")
     # sign out
     page.locator('text="Sign out"').click()
-    page.wait_for_timeout(5000)
+    wait.for_url_change(required=False)
     page.close()
 
+    phases.end()
+    award_data["waits"] = wait.timings
+    return award_data
+
+
+async def get_balance_async(browser, account_info: dict, **kwargs) -> dict:
+    """Get the current points/mileage balance and expected expire date (Playwright async API).
+
+    :param browser: Chrome debug browser (Playwright async API)
+    :param account_info: account information from database
+    :param kwargs: context - browser context to open a page in (default: the first context of browser)
+    :return: current points/mileages balance, expected expire date (None for not expired or unknonw),
+             timings of waits
+    """
+
+    context = kwargs.get("context") or browser.contexts[0]
+    page = await context.new_page()
+    wait = AsyncPageWaiter(page=page, deadline=WAIT_DEADLINE)
+    award_data = {"balance": None, "expire_date": None}
+    phases = Phases()
+
+    phases.start("goto")
+    # directly go to Chase UR page
+    await page.goto("https://ultimaterewardspoints.chase.com")
+    phases.start("login")
+    # locators wait for the login form
+    await page.get_by_label("Username").fill(account_info["username"])
+    await page.get_by_label("Password").fill(account_info["password"])
+    await page.get_by_role("button", name="Sign in").click()
+    await wait.for_url_change()
+    await wait.for_selector("li")
+
+    phases.start("extract balance")
+    # select the first card of the list
+    await (await page.query_selector('li')).click()
+    await wait.for_selector("div.list-item--selectable", state="attached")
+
+    # list all UR cards
+    ur_cards = []
+    for card in await page.query_selector_all('div.list-item--selectable'):
+        parsed = (await card.inner_text()).split(',')
+        ur_cards.append(parsed[1].strip())
+    for card_name in ur_cards:
+        card = None
+        for _card in await page.query_selector_all('div.list-item--selectable'):
+            if card_name in await _card.inner_text():
+                card = _card
+                break
+        await (await page.query_selector('button.card-selector-button')).click()
+        await card.click()
+        await page.get_by_role("button", name="Confirm").click()
+        await wait.for_selector("div.points-balance")
+        await wait.for_network_idle()
+        # find points balance
+        points_balance = (await (await page.query_selector('div.points-balance')).inner_text()).splitlines()
+        award_data["balance"] = (award_data["balance"] or 0) + int(points_balance[0].replace(',', ''))
+
+    phases.start("logout")
+    # sign out
+    await page.locator('text="Sign out"').first.click()
+    await wait.for_url_change(required=False)
+    await page.close()
+
+    phases.end()
+    award_data["waits"] = wait.timings
     return award_data
@@ -1,21 +1,42 @@
 import re
 
+from awards._trace import Phases
+from awards._wait import PageWaiter
+
+# award program of this script (synced to Awards table, see awards/_registry.py)
+AWARD_PROGRAM = {
+    "category": "Airlines",
+    "award": "Delta Skymiles",
+    "expire": 0,
+    "note": "",
+    "required_fields": [["username", "Username"], ["password", "Password"]]
+}
+
+# seconds all waits of a Delta update may take
+WAIT_DEADLINE = 120
+
 
 def get_balance(browser, account_info: dict, **kwargs) -> dict:
     """Get the current points/mileage balance and expected expire date.
 
     :param browser: Chrome debug browser (Playwright)
     :param account_info: account information from database
-    :return: current points/mileages balance, expected expire date (None for not expired or unknonw)
+    :param kwargs: context - browser context to open a page in (default: the first context of browser)
+    :return: current points/mileages balance, expected expire date (None for not expired or unknonw),
+             timings of waits
     """
 
-    context = browser.contexts[0]
+    context = kwargs.get("context") or browser.contexts[0]
     page = context.new_page()
-    award_data = {"balance": 0, "expire_date": None}
+    wait = PageWaiter(page=page, deadline=WAIT_DEADLINE)
+    award_data = {"balance": None, "expire_date": None}
+    phases = Phases()
 
+    phases.start("goto")
     page.goto("https://www.delta.com")
-    page.wait_for_timeout(3000)
+    wait.for_selector("button[id='login-modal-button']")
 
+    phases.start("login")
     # I noticed Delta page has an unexpected popup message.
     for err_tt in page.query_selector_all("div.idp-error-tooltip"):
         if err_tt.is_visible():
@@ -23,33 +44,32 @@ def get_balance(browser, account_info: dict, **kwargs) -> dict:
                 err_tt.click()
 
     page.query_selector("button[id='login-modal-button']").click()
-    page.wait_for_timeout(3000)
+    wait.for_selector("idp-login-authentication-screen form idp-input input")
     form = page.query_selector("idp-login-authentication-screen").query_selector("form")
     inputs = form.query_selector_all("idp-input")
     inputs[0].click()
     inputs[0].query_selector("input").fill(account_info["username"])
     inputs[1].click()
     inputs[1].query_selector("input").fill(account_info["password"])
-    page.wait_for_timeout(1000)
     form.query_selector("idp-button").click()
-    page.wait_for_timeout(5000)
+    wait.for_selector("idp-login-authentication-screen", state="detached")
 
+    phases.start("extract balance")
     page.goto("https://www.delta.com/myskymiles/overview")
-    page.wait_for_timeout(5000)
+    wait.for_text("MILES AVAILABLE")
     text = page.query_selector("idp-skymiles-overview").query_selector("idp-overview-summary").inner_text()
     award_data["balance"] = int(
         re.search(r"\s+(?P<miles>[\d,]+)\s+MILES AVAILABLE", text).group("miles").replace(",","")
     )
 
-    header_sec = [
-        div for div in page.query_selector("nav").query_selector_all("div")
-        if div.get_attribute("class") is not None and div.get_attribute("class").startswith("d-flex")
-    ][0]
-    header_sec.query_selector("ngc-login").click()
-    page.wait_for_timeout(3000)
-    page.query_selector("div[class='modal-content']").query_selector_all("div")[-1].click()
-    page.wait_for_timeout(5000)
+    phases.start("logout")
+    page.locator("nav >> nth=0 >> div[class^='d-flex']").first.locator("ngc-login").click()
+    wait.for_selector("div[class='modal-content'] div")
+    page.locator("div[class='modal-content'] div").last.click()
+    wait.for_selector("button[id='login-modal-button']", required=False)
 
     page.close()
 
+    phases.end()
+    award_data["waits"] = wait.timings
     return award_data
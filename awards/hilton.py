@@ -2,6 +2,22 @@ import re
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
+from awards._dom import click_text, read_texts
+from awards._trace import Phases
+from awards._wait import PageWaiter
+
+# award program of this script (synced to Awards table, see awards/_registry.py)
+AWARD_PROGRAM = {
+    "category": "Hotels",
+    "award": "Hilton Honors",
+    "expire": 24,
+    "note": "",
+    "required_fields": [["username", "Username"], ["password", "Password"]]
+}
+
+# seconds all waits of a Hilton update may take
+WAIT_DEADLINE = 120
+
 
 def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict:
     """Get the current points/mileage balance and expected expire date.
@@ -9,27 +25,30 @@ def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict
     :param browser: Chrome debug browser (Playwright)
     :param account_info: account information from database
     :param award_info: award information from database
-    :return: current points/mileages balance, expected expire date (None for not expired or unknonw)
+    :param kwargs: context - browser context to open a page in (default: the first context of browser)
+    :return: current points/mileages balance, expected expire date (None for not expired or unknonw),
+             timings of waits
     """
 
-    context = browser.contexts[0]
+    context = kwargs.get("context") or browser.contexts[0]
     page = context.new_page()
-    award_data = {"balance": 0, "expire_date": None}
+    wait = PageWaiter(page=page, deadline=WAIT_DEADLINE)
+    award_data = {"balance": None, "expire_date": None}
+    phases = Phases()
 
+    phases.start("goto")
     page.goto("https://www.hilton.com/")
-    page.wait_for_timeout(3000)
+    wait.for_selector("button:text-is('Sign In')")
 
+    phases.start("login")
     # login : Hilton uses iframe
     next(
         (button for button in page.query_selector_all("button")
             if button.inner_text() == "Sign In" and button.is_visible()),
         None
     ).click()
-    page.wait_for_timeout(2000)
-    frame = next(
-        (frame for frame in page.frames if frame.url == "https://www.hilton.com/en/auth2/guest/login/"),
-        None
-    )
+    frame = wait.for_frame("https://www.hilton.com/en/auth2/guest/login/")
+    wait.for_selector("input", frame=frame)
     inputs = frame.query_selector_all("input")
     inputs[0].click()
     inputs[0].fill(account_info["username"])
@@ -37,19 +56,21 @@ def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict
     inputs[1].fill(account_info["password"])
     next((button for button in frame.query_selector_all("button")
           if button.inner_text() == "Sign In"), None).click()
-    page.wait_for_timeout(5000)
+    wait.for_selector("button:has-text('Hi, ')")
 
+    phases.start("extract balance")
     # go to activity
     page.goto("https://www.hilton.com/en/hilton-honors/guest/activity/")
-    page.wait_for_timeout(10000)
-    containers = page.query_selector("main").query_selector_all("div.container-fluid")
+    wait.for_selector("main div.container-fluid >> nth=1")
+    wait.for_selector("main div.container-fluid >> nth=1 >> section div", state="attached")
+    containers = page.locator("main div.container-fluid")
     award_data["balance"] = int(
-        [line for line in containers[0].inner_text().splitlines() if re.match(r"[\d,]+", line)][0].replace(",", "")
+        [line for line in containers.nth(0).inner_text().splitlines()
+         if re.match(r"[\d,]+", line)][0].replace(",", "")
     )
-    activities = containers[1].query_selector("section").query_selector_all("div")
+    phases.start("extract activity")
     last_act = None
-    for act in containers[1].query_selector("section").query_selector_all("div"):
-        text = act.inner_text()
+    for text in read_texts(containers.nth(1).locator("section").first, "div", contains="Points"):
         if "Points" in text and "through" in text and "again" not in text and re.search(r"\n0$",text) is None \
                 and re.search(r"[+-]+\s*\d+$", text) is not None:
             last_act = text
@@ -58,11 +79,14 @@ def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict
         last_date = datetime.strptime(re.findall(r"\w+ \d{1,2}, \d{4}", last_act)[1], "%B %d, %Y")
         award_data["expire_date"] = last_date + relativedelta(months=award_info["expire"])
 
+    phases.start("logout")
     # log out
-    next((button for button in page.query_selector_all("button") if "Hi, " in button.inner_text()), None).click()
-    page.wait_for_timeout(1000)
-    next((button for button in page.query_selector_all("button") if "Sign Out" in button.inner_text()), None).click()
-    page.wait_for_timeout(2000)
+    click_text(page, "button", "Hi, ", exact=False)
+    wait.for_selector("button:has-text('Sign Out')")
+    click_text(page, "button", "Sign Out", exact=False)
+    wait.for_network_idle()
     page.close()
 
+    phases.end()
+    award_data["waits"] = wait.timings
     return award_data
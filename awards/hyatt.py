@@ -2,6 +2,24 @@ import re
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
+from awards._dom import click_text, fill, read_texts
+from awards._trace import Phases
+from awards._wait import PageWaiter
+
+# award program of this script (synced to Awards table, see awards/_registry.py)
+AWARD_PROGRAM = {
+    "category": "Hotels",
+    "award": "Hyatt (World of Hyatt)",
+    "expire": 24,
+    "note": "",
+    "required_fields": [
+        ["username", "Username or Membership Number"], ["password", "Password"], ["lastname", "Last Name"]
+    ]
+}
+
+# seconds all waits of a Hyatt update may take
+WAIT_DEADLINE = 120
+
 
 def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict:
     """Get the current points/mileage balance and expected expire date.
@@ -9,66 +27,63 @@ def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict
     :param browser: Chrome debug browser (Playwright)
     :param account_info: account information from database
     :param award_info: award information from database
-    :return: current points/mileages balance, expected expire date (None for not expired or unknonw)
+    :param kwargs: context - browser context to open a page in (default: the first context of browser)
+    :return: current points/mileages balance, expected expire date (None for not expired or unknonw),
+             timings of waits
     """
 
-    context = browser.contexts[0]
+    context = kwargs.get("context") or browser.contexts[0]
     page = context.new_page()
-    award_data = {"balance": 0, "expire_date": None}
+    wait = PageWaiter(page=page, deadline=WAIT_DEADLINE)
+    award_data = {"balance": None, "expire_date": None}
+    phases = Phases()
 
+    phases.start("goto")
     page.goto("https://www.hyatt.com/")
-    page.wait_for_timeout(3000)
+    wait.for_selector("div[data-locator='account-panel']")
 
+    phases.start("login")
     # log in
     page.query_selector("div[data-locator='account-panel']").click()
-    page.wait_for_timeout(3000)
-    next((form for form in page.query_selector_all("form")if "SIGN IN" in form.inner_text()), None).click()
-    page.wait_for_timeout(2000)
-    next(
-        (form for form in page.query_selector_all("div.signin-with-pwd-button")
-            if "SIGN IN WITH PASSWORD" in form.inner_text()),
-        None
-    ).click()
-    page.wait_for_timeout(2000)
-    signin_form = page.query_selector("form[name=signin-form]")
-    userid_input = signin_form.query_selector("input[name=userId]")
-    userid_input.click()
-    userid_input.fill(account_info["username"])
-    lastname_input = signin_form.query_selector("input[name=lastName]")
-    lastname_input.click()
-    lastname_input.fill(account_info["lastname"])
-    password_input = signin_form.query_selector("input[name=password]")
-    password_input.click()
-    password_input.fill(account_info["password"])
-    next((div for div in signin_form.query_selector_all("div") if "SIGN IN" == div.inner_text()), None).click()
-    page.wait_for_timeout(1000)
+    wait.for_selector("form:has-text('SIGN IN')")
+    click_text(page, "form", "SIGN IN", exact=False)
+    wait.for_selector("div.signin-with-pwd-button")
+    click_text(page, "div.signin-with-pwd-button", "SIGN IN WITH PASSWORD", exact=False)
+    wait.for_selector("form[name=signin-form] input[name=userId]")
+    signin_form = page.locator("form[name=signin-form]")
+    fill(signin_form, "input[name=userId]", account_info["username"])
+    fill(signin_form, "input[name=lastName]", account_info["lastname"])
+    fill(signin_form, "input[name=password]", account_info["password"])
+    click_text(signin_form, "div", "SIGN IN")
+    wait.for_selector("form[name=signin-form]", state="detached")
     page.query_selector("div[data-locator=account-panel]").click()
 
+    phases.start("extract balance")
     # get balance info
     page.goto("https://www.hyatt.com/profile/en-US/account-overview")
-    page.wait_for_timeout(3000)
-    for div in page.query_selector_all("div"):
-        balance = re.search(r"Current Point Balance\s+(?P<bal>[\d+,]+)\s*$", div.inner_text())
+    wait.for_text("Current Point Balance")
+    for text in read_texts(page, "div", contains="Current Point Balance"):
+        balance = re.search(r"Current Point Balance\s+(?P<bal>[\d+,]+)\s*$", text)
         if balance is not None:
             award_data["balance"] = int(balance.group("bal").replace(",", ""))
             break
         else:
-            balance = re.search(r"(?P<bal>[\d+,]+)\s+Current Point Balance",div.inner_text())
+            balance = re.search(r"(?P<bal>[\d+,]+)\s+Current Point Balance", text)
             if balance is not None:
                 award_data["balance"] = int(balance.group("bal").replace(",", ""))
                 break
 
+    phases.start("extract activity")
     # get the latest activity
     page.goto("https://www.hyatt.com/profile/en-US/account-activity")
     retry = 0
     while retry < 3:
-        page.wait_for_timeout(5000)
-        tranactions = page.query_selector_all("div[data-js='transactions']")
-        if tranactions is not None:
-            all_activities = tranactions[0].query_selector_all("div.b-mb2")
+        wait.for_selector("div[data-js='transactions'] div.b-mb2", timeout=15, required=False)
+        tranactions = page.locator("div[data-js='transactions']")
+        if tranactions.count() > 0:
+            all_activities = read_texts(tranactions.first, "div.b-mb2")
             if len(all_activities) > 0:
-                for act in all_activities:
-                    act_info = act.inner_text()
+                for act_info in all_activities:
                     regex = re.search(r"Points\s+(?P<points>[-\d,]+)", act_info)
                     if regex is not None:
                         points = int(regex.group("points").replace(",", ""))
@@ -79,20 +94,26 @@ def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict
                             ).group("act_date")
                             award_data["expire_date"] = datetime.strptime(act_date, "%b %d, %Y") \
                                                         + relativedelta( months=award_info["expire"])
+                            phases.start("logout")
                             page.query_selector("div[data-locator='account-panel']").click()
 
                             page.query_selector("div.hbe-header_profile-signout").click()
-                            page.wait_for_timeout(2000)
+                            wait.for_network_idle()
                             page.close()
 
+                            phases.end()
+                            award_data["waits"] = wait.timings
                             return award_data
         retry += 1
         print(f"Hyatt: could not get div[data-js='transactions']: Try #{retry}")
 
+    phases.start("logout")
     page.query_selector("div[data-locator='account-panel']").click()
 
     page.query_selector("div.hbe-header_profile-signout").click()
-    page.wait_for_timeout(2000)
+    wait.for_network_idle()
     page.close()
 
+    phases.end()
+    award_data["waits"] = wait.timings
     return award_data
@@ -2,30 +2,39 @@ import re
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
+from awards._trace import Phases
+from awards._wait import PageWaiter
 
-def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict:
-    """Get the current points/mileage balance and expected expire date.
+# award program of this script (synced to Awards table, see awards/_registry.py)
+AWARD_PROGRAM = {
+    "category": "Hotels",
+    "award": "IHG One Rewards",
+    "expire": 12,
+    "note": "Points do not expire for elite members.",
+    "required_fields": [["username", "Username"], ["password", "Password"]]
+}
 
-    :param browser: Chrome debug browser (Playwright)
-    :param account_info: account information from database
-    :param award_info: award information from database
-    :return: current points/mileages balance, expected expire date (None for not expired or unknonw)
-    """
+# seconds all waits of an IHG update may take
+WAIT_DEADLINE = 120
+# a saved session (cookies) can be reused instead of logging in
+SUPPORTS_SESSION = True
 
-    context = browser.contexts[0]
-    page = context.new_page()
-    award_data = {"balance": 0, "expire_date": None}
 
-    page.goto("https://www.ihg.com/")
-    page.wait_for_timeout(3000)
+def log_in(page, wait: PageWaiter, account_info: dict) -> None:
+    """Log in from IHG main page.
 
-    # log in
+    :param page: Playwright page
+    :param wait: PageWaiter of the page
+    :param account_info: account information from database
+    """
+    page.goto("https://www.ihg.com/")
+    wait.for_selector("a.logIn-link")
     next(
         (a for a in page.query_selector_all("a.logIn-link")
             if "Sign in" in a.inner_text() and a.is_visible()),
         None
     ).click()
-    page.wait_for_timeout(3000)
+    wait.for_selector("div.login_modal form input[type='password']")
     login_form = page.query_selector("div.login_modal").query_selector("form")
     input_id = login_form.query_selector("input[data-gigya-name='loginID']")
     input_id.click()
@@ -38,19 +47,73 @@ def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict
             if signin.get_attribute("value") == "Sign in"),
         None
     ).click()
-    page.wait_for_timeout(3000)
+    wait.for_selector("div.login_modal", state="hidden")
+
 
+def log_out(page, wait: PageWaiter) -> None:
+    """Log out from any IHG page.
+
+    :param page: Playwright page
+    :param wait: PageWaiter of the page
+    """
+    if page.query_selector_all("div.logIn")[0].is_visible():
+        # desktop mode
+        next(
+            (a for a in page.query_selector("div.logIn").query_selector_all("a")
+                if a.inner_text() == "Sign out"),
+            None
+        ).click()
+    else:
+        # mobile mode
+        page.query_selector("div.mobileNav").click()
+        wait.for_selector("li.mobileNavMenu-list-item:has-text('Sign out')")
+        next(
+            (li for li in page.query_selector_all("li.mobileNavMenu-list-item")[::]
+                if li.inner_text() == "Sign out"),
+            None
+        ).click()
+    wait.for_network_idle()
+
+
+def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict:
+    """Get the current points/mileage balance and expected expire date.
+
+    :param browser: Chrome debug browser (Playwright)
+    :param account_info: account information from database
+    :param award_info: award information from database
+    :param kwargs: context - browser context to open a page in (default: the first context of browser)
+                   session - saved session (AccountSession) to skip log in and log out
+    :return: current points/mileages balance, expected expire date (None for not expired or unknonw),
+             timings of waits
+    """
+
+    context = kwargs.get("context") or browser.contexts[0]
+    session = kwargs.get("session")
+    page = context.new_page()
+    wait = PageWaiter(page=page, deadline=WAIT_DEADLINE)
+    award_data = {"balance": None, "expire_date": None}
+    phases = Phases()
+
+    phases.start("login")
+    # log in unless the saved session is still logged in
+    if session is None or not session.is_valid(page=page, wait=wait, url="https://www.ihg.com/",
+                                                selector="a.logIn-link:has-text('Sign out')"):
+        log_in(page=page, wait=wait, account_info=account_info)
+
+    phases.start("extract balance")
     next(
         (x for x in page.query_selector_all("a.logIn-link")
             if x.is_visible() and x.inner_text() != "Sign out"),
         None
     ).click()
-    page.wait_for_timeout(5000)
+    wait.for_selector("div.right-container")
+    wait.for_selector("span[data-slnm-ihg='memberLevelNameSID']", state="attached")
     text = page.query_selector("div.right-container").inner_text()
     award_data["balance"] = int(
         re.search(r"\s(?P<points>[\d,]+)\s", text).group("points").replace(",", "")
     )
 
+    phases.start("extract activity")
     # IHG points expires in 12 month os inactivity for NON-ELITE member.
     sid = page.query_selector("span[data-slnm-ihg='memberLevelNameSID']")
     if not sid.is_visible() or "Elite" not in sid.inner_text():
@@ -60,7 +123,7 @@ def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict
                 if a.inner_text() == "Account Activity" and a.is_visible()),
             None
         ).click()
-        page.wait_for_timeout(5000)
+        wait.for_selector("app-account-activities div.row >> nth=2")
         activities = page.query_selector("app-account-activities").query_selector_all("div.row")[2:]
         last_activity_date = datetime.strptime(
             next(
@@ -72,25 +135,14 @@ def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict
         )
         award_data["expire_date"] = last_activity_date + relativedelta( months=award_info["expire"])
 
-    # logout
-    if page.query_selector_all("div.logIn")[0].is_visible():
-        # desktop mode
-        next(
-            (a for a in page.query_selector("div.logIn").query_selector_all("a")
-                if a.inner_text() == "Sign out"),
-            None
-        ).click()
+    phases.start("logout")
+    # logout: a saved session stays logged in for the next update
+    if session is None:
+        log_out(page=page, wait=wait)
     else:
-        # mobile mode
-        page.query_selector("div.mobileNav").click()
-        page.wait_for_timeout(3000)
-        next(
-            (li for li in page.query_selector_all("li.mobileNavMenu-list-item")[::]
-                if li.inner_text() == "Sign out"),
-            None
-        ).click()
-
-    page.wait_for_timeout(5000)
+        session.save()
     page.close()
 
+    phases.end()
+    award_data["waits"] = wait.timings
     return award_data
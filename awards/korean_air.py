@@ -1,29 +1,40 @@
 import re
 from datetime import datetime
 
+from awards._trace import Phases
+from awards._wait import PageWaiter
 
-def get_balance(browser, account_info: dict, **kwargs) -> dict:
-    """Get the current points/mileage balance and expected expire date.
+# award program of this script (synced to Awards table, see awards/_registry.py)
+AWARD_PROGRAM = {
+    "category": "Airlines",
+    "award": "Korean Air SkyPass",
+    "expire": 120,
+    "note": "",
+    "required_fields": [["username", "Username"], ["password", "Password"]]
+}
 
-    :param browser: Chrome debug browser (Playwright)
-    :param account_info: account information from database
-    :return: current points/mileages balance, expected expire date (None for not expired or unknonw)
-    """
+# seconds all waits of a Korean Air update may take
+WAIT_DEADLINE = 120
+# a saved session (cookies) can be reused instead of logging in
+SUPPORTS_SESSION = True
 
-    context = browser.contexts[0]
-    page = context.new_page()
-    award_data = {"balance": 0, "expire_date": None}
 
+def log_in(page, wait: PageWaiter, account_info: dict) -> None:
+    """Log in from Korean Air main page.
+
+    :param page: Playwright page
+    :param wait: PageWaiter of the page
+    :param account_info: account information from database
+    """
     # Location: USA, Language: English
     page.goto("https://www.koreanair.com/us/en")
-    page.wait_for_timeout(3000)
+    wait.for_selector("kc-button:has-text('Log in')")
 
-    # log in
     next(
         (button for button in page.query_selector_all("kc-button") if button.inner_text() == "Log in"),
         None
     ).click()
-    page.wait_for_timeout(3000)
+    wait.for_selector("ke-text-input input")
     page.query_selector("ke-text-input").click()
     page.query_selector("ke-text-input").query_selector("input").fill(account_info["username"])
     page.query_selector("ke-password-input").click()
@@ -33,16 +44,57 @@ def get_balance(browser, account_info: dict, **kwargs) -> dict:
             if "Log in" == button.inner_text()),
         None
     ).click()
-    page.wait_for_timeout(3000)
+    wait.for_url_change()
+
+
+def log_out(page, wait: PageWaiter) -> None:
+    """Log out from Korean Air main page.
+
+    :param page: Playwright page
+    :param wait: PageWaiter of the page
+    """
+    page.goto("https://www.koreanair.com")
+    wait.for_selector("ul.headers__utils--list li >> nth=1")
+    page.query_selector("ul.headers__utils--list").query_selector_all("li")[1].click()
+    wait.for_selector("button[id='my-tooltip-logout-btn']")
+    page.query_selector("button[id='my-tooltip-logout-btn']").click()
+    wait.for_network_idle()
+
+
+def get_balance(browser, account_info: dict, **kwargs) -> dict:
+    """Get the current points/mileage balance and expected expire date.
 
-    # go to my profile
-    page.goto("https://www.koreanair.com/my-mileage/overview")
-    page.wait_for_timeout(7000)
+    :param browser: Chrome debug browser (Playwright)
+    :param account_info: account information from database
+    :param kwargs: context - browser context to open a page in (default: the first context of browser)
+                   session - saved session (AccountSession) to skip log in and log out
+    :return: current points/mileages balance, expected expire date (None for not expired or unknonw),
+             timings of waits
+    """
+
+    context = kwargs.get("context") or browser.contexts[0]
+    session = kwargs.get("session")
+    page = context.new_page()
+    wait = PageWaiter(page=page, deadline=WAIT_DEADLINE)
+    award_data = {"balance": None, "expire_date": None}
+    phases = Phases()
+
+    phases.start("login")
+    # log in unless the saved session is still logged in, then go to my profile
+    if session is None or not session.is_valid(page=page, wait=wait,
+                                                url="https://www.koreanair.com/my-mileage/overview",
+                                                selector="span.mileage-my__point"):
+        log_in(page=page, wait=wait, account_info=account_info)
+        page.goto("https://www.koreanair.com/my-mileage/overview")
+    phases.start("extract balance")
+    wait.for_text("Miles")
+    wait.for_selector("span.mileage-my__point")
     earned = page.query_selector_all("span.mileage-my__point")[0].inner_text()
     award_data["balance"] = int(
         re.search(r"(?P<miles>[\d,]+)\s*Miles",earned).group("miles").replace(",", "")
     )
 
+    phases.start("extract activity")
     # find mile validity
     if award_data["balance"] > 0:
         next(
@@ -50,17 +102,18 @@ def get_balance(browser, account_info: dict, **kwargs) -> dict:
                 if button.inner_text() == "Mileage per valid period"),
             None
         ).click()
+        wait.for_selector("table tr >> nth=1")
         expire_month = page.query_selector("table").query_selector_all("tr")[1].query_selector("th").inner_text()
         award_data["expire_date"] = datetime.strptime(expire_month, "%Y.%m")
 
-    # log out
-    page.goto("https://www.koreanair.com")
-    page.wait_for_timeout(3000)
-    page.query_selector("ul.headers__utils--list").query_selector_all("li")[1].click()
-    page.wait_for_timeout(3000)
-    page.query_selector("button[id='my-tooltip-logout-btn']").click()
-
-    page.wait_for_timeout(2000)
+    phases.start("logout")
+    # log out: a saved session stays logged in for the next update
+    if session is None:
+        log_out(page=page, wait=wait)
+    else:
+        session.save()
     page.close()
 
+    phases.end()
+    award_data["waits"] = wait.timings
     return award_data
@@ -3,38 +3,46 @@ from datetime import datetime
 from dateutil.relativedelta import relativedelta
 from tkinter import simpledialog
 
+from awards._trace import Phases, span
+from awards._wait import PageWaiter
 
-def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict:
-    """Get the current points/mileage balance and expected expire date.
+# award program of this script (synced to Awards table, see awards/_registry.py)
+AWARD_PROGRAM = {
+    "category": "Hotels",
+    "award": "Marriott Bonvoy",
+    "expire": 24,
+    "note": "",
+    "required_fields": [["username", "Username"], ["password", "Password"]]
+}
 
-    :param browser: Chrome debug browser (Playwright)
-    :param account_info: account information from database
-    :param award_info: award information from database
-    :return: current points/mileages balance, expected expire date (None for not expired or unknonw)
-    """
+# seconds all waits of a Marriott update may take
+WAIT_DEADLINE = 180
+# a saved session (cookies) can be reused instead of logging in
+SUPPORTS_SESSION = True
+
+LOGIN_FRAME_URL = "https://www.marriott.com/signInOverlay.mi?overlay=true"
 
-    context = browser.contexts[0]
-    page = context.new_page()
-    award_data = {"balance": 0, "expire_date": None}
 
+def log_in(page, wait: PageWaiter, account_info: dict, prompt=simpledialog.askstring) -> None:
+    """Log in with the Marriott sign in overlay. Marriott may ask a passcode sent to email.
+
+    :param page: Playwright page
+    :param wait: PageWaiter of the page
+    :param account_info: account information from database
+    :param prompt: function(title, message) asking the passcode
+    """
     page.goto("https://www.marriott.com/signInOverlay.mi")
-    page.wait_for_timeout(3000)
+    login_frame = wait.for_frame(LOGIN_FRAME_URL)
+    wait.for_selector("form input", frame=login_frame)
     try:
-        login_frame = next(
-            (frame for frame in page.frames if frame.url == "https://www.marriott.com/signInOverlay.mi?overlay=true"),
-            None
-        )
         login_frame.query_selector("button[aria-label='Sign in with different account']").click()
-        page.wait_for_timeout(3000)
+        wait.for_selector("form input[type='password']", frame=login_frame)
     except AttributeError:
         # there is no save account info. Just login
         pass
 
     # log in
-    login_frame = next(
-        (frame for frame in page.frames if frame.url == "https://www.marriott.com/signInOverlay.mi?overlay=true"),
-        None
-    )
+    login_frame = next((frame for frame in page.frames if frame.url == LOGIN_FRAME_URL), None)
     login_form = login_frame.query_selector("form")
     login_form.query_selector_all("input")[0].click()
     login_form.query_selector_all("input")[0].fill(account_info["username"])
@@ -43,9 +51,9 @@ def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict
     # Marriott page has a misspelled component. oh....
     if login_form.query_selector_all("div.form-field-contaioner")[2].query_selector("input").is_checked():
         login_form.query_selector_all("div.form-field-contaioner")[2].click()
-        page.wait_for_timeout(1000)
     login_form.query_selector("button").click()
-    page.wait_for_timeout(5000)
+    wait.for_url_change()
+    wait.for_selector("main")
 
     # Marriott may ask you for 2nd authentication
     if "Email code to" in page.query_selector("main").inner_text():
@@ -56,18 +64,57 @@ def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict
         ).query_selector("label").click()
         page.query_selector("div.confirm-identity-container").query_selector("button").click()
         # get code
-        passcode = simpledialog.askstring(
-            "Identity Verification", "Please enter passcode from Marriott to your email:"
-        )
+        with span("2fa wait"):
+            passcode = prompt("Identity Verification", "Please enter passcode from Marriott to your email:")
         passcode_input = page.query_selector("input[type='number']")
         passcode_input.click()
         passcode_input.fill(passcode)
         page.query_selector("button[data-testid='verify-button']").click()
-        page.wait_for_timeout(5000)
+        wait.for_url_change()
+
+
+def log_out(page, wait: PageWaiter) -> None:
+    """Log out from any Marriott page.
+
+    :param page: Playwright page
+    :param wait: PageWaiter of the page
+    """
+    page.query_selector("li.m-header__acnt").click()
+    page.query_selector("a.mp__member-logout").click()
+    wait.for_url_change(required=False)
+
+
+def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict:
+    """Get the current points/mileage balance and expected expire date.
+
+    :param browser: Chrome debug browser (Playwright)
+    :param account_info: account information from database
+    :param award_info: award information from database
+    :param kwargs: context - browser context to open a page in (default: the first context of browser)
+                   session - saved session (AccountSession) to skip log in and log out
+                   prompt - function(title, message) asking a passcode (default: Tk dialog)
+    :return: current points/mileages balance, expected expire date (None for not expired or unknonw),
+             timings of waits
+    """
 
-    # account info
-    page.goto("https://www.marriott.com/loyalty/myAccount/activity.mi")
-    page.wait_for_timeout(5000)
+    context = kwargs.get("context") or browser.contexts[0]
+    session = kwargs.get("session")
+    prompt = kwargs.get("prompt") or simpledialog.askstring
+    page = context.new_page()
+    wait = PageWaiter(page=page, deadline=WAIT_DEADLINE)
+    award_data = {"balance": None, "expire_date": None}
+    phases = Phases()
+
+    phases.start("login")
+    # account info: log in unless the saved session is still logged in
+    if session is None or not session.is_valid(page=page, wait=wait,
+                                                url="https://www.marriott.com/loyalty/myAccount/activity.mi",
+                                                selector="div.container__left--points"):
+        log_in(page=page, wait=wait, account_info=account_info, prompt=prompt)
+        page.goto("https://www.marriott.com/loyalty/myAccount/activity.mi")
+    phases.start("extract balance")
+    wait.for_selector("div.container__left--points")
+    wait.for_selector("div[role='row']", state="attached", required=False)
     award_data["balance"] = int(
         next(
             (line for line in page.query_selector("div.container__left--points").inner_text().splitlines()
@@ -75,6 +122,7 @@ def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict
             None
         ).replace(",", "")
     )
+    phases.start("extract activity")
     # find the last activity
     for div in page.query_selector_all("div[role='row']"):
         regex = re.search(r"(?P<points>[\d,]+)\s+Points", div.inner_text())
@@ -82,10 +130,14 @@ def get_balance(browser, account_info: dict, award_info: dict, **kwargs) -> dict
             last_date = datetime.strptime(div.inner_text().splitlines()[0],"%b %d, %Y")
             award_data["expire_date"] = last_date + relativedelta(months=award_info["expire"])
 
-    # logout
-    page.query_selector("li.m-header__acnt").click()
-    page.query_selector("a.mp__member-logout").click()
-    page.wait_for_timeout(3000)
+    phases.start("logout")
+    # logout: a saved session stays logged in for the next update
+    if session is None:
+        log_out(page=page, wait=wait)
+    else:
+        session.save()
     page.close()
 
+    phases.end()
+    award_data["waits"] = wait.timings
     return award_data
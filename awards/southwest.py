@@ -1,58 +1,72 @@
+from awards._dom import click_text, fill, read_texts
+from awards._trace import Phases
+from awards._wait import PageWaiter
+
+# award program of this script (synced to Awards table, see awards/_registry.py)
+AWARD_PROGRAM = {
+    "category": "Airlines",
+    "award": "Southwest Rapid Rewards",
+    "expire": 0,
+    "note": "",
+    "required_fields": [["username", "Username"], ["password", "Password"]]
+}
+
+# seconds all waits of a Southwest update may take
+WAIT_DEADLINE = 120
+
+
 def get_balance(browser, account_info: dict, **kwargs) -> dict:
     """Get the current points/mileage balance and expected expire date.
 
     :param browser: Chrome debug browser (Playwright)
     :param account_info: account information from database
-    :return: current points/mileages balance, expected expire date (None for not expired or unknonw)
+    :param kwargs: context - browser context to open a page in (default: the first context of browser)
+    :return: current points/mileages balance, expected expire date (None for not expired or unknonw),
+             timings of waits
     """
 
-    context = browser.contexts[0]
+    context = kwargs.get("context") or browser.contexts[0]
     page = context.new_page()
-    award_data = {"balance": 0, "expire_date": None}
+    wait = PageWaiter(page=page, deadline=WAIT_DEADLINE)
+    award_data = {"balance": None, "expire_date": None}
+    phases = Phases()
 
+    phases.start("goto")
     page.goto("https://www.southwest.com/")
-    page.wait_for_timeout(3000)
+    wait.for_selector("div.header-control button:has-text('Log in')")
 
+    phases.start("login")
     # log in
-    login_button = next(
-        (div for div in page.query_selector("div.header-control").query_selector_all("button")
-            if "Log in" in div.inner_text()),
-        None
-    )
-    login_button.click()
-    login_form = page.query_selector("div.overlay-container").query_selector_all("form")[0]
-    login_form.query_selector_all("input")[0].click()
-    login_form.query_selector_all("input")[0].fill(account_info["username"])
-    login_form.query_selector_all("input")[1].click()
-    login_form.query_selector_all("input")[1].fill(account_info["password"])
-    login_form.query_selector("button").click()
-    page.wait_for_timeout(5000)
+    click_text(page, "div.header-control button", "Log in", exact=False)
+    wait.for_selector("div.overlay-container form input")
+    login_form = page.locator("div.overlay-container form").first
+    fill(login_form, "input >> nth=0", account_info["username"])
+    fill(login_form, "input >> nth=1", account_info["password"])
+    login_form.locator("button").first.click()
+    wait.for_selector("div.overlay-container", state="hidden")
 
+    phases.start("extract balance")
     page.goto("https://www.southwest.com/account")
 
     retry = 0
     while retry < 3:
         # available credits and points
-        page.wait_for_timeout(3000)
-        points_and_credits = [
-            span for span in page.query_selector_all("span")
-            if span.get_attribute("class") is not None
-               and span.get_attribute("class").startswith("pointsAndTravelCredits_")
-        ]
-        if len(points_and_credits) > 0:
-            award_data["balance"] = int(
-                points_and_credits[0].query_selector_all("span[aria-hidden='true']")[1].inner_text().replace(",", "")
-            )
+        wait.for_selector("span[class^='pointsAndTravelCredits_']", timeout=10, required=False)
+        points_and_credits = page.locator("span[class^='pointsAndTravelCredits_']")
+        if points_and_credits.count() > 0:
+            credit, points = read_texts(points_and_credits.first, "span[aria-hidden='true']")[:2]
+            award_data["balance"] = int(points.replace(",", ""))
             # for future use: available credits ($)
-            award_data["credit"] = float(
-                points_and_credits[0].query_selector_all("span[aria-hidden='true']")[0].inner_text().replace("$", "")
-            )
+            award_data["credit"] = float(credit.replace("$", ""))
             break
         retry += 1
 
+    phases.start("logout")
     # log out
-    next((button for button in page.query_selector_all("button") if button.inner_text() == "Log out"), None).click()
-    page.wait_for_timeout(3000)
+    click_text(page, "button", "Log out")
+    wait.for_network_idle()
     page.close()
 
+    phases.end()
+    award_data["waits"] = wait.timings
     return award_data
@@ -1,24 +1,47 @@
 import re
 from datetime import datetime
 
+from awards._dom import read_text
+from awards._trace import Phases
+from awards._wait import PageWaiter
+
+# award program of this script (synced to Awards table, see awards/_registry.py)
+AWARD_PROGRAM = {
+    "category": "Airlines",
+    "award": "United MileagePlus",
+    "expire": 0,
+    "note": "",
+    "required_fields": [["username", "Username"], ["password", "Password"]]
+}
+
+# seconds all waits of a United update may take
+WAIT_DEADLINE = 120
+
 
 def get_balance(browser, account_info: dict, **kwargs) -> dict:
     """Get the current points/mileage balance and expected expire date.
 
     :param browser: Chrome debug browser (Playwright)
     :param account_info: account information from database
-    :return: current points/mileages balance, expected expire date (None for not expired or unknonw)
+    :param kwargs: context - browser context to open a page in (default: the first context of browser)
+    :return: current points/mileages balance, expected expire date (None for not expired or unknonw),
+             timings of waits
     """
 
-    context = browser.contexts[0]
+    context = kwargs.get("context") or browser.contexts[0]
     page = context.new_page()
-    award_data = {"balance": 0, "expire_date": None}
+    wait = PageWaiter(page=page, deadline=WAIT_DEADLINE)
+    award_data = {"balance": None, "expire_date": None}
+    phases = Phases()
 
+    phases.start("goto")
     page.goto("https://www.united.com/us/en")
-    page.wait_for_timeout(3000)
+    wait.for_selector("nav >> nth=1 >> li >> nth=2")
 
+    phases.start("login")
     # log in
     page.query_selector_all("nav")[1].query_selector_all("li")[2].click()
+    wait.for_selector("div.atm-c-drawer__body div.atm-c-textfield input")
     # if the browser stores previously logged account information, click "switch account" button first.
     switch_account = next(
         (button for button in page.query_selector("div.atm-c-drawer__body").query_selector_all("button")
@@ -28,34 +51,32 @@ def get_balance(browser, account_info: dict, **kwargs) -> dict:
     if switch_account is not None:
         page.query_selector("div.atm-c-drawer__body").query_selector("input[type='checkbox']").click()
         switch_account.click()
-        page.wait_for_timeout(2000)
+        wait.for_selector("div.atm-c-drawer__body div.atm-c-textfield input")
 
     entry = page.query_selector("div.atm-c-drawer__body").query_selector("div.atm-c-textfield").query_selector("input")
     entry.click()
     entry.fill(account_info["username"])
     page.query_selector("div.atm-c-drawer__body").query_selector("button[type='submit']").click()
-    page.wait_for_timeout(2000)
+    wait.for_selector("div.atm-c-drawer__body input[type='password']")
     entry = page.query_selector("div.atm-c-drawer__body").query_selector("div.atm-c-textfield").query_selector("input")
     entry.click()
     entry.fill(account_info["password"])
     page.query_selector("div.atm-c-drawer__body").query_selector("button[type='submit']").click()
-    page.wait_for_timeout(3000)
+    wait.for_selector("div.atm-c-drawer__body", state="hidden")
 
+    phases.start("extract balance")
     page.goto("https://www.united.com/en/us/myunited")
-    page.wait_for_timeout(3000)
-    award_data["balance"] = int(
-        next(
-            (div for div in page.query_selector("main").query_selector_all("div")
-                if div.get_attribute("class") is not None and "totalMiles" in div.get_attribute("class")),
-            None
-        ).inner_text().replace(",", "")
-    )
-    page.wait_for_timeout(2000)
+    wait.for_selector("main div[class*='totalMiles']")
+    award_data["balance"] = int(read_text(page, "main div[class*='totalMiles']").replace(",", ""))
 
+    phases.start("logout")
     # log out
     page.query_selector_all("nav")[1].query_selector_all("li")[2].click()
+    wait.for_selector("div.atm-c-drawer__body button")
     page.query_selector("div.atm-c-drawer__body").query_selector("button").click()
-    page.wait_for_timeout(5000)
+    wait.for_network_idle()
     page.close()
 
+    phases.end()
+    award_data["waits"] = wait.timings
     return award_data
@@ -0,0 +1,37 @@
+"""Count Playwright protocol messages (browser round trips) sent by a block of code.
+
+Every Playwright API call which needs the browser (i.e. inner_text(), click(), evaluate()) is one message
+from Python to the Playwright driver, which sends one or more CDP commands to Chrome. Creating a locator
+is not a round trip. Playwright does not expose the count, so this wraps its internal connection.
+
+How to use:
+    with ProtocolCounter() as counter:
+        page.query_selector_all("div")
+    print(counter.count)
+"""
+from playwright._impl._connection import Connection
+
+
+class ProtocolCounter(object):
+    """Context manager counting Playwright protocol messages sent to the browser."""
+
+    def __init__(self):
+        """Initial function."""
+        self.count = 0
+        self._original = None
+
+    def __enter__(self):
+        self._original = Connection.send_message_to_server
+        original = self._original
+        counter = self
+
+        def send_message_to_server(connection, *args, **kwargs):
+            counter.count += 1
+            return original(connection, *args, **kwargs)
+
+        Connection.send_message_to_server = send_message_to_server
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        Connection.send_message_to_server = self._original
+        return False
@@ -0,0 +1,273 @@
+"""Benchmark: ARTDatabase operations on synthetic users, accounts and balance history.
+
+A separate database (ARTDB_BENCH by default, never ARTDB) is filled with synthetic data, i.e.
+4 users x 12 accounts x 5 years of daily balances = 87,600 Histories rows. Each operation is timed over
+a number of calls and the SQL statements per call are counted. Results are written as JSON so that
+runs can be compared (--compare previous.json). --backend runs it on MySQL, on SQLite (a file in a
+temporary directory) or on both, one after the other.
+
+get_all_latest_balances is also run as the GROUP BY query used before LatestBalances, i.e. at 1M rows:
+    python benchmarks/bench_art_db.py --users 10 --accounts 50 --days 2000
+
+How to use:
+    python benchmarks/bench_art_db.py [--users 4] [--accounts 12] [--days 1825] [--calls 20]
+                                      [--database ARTDB_BENCH] [--json results.json] [--compare old.json]
+                                      [--keep] [--backend mysql|sqlite|both]
+    MySQL password is read from ART_DB_PASSWORD or asked.
+"""
+import argparse
+import getpass
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from art_db import ARTDatabase
+from art_db_backend import MySQLBackend, SQLiteBackend
+from awards._registry import registry
+
+
+def fill(art_db: ARTDatabase, users: int, accounts: int, days: int) -> [dict]:
+    """Fill a database with synthetic accounts and daily balances until yesterday.
+
+    :param art_db: ART database (empty)
+    :param users: number of users
+    :param accounts: number of accounts per user (award programs are reused if more than available)
+    :param days: days of balance history per account
+    :return: list of {user, award, username}
+    """
+    awards = [program["award"] for program in registry.get_programs()]
+    created = []
+    for user_index in range(users):
+        user = f"bench_user_{user_index}"
+        for account_index in range(accounts):
+            award = awards[account_index % len(awards)]
+            username = f"{user}_{account_index}"
+            art_db.add_account(user=user, award=award, username=username,
+                               account_info={"username": username, "password": "password"})
+            created.append({"user": user, "award": award, "username": username})
+
+    # history is inserted in bulk; it is not what is measured
+    first_day = date.today() - timedelta(days=days)
+    for account in created:
+        account_id = art_db._get_account_id(award=account["award"], user=account["user"],
+                                            username=account["username"])
+        rows = [(account_id, 1000 + day * 10, first_day + timedelta(days=day)) for day in range(days)]
+        for start in range(0, len(rows), 5000):
+            art_db.db.executemany(
+                "INSERT INTO Histories (account_id, balance, updated) VALUES (%s, %s, %s)", rows[start:start + 5000]
+            )
+    art_db.rebuild_latest_balances()
+    return created
+
+
+def get_all_latest_balances_group_by(art_db: ARTDatabase, user: str) -> list:
+    """Latest balances of a user as queried before LatestBalances: GROUP BY over all Histories (for comparison).
+
+    :param art_db: ART database
+    :param user: name of user
+    :return: rows
+    """
+    return art_db.db.fetchall(
+        "SELECT C.category, A.award, ACC.login, H.balance, ACC.expected_expire, H.updated "
+        "FROM Accounts ACC "
+        "JOIN Awards A ON ACC.award_id = A.id "
+        "JOIN Histories H ON ACC.id = H.account_id "
+        "JOIN Categories C ON A.category_id = C.id "
+        "JOIN "
+        "    (SELECT account_id, MAX(updated) AS max_date FROM Histories GROUP BY account_id) H2 "
+        "    ON H.account_id = H2.account_id AND H.updated = H2.max_date "
+        "WHERE ACC.user = %s "
+        "ORDER BY C.id, A.award",
+        [user]
+    )
+
+
+def measure(art_db: ARTDatabase, name: str, calls: [callable]) -> dict:
+    """Time calls of an operation and count their SQL statements.
+
+    :param art_db: ART database
+    :param name: name of operation
+    :param calls: functions to call, one per measured call
+    :return: {backend, operation, calls, median_ms, p95_ms, max_ms, queries_per_call, cache_hits_per_call}
+             cache_hits_per_call: metadata reads served from memory, i.e. queries saved by the metadata cache
+    """
+    elapsed = []
+    statements = art_db.db.statements
+    cache_hits = art_db.cache_stats["hits"]
+    for call in calls:
+        started = time.perf_counter()
+        call()
+        elapsed.append((time.perf_counter() - started) * 1000)
+    return {
+        "backend": art_db.db.dialect,
+        "operation": name,
+        "calls": len(calls),
+        "median_ms": statistics.median(elapsed),
+        # inclusive: interpolated between measured calls, never above the slowest one
+        "p95_ms": statistics.quantiles(elapsed, n=20, method="inclusive")[18] if len(elapsed) > 1 else elapsed[0],
+        "max_ms": max(elapsed),
+        "queries_per_call": (art_db.db.statements - statements) / len(calls),
+        "cache_hits_per_call": (art_db.cache_stats["hits"] - cache_hits) / len(calls)
+    }
+
+
+def run(art_db: ARTDatabase, accounts: [dict], calls: int) -> [dict]:
+    """Run all operations.
+
+    :param art_db: ART database filled by fill()
+    :param accounts: accounts from fill()
+    :param calls: calls per operation
+    :return: list of measure() outputs
+    """
+    users = sorted({account["user"] for account in accounts})
+    # spread calls over users and award programs
+    picked = [accounts[index * 7 % len(accounts)] for index in range(calls)]
+    awards = [program["award"] for program in registry.get_programs()]
+    return [
+        measure(art_db, "get_all_latest_balances", [
+            lambda user=users[index % len(users)]: art_db.get_all_latest_balances(user=user)
+            for index in range(calls)
+        ]),
+        measure(art_db, "get_all_latest_balances (GROUP BY)", [
+            lambda user=users[index % len(users)]: get_all_latest_balances_group_by(art_db=art_db, user=user)
+            for index in range(calls)
+        ]),
+        measure(art_db, "get_balance_history", [
+            lambda account=account: art_db.get_balance_history(**account) for account in picked
+        ]),
+        # a page deep in the history costs the same as the first one (keyset pagination)
+        measure(art_db, "get_balance_history (page 1 year back)", [
+            lambda account=account: art_db.get_balance_history(**account, limit=50,
+                                                               before=date.today() - timedelta(days=365))
+            for account in picked
+        ]),
+        measure(art_db, "get_account_info", [
+            lambda account=account: art_db.get_account_info(**account) for account in picked
+        ]),
+        # reads of a click on an account in the main window (on_show_award_details)
+        measure(art_db, "show award details", [
+            lambda account=account: [art_db.get_balance_history(**account),
+                                     art_db.get_award_info(award=account["award"]),
+                                     art_db.get_account_info(**account)]
+            for account in picked
+        ]),
+        # history ends yesterday, so the first call of an account adds a row and the next ones update it
+        measure(art_db, "add_balance", [
+            lambda account=account, index=index: art_db.add_balance(**account, balance=index, expire_date=None)
+            for index, account in enumerate(picked)
+        ]),
+        # one batch refresh: every picked account in one transaction
+        measure(art_db, f"add_balances ({len(picked)} accounts)", [
+            lambda: art_db.add_balances([
+                {**account, "balance": index, "expire_date": None} for index, account in enumerate(picked)
+            ])
+        ]),
+        measure(art_db, "add_account", [
+            lambda index=index: art_db.add_account(user="bench_new_user",
+                                                   award=awards[index % len(awards)],
+                                                   username=f"bench_new_{index}",
+                                                   account_info={"username": f"bench_new_{index}",
+                                                                 "password": "password"})
+            for index in range(calls)
+        ]),
+    ]
+
+
+def compare(results: [dict], previous_file: str) -> None:
+    """Print changes from a previous run.
+
+    :param results: results of this run
+    :param previous_file: JSON file of a previous run
+    """
+    with open(previous_file) as f:
+        # results before --backend were MySQL only
+        previous = {
+            (result.get("backend", "mysql"), result["operation"]): result for result in json.load(f)["results"]
+        }
+    print(f"\n{'backend':<8}{'operation':<38}{'median (ms)':>22}{'queries/call':>22}")
+    for result in results:
+        before = previous.get((result["backend"], result["operation"]))
+        if before is None:
+            continue
+        print(f"{result['backend']:<8}{result['operation']:<38}"
+              f"{before['median_ms']:>10.2f} -> {result['median_ms']:<8.2f}"
+              f"{before['queries_per_call']:>10.1f} -> {result['queries_per_call']:<8.1f}")
+
+
+def bench_backend(backend, args) -> [dict]:
+    """Fill a benchmark database on a backend and run all operations.
+
+    :param backend: MySQLBackend or SQLiteBackend
+    :param args: command line arguments
+    :return: list of measure() outputs
+    """
+    if backend.database_exists(args.database):
+        backend.drop_database(args.database)
+    art_db = ARTDatabase(database=args.database, backend=backend)
+
+    started = time.perf_counter()
+    synthetic_accounts = fill(art_db, users=args.users, accounts=args.accounts, days=args.days)
+    print(f"[{backend.dialect}] Filled {len(synthetic_accounts)} accounts x {args.days} days "
+          f"in {time.perf_counter() - started:.1f} s")
+
+    results = run(art_db=art_db, accounts=synthetic_accounts, calls=args.calls)
+    if not args.keep:
+        backend.drop_database(args.database)
+    art_db.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ARTDatabase on synthetic data")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--accounts", type=int, default=12, help="accounts per user")
+    parser.add_argument("--days", type=int, default=1825, help="days of balance history per account")
+    parser.add_argument("--calls", type=int, default=20, help="calls per operation")
+    parser.add_argument("--database", default="ARTDB_BENCH")
+    parser.add_argument("--json", help="file to write results")
+    parser.add_argument("--compare", help="results file of a previous run")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark database")
+    parser.add_argument("--backend", choices=["mysql", "sqlite", "both"], default="mysql")
+    args = parser.parse_args()
+    if args.database == ARTDatabase.DEFAULT_DATABASE:
+        parser.error("benchmark would overwrite the ART database")
+
+    results = []
+    if args.backend in ["mysql", "both"]:
+        password = os.environ.get("ART_DB_PASSWORD") or getpass.getpass("MySQL password: ")
+        results += bench_backend(backend=MySQLBackend(password=password), args=args)
+    if args.backend in ["sqlite", "both"]:
+        # a kept SQLite database stays in the temporary directory
+        results += bench_backend(backend=SQLiteBackend(directory=tempfile.mkdtemp(prefix="art_bench_")), args=args)
+
+    print(f"{'backend':<8}{'operation':<38}{'median (ms)':>12}{'p95 (ms)':>12}{'max (ms)':>12}{'queries/call':>14}"
+          f"{'cache hits/call':>17}")
+    for result in results:
+        print(f"{result['backend']:<8}{result['operation']:<38}{result['median_ms']:>12.2f}{result['p95_ms']:>12.2f}"
+              f"{result['max_ms']:>12.2f}{result['queries_per_call']:>14.1f}{result['cache_hits_per_call']:>17.1f}")
+
+    if args.compare is not None:
+        compare(results=results, previous_file=args.compare)
+    if args.json is not None:
+        accounts = args.users * args.accounts
+        with open(args.json, "w") as f:
+            json.dump({
+                "run": {
+                    "date": datetime.now().isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "backend": args.backend,
+                    "users": args.users,
+                    "accounts": accounts,
+                    "days": args.days,
+                    "histories": accounts * args.days,
+                    "calls": args.calls
+                },
+                "results": results
+            }, f, indent=2)
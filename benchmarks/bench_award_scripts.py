@@ -0,0 +1,80 @@
+"""Benchmark: award scripts replayed from their recordings (see awards/_replay.py), no network needed.
+
+For each recorded award script, get_balance() runs against its recording a few times on a headless
+Chromium launched by Playwright. The time and the number of Playwright protocol messages (CDP calls)
+are reported, and the balance is compared to the recorded one so that a broken script is caught too.
+
+How to use:
+    python awards/_replay.py record <script name> <arg> <arg> ...   (once per award program, needs network)
+    python benchmarks/bench_award_scripts.py [script name ...] [--runs N] [--json output file]
+"""
+import json
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awards._replay import get_recorded_scripts, replay
+from benchmarks._protocol_counter import ProtocolCounter
+
+
+def bench_script(browser, script: str, runs: int) -> dict:
+    """Replay an award script several times.
+
+    :param browser: Playwright browser
+    :param script: name of award script
+    :param runs: number of replays
+    :return: {script, runs, median (s), min (s), round_trips (median), ok (balance matches the recording)}
+    """
+    elapsed = []
+    round_trips = []
+    ok = True
+    for _ in range(runs):
+        with ProtocolCounter() as counter:
+            award_data = replay(browser=browser, script=script)
+        elapsed.append(award_data["elapsed"])
+        round_trips.append(counter.count)
+        ok = ok and award_data["balance"] == award_data["recording"]["balance"]
+    return {
+        "script": script,
+        "runs": runs,
+        "median": statistics.median(elapsed),
+        "min": min(elapsed),
+        "round_trips": int(statistics.median(round_trips)),
+        "ok": ok
+    }
+
+
+if __name__ == "__main__":
+    from playwright.sync_api import sync_playwright
+
+    args = sys.argv[1:]
+    runs = 3
+    output = None
+    if "--runs" in args:
+        runs = int(args.pop(args.index("--runs") + 1))
+        args.remove("--runs")
+    if "--json" in args:
+        output = args.pop(args.index("--json") + 1)
+        args.remove("--json")
+    scripts = args or get_recorded_scripts()
+    if len(scripts) == 0:
+        print("No recordings. Record an award script first: python awards/_replay.py record <script name> ...")
+        sys.exit(1)
+
+    playwright = sync_playwright().start()
+    browser = playwright.chromium.launch()
+    results = []
+    print(f"{'script':<14}{'median (s)':>12}{'min (s)':>12}{'CDP calls':>12}{'balance':>10}")
+    for script_name in scripts:
+        result = bench_script(browser=browser, script=script_name, runs=runs)
+        results.append(result)
+        print(f"{script_name:<14}{result['median']:>12.3f}{result['min']:>12.3f}{result['round_trips']:>12}"
+              f"{'ok' if result['ok'] else 'CHANGED':>10}")
+    browser.close()
+    playwright.stop()
+
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
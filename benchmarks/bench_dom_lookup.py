@@ -0,0 +1,217 @@
+"""Micro-benchmark: element lookups in award scripts, per-element round trips vs awards._dom helpers.
+
+Each case builds a synthetic page shaped like the real site (thousands of div/span elements) and runs
+the element lookup code of an award script as it was ("before") and with awards._dom ("after").
+No network is needed; Chromium is launched by Playwright.
+
+How to use:
+    python benchmarks/bench_dom_lookup.py [number of filler elements (default: 2000)]
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awards._dom import by_text, click_text, read_text, read_texts, search_text
+from benchmarks._protocol_counter import ProtocolCounter
+
+
+def filler(tag: str, count: int) -> str:
+    """Get HTML of filler elements.
+
+    :param tag: tag name of elements
+    :param count: number of elements
+    :return: HTML
+    """
+    return "".join(f"<{tag}><{tag}>item {index}</{tag}></{tag}>" for index in range(count // 2))
+
+
+def hyatt_html(count: int) -> str:
+    """Synthetic Hyatt page with count filler elements."""
+    activities = "".join(
+        f"<div class='b-mb2'>Stay\nJan {day}, 2024 \nPoints {0 if day % 2 else 500}</div>" for day in range(1, 30)
+    )
+    return (
+        f"{filler('div', count)}<div>Current Point Balance 12,345</div>"
+        f"<div data-js='transactions'>{activities}</div>"
+    )
+
+
+def hyatt_before(page) -> int:
+    """Hyatt lookups as in awards/hyatt.py before awards._dom."""
+    for div in page.query_selector_all("div"):
+        balance = re.search(r"Current Point Balance\s+(?P<bal>[\d+,]+)\s*$", div.inner_text())
+        if balance is not None:
+            break
+    for act in page.query_selector_all("div[data-js='transactions']")[0].query_selector_all("div.b-mb2"):
+        if re.search(r"Points\s+(?P<points>[-\d,]+)", act.inner_text()).group("points") != "0":
+            break
+    return int(balance.group("bal").replace(",", ""))
+
+
+def hyatt_after(page) -> int:
+    """Hyatt lookups with awards._dom."""
+    balance = search_text(page, "div", r"Current Point Balance\s+(?P<bal>[\d+,]+)\s*$",
+                          contains="Current Point Balance")
+    for act_info in read_texts(page.locator("div[data-js='transactions']").first, "div.b-mb2"):
+        if re.search(r"Points\s+(?P<points>[-\d,]+)", act_info).group("points") != "0":
+            break
+    return int(balance.group("bal").replace(",", ""))
+
+
+def bilt_html(count: int) -> str:
+    """Synthetic Bilt page with count filler elements."""
+    return (
+        f"{filler('div', count)}<div>SIGN UP / LOG IN</div><div>Email</div>"
+        f"<div>Your email<input></div><div>Next</div>"
+        f"{filler('a', count // 4)}<a>Your status\n 4,321 points</a>"
+    )
+
+
+def bilt_before(page) -> int:
+    """Bilt lookups as in awards/bilt.py before awards._dom."""
+    next((q for q in page.query_selector_all("div") if "SIGN UP / LOG IN" == q.inner_text()), None).click()
+    next((q for q in page.query_selector_all("div") if "Email" == q.inner_text()), None).click()
+    username_input = next((q for q in page.query_selector_all("div") if "Your email" == q.inner_text()), None)
+    username_input.query_selector("input").fill("user@example.com")
+    for a in page.query_selector_all("a"):
+        text = a.inner_text()
+        if "points" in text and "Your status" in text:
+            return int(re.search(r"\s(?P<points>[\d,]+) points", text).group("points").replace(",", ""))
+
+
+def bilt_after(page) -> int:
+    """Bilt lookups with awards._dom."""
+    click_text(page, "div", "SIGN UP / LOG IN")
+    click_text(page, "div", "Email")
+    by_text(page, "div", "Your email").locator("input").fill("user@example.com")
+    for text in read_texts(page, "a", contains="Your status"):
+        if "points" in text:
+            return int(re.search(r"\s(?P<points>[\d,]+) points", text).group("points").replace(",", ""))
+
+
+def aa_html(count: int) -> str:
+    """Synthetic AA page with count filler elements."""
+    buttons = "".join(f"<hp-header-button>Menu {index}</hp-header-button>" for index in range(20))
+    return (
+        f"{buttons}<hp-header-button>Log in</hp-header-button>{filler('div', count)}"
+        f"<hp-account-dropdown-button>Personal account</hp-account-dropdown-button>"
+        f"<div data-testid='award-miles-balance-text'> 98,765 miles</div>"
+    )
+
+
+def aa_before(page) -> int:
+    """AA lookups as in awards/aa.py before awards._dom."""
+    next(
+        (button for button in page.query_selector_all("hp-header-button")
+            if button.inner_text() == "Log in" and button.is_visible()),
+        None
+    ).click()
+    next(
+        (button for button in page.query_selector_all("hp-account-dropdown-button")
+            if button.is_visible() and button.inner_text() == "Personal account"),
+        None
+    ).click()
+    text = page.query_selector("div[data-testid='award-miles-balance-text']").inner_text()
+    return int(re.search(r"\s*(?P<miles>[\d,]+)\s+", text).group("miles").replace(",", ""))
+
+
+def aa_after(page) -> int:
+    """AA lookups with awards._dom."""
+    click_text(page, "hp-header-button", "Log in", visible=True)
+    click_text(page, "hp-account-dropdown-button", "Personal account", visible=True)
+    text = read_text(page, "div[data-testid='award-miles-balance-text']")
+    return int(re.search(r"\s*(?P<miles>[\d,]+)\s+", text).group("miles").replace(",", ""))
+
+
+def southwest_html(count: int) -> str:
+    """Synthetic Southwest page with count filler elements."""
+    return (
+        f"{filler('span', count)}<span class='pointsAndTravelCredits_abc'>"
+        f"<span aria-hidden='true'>$10.00</span><span aria-hidden='true'>54,321</span></span>"
+    )
+
+
+def southwest_before(page) -> int:
+    """Southwest lookups as in awards/southwest.py before awards._dom."""
+    points_and_credits = [
+        span for span in page.query_selector_all("span")
+        if span.get_attribute("class") is not None
+        and span.get_attribute("class").startswith("pointsAndTravelCredits_")
+    ]
+    return int(points_and_credits[0].query_selector_all("span[aria-hidden='true']")[1].inner_text().replace(",", ""))
+
+
+def southwest_after(page) -> int:
+    """Southwest lookups with awards._dom."""
+    points = read_texts(page.locator("span[class^='pointsAndTravelCredits_']").first, "span[aria-hidden='true']")[1]
+    return int(points.replace(",", ""))
+
+
+def ua_html(count: int) -> str:
+    """Synthetic United page with count filler elements."""
+    return f"<main>{filler('div', count)}<div class='app-totalMiles-x'>76,543</div></main>"
+
+
+def ua_before(page) -> int:
+    """United lookups as in awards/ua.py before awards._dom."""
+    return int(
+        next(
+            (div for div in page.query_selector("main").query_selector_all("div")
+                if div.get_attribute("class") is not None and "totalMiles" in div.get_attribute("class")),
+            None
+        ).inner_text().replace(",", "")
+    )
+
+
+def ua_after(page) -> int:
+    """United lookups with awards._dom."""
+    return int(read_text(page, "main div[class*='totalMiles']").replace(",", ""))
+
+
+CASES = [
+    ["hyatt", hyatt_html, hyatt_before, hyatt_after],
+    ["bilt", bilt_html, bilt_before, bilt_after],
+    ["aa", aa_html, aa_before, aa_after],
+    ["southwest", southwest_html, southwest_before, southwest_after],
+    ["ua", ua_html, ua_before, ua_after],
+]
+
+
+def run(page, html: str, function) -> [int, int, float]:
+    """Run a lookup function on a fresh copy of a synthetic page.
+
+    :param page: Playwright page
+    :param html: synthetic page
+    :param function: lookup function(page)
+    :return: [output of function, round trips, seconds]
+    """
+    page.set_content(html)
+    with ProtocolCounter() as counter:
+        started = time.perf_counter()
+        output = function(page)
+        elapsed = time.perf_counter() - started
+    return [output, counter.count, elapsed]
+
+
+if __name__ == "__main__":
+    from playwright.sync_api import sync_playwright
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    playwright = sync_playwright().start()
+    browser = playwright.chromium.launch()
+    page = browser.new_page()
+
+    print(f"{'script':<12}{'before (trips)':>16}{'after (trips)':>16}{'before (s)':>12}{'after (s)':>12}")
+    for script, html_function, before, after in CASES:
+        html = html_function(count)
+        before_output, before_trips, before_time = run(page, html, before)
+        after_output, after_trips, after_time = run(page, html, after)
+        if before_output != after_output:
+            print(f"{script}: output mismatch ({before_output} != {after_output})")
+        print(f"{script:<12}{before_trips:>16}{after_trips:>16}{before_time:>12.3f}{after_time:>12.3f}")
+
+    browser.close()
+    playwright.stop()
@@ -118,6 +118,6 @@ class Settings(tk.Toplevel):
         """Event when update settings button clicked."""
         for index in self.treeview_setting_list.get_children():
             line = self.treeview_setting_list.set(index)
-            self.art_db.set_config(conf_key=line['conf_key'], conf_value=line['conf_value'].replace("\\", "\\\\"))
+            self.art_db.set_config(conf_key=line['conf_key'], conf_value=line['conf_value'])
 
         self.destroy()
\ No newline at end of file
@@ -0,0 +1,19 @@
+"""Shared fixtures of ART tests. Tests run without Chrome, Playwright or MySQL (SQLite databases in tmp_path)."""
+import os
+import sys
+
+import pytest
+
+# modules of ART are at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from art_db import ARTDatabase
+from art_db_backend import SQLiteBackend
+
+
+@pytest.fixture
+def art_db(tmp_path):
+    """ART database on an SQLite file."""
+    art_db = ARTDatabase(backend=SQLiteBackend(directory=str(tmp_path)))
+    yield art_db
+    art_db.close()
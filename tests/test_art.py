@@ -0,0 +1,248 @@
+"""Tests of ART main window without Tk windows (the window and its parts are replaced)."""
+from datetime import date, timedelta
+
+from art import ART, HISTORY_PAGE_SIZE
+from test_art_db import AWARD, add_account
+
+
+class FakeWindow(object):
+    """Records after() calls instead of running them."""
+
+    def __init__(self):
+        self.scheduled = []
+        # [callback, args] of after_idle() calls
+        self.idle = []
+
+    def after(self, milliseconds, callback):
+        self.scheduled.append(callback)
+        return len(self.scheduled)
+
+    def after_idle(self, callback, *args):
+        self.idle.append([callback, args])
+
+    def after_cancel(self, identifier):
+        pass
+
+    def run_idle(self):
+        idle, self.idle = self.idle, []
+        for callback, args in idle:
+            callback(*args)
+
+
+class FakeStatusText(object):
+
+    def __init__(self):
+        self.value = "Ready"
+
+    def set(self, value):
+        self.value = value
+
+
+class FakeExport(object):
+
+    def __init__(self, events, finished=False):
+        self.events = events
+        self.finished = finished
+
+    def poll(self):
+        events, self.events = self.events, []
+        return events
+
+
+class FakeTreeview(object):
+    """Rows of a Treeview in their order."""
+
+    def __init__(self):
+        self.rows = {}
+        self.children = []
+        self.inserted = 0
+        # calls which change rows
+        self.calls = []
+
+    def insert(self, parent, index, values):
+        self.inserted += 1
+        item = f"I{self.inserted:03}"
+        self.calls.append("insert")
+        self.rows[item] = values
+        self.children.insert(len(self.children) if index == "end" else index, item)
+        return item
+
+    def delete(self, *items):
+        self.calls.append("delete")
+        for item in items:
+            self.children.remove(item)
+            del self.rows[item]
+
+    def item(self, item, values):
+        self.calls.append("item")
+        self.rows[item] = values
+
+    def move(self, item, parent, index):
+        self.calls.append("move")
+        self.children.remove(item)
+        self.children.insert(index, item)
+
+    def get_children(self):
+        return tuple(self.children)
+
+    def values(self):
+        return [self.rows[item] for item in self.children]
+
+
+class FakeCombo(object):
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class FakeScrollbar(object):
+
+    def set(self, first, last):
+        pass
+
+
+class FakeRefresher(object):
+
+    def poll(self, on_prompt=None):
+        return []
+
+    def get_status(self):
+        return {"running": [], "queued": [("u", "Delta SkyMiles", "1")], "failed": {}}
+
+
+class FakeScheduler(object):
+
+    def __init__(self, submitted):
+        self.submitted = submitted
+
+    def record(self, events):
+        pass
+
+    def tick(self):
+        return self.submitted
+
+
+def make_art(**parts) -> ART:
+    """ART without its window."""
+    art = object.__new__(ART)
+    art.win = FakeWindow()
+    art.status_text = FakeStatusText()
+    art.export_status = None
+    for name, value in parts.items():
+        setattr(art, name, value)
+    return art
+
+
+def test_poll_export_without_events_polls_again():
+    art = make_art(export=FakeExport(events=[]))
+    art.poll_export()
+    assert art.win.scheduled == [art.poll_export]
+
+
+def test_poll_export_shows_progress():
+    art = make_art(refresher=FakeRefresher(),
+                   export=FakeExport(events=[{"event": "progress", "accounts_done": 1, "accounts": 2, "rows": 10}]))
+    art.poll_export()
+    assert art.status_text.value == "Updating: - | Queued: 1 | Exporting: 1/2 accounts, 10 rows"
+
+
+def test_poll_refresher_shows_scheduled_updates():
+    art = make_art(refresher=FakeRefresher(), scheduler=FakeScheduler(submitted=True))
+    art.poll_refresher()
+    assert art.win.scheduled == [art.poll_refresher]
+    assert art.status_text.value == "Updating: - | Queued: 1"
+
+
+def test_update_all_report_counts_accounts_which_were_not_updated(monkeypatch):
+    import art
+
+    messages = []
+    monkeypatch.setattr(art.messagebox, "showinfo", lambda title, message: messages.append(message))
+    art_app = make_art()
+    art_app.show_update_all_report(batch={"started": 0, "accounts": 10, "cancelled": 1, "failed": 2, "unsaved": 3,
+                                          "serial_baseline": 0})
+    assert messages[0].startswith("Updated 4 accounts (2 not updated, 3 not saved, 1 cancelled)")
+
+
+def test_launch_chrome_does_not_use_the_database(monkeypatch):
+    import art
+
+    commands = []
+    monkeypatch.setattr(art, "get_chrome_command",
+                        lambda chrome_executable, port: commands.append((chrome_executable, port)))
+    # any use of the database from the Chrome thread fails
+    art_app = make_art(art_db=None, chrome_debug_port=9222, chrome_process=None, startup={})
+    art_app.launch_chrome("chrome.exe")
+    assert commands == [("chrome.exe", 9222)]
+    assert art_app.chrome_process is None
+
+
+def test_balance_history_is_loaded_by_page_on_scroll(art_db):
+    add_account(art_db)
+    first = date(2024, 1, 1)
+    days = HISTORY_PAGE_SIZE * 2 + 20
+    art_db.add_balances([
+        {"user": "mike", "award": AWARD, "username": "aa_user", "balance": day, "expire_date": None,
+         "updated": first + timedelta(days=day)}
+        for day in range(days)
+    ])
+    art = make_art(art_db=art_db, treeview_balance_history=FakeTreeview(), scrollbar_balance_history=FakeScrollbar())
+    history = art.treeview_balance_history
+    art.update_balance_history(user="mike", award=AWARD, username="aa_user")
+    assert len(history.children) == HISTORY_PAGE_SIZE
+    art.on_scroll_balance_history("0.0", "0.5")
+    assert art.win.idle == []
+    # the bottom is reached twice before the next page is read
+    art.on_scroll_balance_history("0.4", "0.95")
+    art.on_scroll_balance_history("0.45", "1.0")
+    art.win.run_idle()
+    assert len(history.children) == HISTORY_PAGE_SIZE * 2
+    art.on_scroll_balance_history("0.7", "1.0")
+    art.win.run_idle()
+    assert [balance for _, balance in history.values()] == list(range(days - 1, -1, -1))
+    # the last page is read
+    art.on_scroll_balance_history("0.9", "1.0")
+    assert art.win.idle == []
+    # an account without balance history
+    add_account(art_db, username="other")
+    art.update_balance_history(user="mike", award=AWARD, username="other")
+    assert history.children == [] and art.history_before is None
+
+
+def test_award_list_is_refreshed_by_diff(art_db):
+    for username in ["a", "b"]:
+        add_account(art_db, username=username)
+    art = make_art(art_db=art_db, treeview_award_list=FakeTreeview(), award_list_rows={}, award_list_redraw=None,
+                   combo_owner=FakeCombo("mike"))
+    award_list = art.treeview_award_list
+    # requests until the next frame are merged into one refresh
+    art.schedule_award_list_refresh()
+    art.schedule_award_list_refresh()
+    assert art.win.scheduled == [art.refresh_award_list]
+    art.refresh_award_list()
+    assert [values[:3] for values in award_list.values()] == [
+        ["[ Airlines ]", "", ""], [AWARD, "a", "-"], [AWARD, "b", "-"]
+    ]
+    items = list(award_list.children)
+    award_list.calls = []
+
+    art_db.add_balance(user="mike", award=AWARD, username="b", balance=500, expire_date=None)
+    art_db.add_account(user="mike", award="Alaska Airlines Mileage Plan", username="as_user",
+                       account_info={"username": "as_user", "password": "secret"})
+    art.refresh_award_list()
+    assert [values[:3] for values in award_list.values()] == [
+        ["[ Airlines ]", "", ""], ["Alaska Airlines Mileage Plan", "as_user", "-"], [AWARD, "a", "-"],
+        [AWARD, "b", 500]
+    ]
+    # rows which did not change are kept (with their selection)
+    assert award_list.calls == ["insert", "item"]
+    assert [item for item in award_list.children if item in items] == items
+    art.refresh_award_list()
+    assert award_list.calls == ["insert", "item"]
+
+    art.combo_owner = FakeCombo("jane")
+    art.refresh_award_list()
+    assert award_list.children == [] and art.award_list_rows == {}
@@ -0,0 +1,103 @@
+"""Tests of the async engine with award scripts and browsers given by the tests (no Chrome)."""
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from art_async import AsyncRefresher
+from art_refresh import RefreshWorkerPool
+from awards._registry import registry
+
+
+class FakeContext(object):
+
+    def __init__(self, browser):
+        self.browser = browser
+
+    async def close(self):
+        self.browser.open -= 1
+
+
+class FakeBrowser(object):
+    """Async API browser counting open contexts."""
+
+    def __init__(self):
+        self.open = 0
+        self.most_open = 0
+
+    async def new_context(self):
+        self.open += 1
+        self.most_open = max(self.most_open, self.open)
+        return FakeContext(browser=self)
+
+
+class FakeSyncBrowser(object):
+    """Sync API browser of the worker threads."""
+
+    def new_context(self):
+        return SimpleNamespace(close=lambda: None)
+
+
+async def get_balance_async(browser, account_info, award_info, context, **kwargs):
+    await asyncio.sleep(0.01)
+    if account_info["username"] == "locked":
+        raise RuntimeError("Account is locked")
+    return {"balance": 100, "expire_date": None}
+
+
+def get_balance(browser, account_info, award_info, **kwargs):
+    return {"balance": 200, "expire_date": None, "thread": threading.current_thread().name}
+
+
+@pytest.fixture(autouse=True)
+def award_scripts(monkeypatch):
+    """delta is ported to the async engine, aa is not."""
+    def work_without_chrome(pool):
+        while True:
+            job = pool.jobs.get()
+            if job is None:
+                break
+            pool._run_job(browser=FakeSyncBrowser(), job=job)
+
+    modules = {"delta": SimpleNamespace(RETRIES=0, get_balance_async=get_balance_async),
+               "aa": SimpleNamespace(RETRIES=0, get_balance=get_balance)}
+    monkeypatch.setattr(registry, "get_module", lambda script: modules[script])
+    monkeypatch.setattr(RefreshWorkerPool, "_work", work_without_chrome)
+
+
+def make_job(script: str, username: str) -> dict:
+    return {"user": "mike", "award": script, "username": username, "account_info": {"username": username},
+            "award_info": {"script": script}}
+
+
+def refresh(browser: FakeBrowser, jobs: [dict], concurrency: int) -> [dict]:
+    async def run():
+        refresher = AsyncRefresher(browser=browser, cdp_url="http://localhost:9222", concurrency=concurrency)
+        try:
+            return await asyncio.gather(*[refresher.run(job) for job in jobs])
+        finally:
+            await refresher.close()
+
+    return asyncio.run(run())
+
+
+def test_ported_scripts_run_concurrently_in_new_contexts():
+    browser = FakeBrowser()
+    outputs = refresh(browser=browser, jobs=[make_job("delta", f"user{index}") for index in range(5)], concurrency=2)
+    assert [output["award_data"]["status"] for output in outputs] == ["ok"] * 5
+    assert [output["award_data"]["balance"] for output in outputs] == [100] * 5
+    assert (browser.most_open, browser.open) == (2, 0)
+
+
+def test_unported_scripts_run_on_worker_threads_next_to_ported_ones():
+    browser = FakeBrowser()
+    outputs = refresh(browser=browser, jobs=[make_job("aa", "a"), make_job("delta", "locked"), make_job("aa", "b")],
+                      concurrency=2)
+    assert [(output["job"]["username"], output["award_data"]["status"]) for output in outputs] == [
+        ("a", "ok"), ("locked", "failed"), ("b", "ok")
+    ]
+    assert outputs[0]["award_data"]["balance"] == 200
+    assert outputs[0]["award_data"]["thread"].startswith("art-refresh-")
+    assert "Account is locked" in outputs[1]["award_data"]["error"]
+    assert browser.open == 0
@@ -0,0 +1,75 @@
+"""Tests of art_cli.py without Chrome: updates are replaced by reports of refresh_all_balances()."""
+import json
+import os
+
+import pytest
+
+import art_cli
+import art_refresh
+
+
+def make_report(results: [dict]) -> dict:
+    return {
+        "accounts": len(results), "concurrency": 1, "wall_clock": 1.0, "serial_baseline": 1.0, "speedup": 1.0,
+        "failed": sum(1 for result in results if result["status"] != "ok"),
+        "unsaved": sum(1 for result in results if result["status"] == "ok" and not result["saved"]),
+        "results": results
+    }
+
+
+@pytest.fixture
+def run_refresh(monkeypatch, art_db, tmp_path):
+    """Run art_cli.py refresh with results given by the test; return (exit code, results JSON)."""
+
+    def run(results: [dict]):
+        monkeypatch.setattr(art_cli, "open_database", lambda: art_db)
+        monkeypatch.setattr(art_refresh, "refresh_all_balances", lambda **kwargs: make_report(results))
+        output = tmp_path / "results.json"
+        code = art_cli.main(["refresh", "--all", "--cdp-url", "http://localhost:9222", "--output", str(output)])
+        return code, json.loads(output.read_text())
+
+    return run
+
+
+def test_refresh_exit_code_is_0_if_all_balances_are_saved(run_refresh):
+    code, report = run_refresh([{"status": "ok", "saved": True}])
+    assert code == 0
+    assert report["results"] == [{"status": "ok", "saved": True}]
+
+
+def test_refresh_exit_code_is_1_if_a_balance_is_not_saved(run_refresh):
+    code, report = run_refresh([{"status": "ok", "saved": True}, {"status": "ok", "saved": False}])
+    assert code == 1
+    assert report["unsaved"] == 1
+
+
+def test_refresh_exit_code_is_1_if_an_account_is_not_updated(run_refresh):
+    code, report = run_refresh([{"status": "needs_otp", "saved": False}])
+    assert code == 1
+    assert report["failed"] == 1
+
+
+def test_password_file_readable_by_others_is_refused(tmp_path, monkeypatch):
+    monkeypatch.delenv(art_cli.DB_PASSWORD_ENVIRONMENT, raising=False)
+    path = tmp_path / "password"
+    path.write_text("secret\n")
+    os.chmod(path, 0o644)
+    with pytest.raises(RuntimeError, match="chmod 600"):
+        art_cli.get_db_password(password_file=str(path))
+    os.chmod(path, 0o600)
+    assert art_cli.get_db_password(password_file=str(path)) == "secret"
+
+
+def test_refresh_engine_async_runs_the_async_engine(monkeypatch, art_db, tmp_path):
+    import art_async
+
+    engines = []
+    monkeypatch.setattr(art_cli, "open_database", lambda: art_db)
+    monkeypatch.setattr(art_refresh, "refresh_all_balances",
+                        lambda **kwargs: engines.append("threads") or make_report([]))
+    monkeypatch.setattr(art_async, "refresh_all_balances_async",
+                        lambda **kwargs: engines.append("async") or make_report([]))
+    output = str(tmp_path / "results.json")
+    for engine in ["async", "threads"]:
+        art_cli.main(["refresh", "--all", "--cdp-url", "http://localhost:9222", "--engine", engine, "--output", output])
+    assert engines == ["async", "threads"]
@@ -0,0 +1,286 @@
+"""Tests of ARTDatabase on SQLite: balances, paging of history and migration of older databases."""
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from art_db import ARTDatabase
+from art_db_backend import SQLiteBackend
+
+AWARD = "American Airlines AAdvantage"
+
+
+def add_account(art_db: ARTDatabase, user: str = "mike", username: str = "aa_user") -> None:
+    art_db.add_account(user=user, award=AWARD, username=username,
+                       account_info={"award": AWARD, "first_field": "username", "username": username,
+                                     "password": "secret", "lastname": "Han"})
+
+
+# tables of schema version 2: Histories primary key, but no LatestBalances, AccountFields or has_script
+VERSION_2_TABLES = (
+    "CREATE TABLE Configs (conf_key VARCHAR(50) NOT NULL UNIQUE, conf_label VARCHAR(100), conf_value VARCHAR(300));"
+    "CREATE TABLE Categories (id INTEGER PRIMARY KEY AUTOINCREMENT, category VARCHAR(25) NOT NULL UNIQUE);"
+    "CREATE TABLE Awards (id INTEGER PRIMARY KEY AUTOINCREMENT, category_id INT NOT NULL,"
+    "   award VARCHAR(50) NOT NULL UNIQUE, expire INT NOT NULL, note VARCHAR(100), script VARCHAR(20),"
+    "   required_field_names VARCHAR(200) NOT NULL, required_field_displays VARCHAR(200) NOT NULL);"
+    "CREATE TABLE Accounts (id INTEGER PRIMARY KEY AUTOINCREMENT, award_id INT NOT NULL, user VARCHAR(30) NOT NULL,"
+    "   required_values VARCHAR(500) NOT NULL, expected_expire DATE DEFAULT NULL);"
+    "CREATE INDEX idx_accounts_user ON Accounts (user);"
+    "CREATE TABLE Histories (account_id INT NOT NULL, balance INT NOT NULL, updated DATE NOT NULL,"
+    "   PRIMARY KEY (account_id, updated));"
+)
+# award programs of older databases (Old Airline Miles has no award script any more)
+VERSION_2_AWARDS = (
+    "INSERT INTO Categories (category) VALUES ('Credit Cards'), ('Airlines'), ('Hotels');"
+    "INSERT INTO Awards (category_id, award, expire, note, script, required_field_names, required_field_displays)"
+    "   VALUES (2, 'American Airlines AAdvantage', 24, '', 'aa', 'username; ;password; ;lastname',"
+    "           'Username; ;Password; ;Last Name'),"
+    "          (2, 'Old Airline Miles', 0, '', 'old_airline', 'username', 'Username');"
+)
+
+
+def create_database(path: str, script: str) -> None:
+    """Create an SQLite database of an older schema version."""
+    connection = sqlite3.connect(path)
+    connection.executescript(script)
+    connection.commit()
+    connection.close()
+
+
+def test_datetime_expire_date_is_saved_as_date(art_db):
+    add_account(art_db)
+    # aa.py and hyatt.py parse expire dates with datetime.strptime
+    art_db.add_balance(user="mike", award=AWARD, username="aa_user", balance=1000,
+                       expire_date=datetime(2027, 1, 2))
+    assert art_db.get_account_info(user="mike", award=AWARD, username="aa_user")["expected_expire"] == date(2027, 1, 2)
+    award, username, balance, expected_expire, updated = art_db.get_all_latest_balances(user="mike")["Airlines"][0]
+    assert (award, username, balance, expected_expire, updated) == (AWARD, "aa_user", 1000, date(2027, 1, 2),
+                                                                    date.today())
+    candidates = art_db.get_refresh_candidates()
+    assert [candidate["expected_expire"] for candidate in candidates] == [date(2027, 1, 2)]
+
+
+def test_date_saved_with_a_time_is_read_as_date(art_db):
+    add_account(art_db)
+    # written before datetime was saved as its date
+    art_db.db.execute("UPDATE Accounts SET expected_expire = %s", ["2027-01-02 00:00:00"])
+    assert art_db.get_refresh_candidates()[0]["expected_expire"] == date(2027, 1, 2)
+
+
+def test_account_without_balance_is_not_updated(art_db):
+    add_account(art_db)
+    assert art_db.get_all_latest_balances(user="mike") == {
+        "Airlines": [[AWARD, "aa_user", "-", "Do not expire", "Not updated"]]
+    }
+    assert art_db.get_refresh_candidates()[0]["updated"] is None
+
+
+def test_balance_of_the_same_date_is_replaced_and_latest_is_kept(art_db):
+    add_account(art_db)
+    today = date.today()
+    art_db.add_balances([
+        {"user": "mike", "award": AWARD, "username": "aa_user", "balance": 100, "expire_date": None, "updated": today},
+        {"user": "mike", "award": AWARD, "username": "aa_user", "balance": 200, "expire_date": None, "updated": today},
+        {"user": "mike", "award": AWARD, "username": "aa_user", "balance": 50, "expire_date": None,
+         "updated": today - timedelta(days=3)}
+    ])
+    assert art_db.get_balance_history(user="mike", award=AWARD, username="aa_user") == [
+        [today, 200], [today - timedelta(days=3), 50]
+    ]
+    assert art_db.get_all_latest_balances(user="mike")["Airlines"][0][2] == 200
+
+
+def test_metadata_is_read_once_until_it_is_changed(art_db):
+    art_db.invalidate_metadata()
+    art_db.cache_stats = {"hits": 0, "misses": 0}
+    assert art_db.get_award_info(award=AWARD)["category"] == "Airlines"
+    configs = art_db.get_configs()
+    assert AWARD in [name.split(": ", 1)[1] for name in art_db.get_award_program_names()]
+    assert art_db.cache_stats == {"hits": 2, "misses": 1}
+    # callers get copies
+    configs["refresh_concurrency"]["conf_value"] = "99"
+    art_db.get_award_info(award=AWARD)["required_field_names"].append("pin")
+    assert art_db.get_configs(conf_key="refresh_concurrency")["refresh_concurrency"]["conf_value"] == "4"
+    assert "pin" not in art_db.get_award_info(award=AWARD)["required_field_names"]
+    art_db.set_config(conf_key="refresh_concurrency", conf_value=8)
+    assert art_db.get_configs(conf_key="refresh_concurrency")["refresh_concurrency"]["conf_value"] == "8"
+    assert art_db.cache_stats == {"hits": 5, "misses": 2}
+
+def test_one_record_per_account_and_date(art_db):
+    add_account(art_db)
+    art_db.add_balance(user="mike", award=AWARD, username="aa_user", balance=100, expire_date=None)
+    art_db.add_balance(user="mike", award=AWARD, username="aa_user", balance=150, expire_date=date(2027, 1, 2))
+    assert art_db.db.fetchall("SELECT balance, updated FROM Histories") == [(150, date.today())]
+    assert art_db.get_account_info(user="mike", award=AWARD, username="aa_user")["expected_expire"] == date(2027, 1, 2)
+
+
+def test_expire_date_is_not_saved_without_its_balance(art_db):
+    add_account(art_db)
+    art_db.add_balance(user="mike", award=AWARD, username="aa_user", balance=100, expire_date=date(2027, 1, 2))
+    # Histories.balance is NOT NULL: the whole write is rolled back
+    with pytest.raises(sqlite3.IntegrityError):
+        art_db.add_balance(user="mike", award=AWARD, username="aa_user", balance=None, expire_date=date(2030, 1, 1))
+    assert art_db.get_account_info(user="mike", award=AWARD, username="aa_user")["expected_expire"] == date(2027, 1, 2)
+    assert art_db.get_balance_history(user="mike", award=AWARD, username="aa_user") == [[date.today(), 100]]
+
+def test_latest_balance_is_not_moved_back_by_an_older_date(art_db):
+    add_account(art_db)
+    today = date.today()
+    art_db.add_balances([{"user": "mike", "award": AWARD, "username": "aa_user", "balance": 300, "expire_date": None}])
+    # i.e. an import of older balances after the last update
+    art_db.add_balances([{"user": "mike", "award": AWARD, "username": "aa_user", "balance": 100, "expire_date": None,
+                          "updated": today - timedelta(days=30)}])
+    assert art_db.get_all_latest_balances(user="mike")["Airlines"][0][2:] == [300, "Do not expire", today]
+    # Histories changed without add_balances()
+    art_db.db.execute("DELETE FROM Histories WHERE updated = %s", [today])
+    art_db.rebuild_latest_balances()
+    assert art_db.get_all_latest_balances(user="mike")["Airlines"][0][2:] == [100, "Do not expire",
+                                                                              today - timedelta(days=30)]
+
+def test_balances_of_many_accounts_are_written_at_once(art_db):
+    for username in ["a", "b", "c"]:
+        add_account(art_db, username=username)
+    balances = [
+        {"user": "mike", "award": AWARD, "username": username, "balance": balance, "expire_date": expire_date}
+        for username, balance, expire_date in [("a", 100, date(2027, 1, 2)), ("b", 200, None), ("c", 300, None)]
+    ]
+    assert art_db.add_balances([])["rows"] == 0
+    assert art_db.add_balances(balances)["rows"] == 3
+    assert [row[1:4] for row in art_db.get_all_latest_balances(user="mike")["Airlines"]] == [
+        ["a", 100, date(2027, 1, 2)], ["b", 200, "Do not expire"], ["c", 300, "Do not expire"]
+    ]
+    # nothing is written if an account is not found
+    with pytest.raises(RuntimeError):
+        art_db.add_balances([{**balances[0], "balance": 150}, {**balances[1], "username": "unknown"}])
+    assert art_db.db.fetchone("SELECT SUM(balance) FROM Histories") == (600,)
+
+def test_balance_history_pages_by_keyset(art_db):
+    add_account(art_db)
+    first = date(2024, 1, 1)
+    art_db.add_balances([
+        {"user": "mike", "award": AWARD, "username": "aa_user", "balance": day, "expire_date": None,
+         "updated": first + timedelta(days=day)}
+        for day in range(25)
+    ])
+    pages = []
+    before = None
+    while True:
+        page = art_db.get_balance_history(user="mike", award=AWARD, username="aa_user", limit=10, before=before)
+        if len(page) == 0:
+            break
+        pages.append([balance for _, balance in page])
+        before = page[-1][0]
+    assert pages == [list(range(24, 14, -1)), list(range(14, 4, -1)), list(range(4, -1, -1))]
+
+
+def test_iterate_balance_history_in_chunks(art_db):
+    add_account(art_db)
+    first = date(2024, 1, 1)
+    art_db.add_balances([
+        {"user": "mike", "award": AWARD, "username": "aa_user", "balance": day, "expire_date": None,
+         "updated": first + timedelta(days=day)}
+        for day in range(7)
+    ])
+    chunks = list(art_db.iterate_balance_history(user="mike", award=AWARD, username="aa_user", chunk_size=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert [row for chunk in chunks for row in chunk] == [[first + timedelta(days=day), day] for day in range(7)]
+
+
+def test_migrate_version_2_database(tmp_path):
+    create_database(str(tmp_path / "ARTDB.sqlite3"), VERSION_2_TABLES + VERSION_2_AWARDS + (
+        "INSERT INTO Configs VALUES ('schema_version', '', '2');"
+        "INSERT INTO Accounts (award_id, user, required_values, expected_expire)"
+        "   VALUES (1, 'mike', 'aa_user; ;secret; ;Han', '2027-01-02');"
+        "INSERT INTO Histories VALUES (1, 100, '2024-01-01'), (1, 300, '2024-03-01'), (1, 200, '2024-02-01');"
+    ))
+
+    art_db = ARTDatabase(backend=SQLiteBackend(directory=str(tmp_path)))
+    try:
+        assert art_db.get_schema_version() == ARTDatabase.SCHEMA_VERSION
+        assert art_db.get_account_info(user="mike", award=AWARD, username="aa_user") == {
+            "id": 1, "expected_expire": date(2027, 1, 2), "username": "aa_user", "password": "secret",
+            "lastname": "Han"
+        }
+        assert art_db.get_all_latest_balances(user="mike") == {
+            "Airlines": [[AWARD, "aa_user", 300, date(2027, 1, 2), date(2024, 3, 1)]]
+        }
+        # award programs without an award script are kept but not updated
+        assert "Old Airline Miles" not in [candidate["award"] for candidate in art_db.get_refresh_candidates()]
+        assert art_db.db.fetchone("SELECT has_script FROM Awards WHERE award = 'Old Airline Miles'") == (0,)
+    finally:
+        art_db.close()
+
+
+def test_migrate_account_fields_of_version_3_database(tmp_path):
+    create_database(str(tmp_path / "ARTDB.sqlite3"), VERSION_2_TABLES + VERSION_2_AWARDS + (
+        "CREATE TABLE LatestBalances (account_id INT NOT NULL PRIMARY KEY, balance INT NOT NULL,"
+        "   updated DATE NOT NULL);"
+        "INSERT INTO Configs VALUES ('schema_version', '', '3');"
+        "INSERT INTO Accounts (award_id, user, required_values)"
+        "   VALUES (1, 'mike', 'aa_user; ;secret; ;Han'), (1, 'mike', ' second ; ;pw2; ;Kim '),"
+        "          (1, 'jane', 'third');"
+    ))
+
+    art_db = ARTDatabase(backend=SQLiteBackend(directory=str(tmp_path)))
+    try:
+        assert art_db.get_account_info(user="mike", award=AWARD, username="second") == {
+            "id": 2, "expected_expire": None, "username": "second", "password": "pw2", "lastname": "Kim"
+        }
+        assert art_db.get_account_info(user="jane", award=AWARD, username="third") == {
+            "id": 3, "expected_expire": None, "username": "third"
+        }
+        assert art_db.get_account_info(user="jane", award=AWARD, username="aa_user") is None
+        assert [account["username"] for account in art_db.get_accounts()] == ["third", "aa_user", "second"]
+        assert art_db.db.fetchone("SELECT COUNT(*) FROM AccountFields") == (7,)
+        columns = [row[1] for row in art_db.db.fetchall("PRAGMA table_info(Accounts)")]
+        assert "login" in columns and "required_values" not in columns
+        assert art_db.db.fetchone("SELECT name FROM sqlite_master WHERE name = 'idx_accounts_login'") is not None
+    finally:
+        art_db.close()
+
+class FakeSettingList(object):
+    """Rows of the Settings window."""
+
+    def __init__(self, configs: dict):
+        self.rows = [{"conf_key": key, "conf_value": config["conf_value"]} for key, config in configs.items()]
+
+    def get_children(self):
+        return range(len(self.rows))
+
+    def set(self, index):
+        return self.rows[index]
+
+
+def save_settings(art_db: ARTDatabase) -> None:
+    """Save the Settings window without changes."""
+    from types import SimpleNamespace
+
+    from popups.settings import Settings
+
+    window = SimpleNamespace(art_db=art_db, treeview_setting_list=FakeSettingList(art_db.get_configs()),
+                             destroy=lambda: None)
+    Settings.on_update_settings(window)
+
+
+def test_windows_path_is_kept_by_settings(art_db):
+    default = r"C:\Program Files\Google\Chrome\Application\chrome.exe"
+    assert art_db.get_configs("chrome_executable")["chrome_executable"]["conf_value"] == default
+    art_db.set_config(conf_key="trace_file", conf_value=r"D:\ART\trace.json")
+    assert art_db.get_configs("trace_file")["trace_file"]["conf_value"] == r"D:\ART\trace.json"
+    save_settings(art_db)
+    save_settings(art_db)
+    assert art_db.get_configs("chrome_executable")["chrome_executable"]["conf_value"] == default
+    assert art_db.get_configs("trace_file")["trace_file"]["conf_value"] == r"D:\ART\trace.json"
+
+
+def test_migration_repairs_doubled_backslashes(art_db):
+    art_db.db.execute("UPDATE Configs SET conf_value = %s WHERE conf_key = 'chrome_executable'",
+                      [r"C:\\\\Program Files\\\\chrome.exe"])
+    art_db.db.execute("UPDATE Configs SET conf_value = %s WHERE conf_key = 'session_directory'",
+                      [r"\\\\\\\\server\\\\art\\\\sessions"])
+    art_db._set_schema_version(5)
+    art_db.migrate_schema()
+    configs = art_db.get_configs()
+    assert configs["chrome_executable"]["conf_value"] == r"C:\Program Files\chrome.exe"
+    assert configs["session_directory"]["conf_value"] == r"\\server\art\sessions"
+    assert art_db.get_schema_version() == 6
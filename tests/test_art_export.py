@@ -0,0 +1,66 @@
+"""Tests of the export of accounts and balance history (CSV; XLSX needs openpyxl)."""
+import csv
+from datetime import date
+
+from art_export import EXPORT_COLUMNS, BackgroundExport, export_balance_history
+from test_art_db import AWARD, add_account
+
+
+def read_csv(path) -> [list]:
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_export_every_account_with_its_history(art_db, tmp_path):
+    add_account(art_db, username="a")
+    add_account(art_db, username="b")
+    add_account(art_db, user="kim", username="c")
+    art_db.add_balances([
+        {"user": "mike", "award": AWARD, "username": "a", "balance": balance, "expire_date": date(2027, 1, 2),
+         "updated": date(2024, 1, day)}
+        for day, balance in [(1, 100), (2, 200), (3, 300)]
+    ])
+    path = tmp_path / "export.csv"
+    progress = []
+    result = export_balance_history(art_db=art_db, path=str(path), user="mike", on_progress=progress.append,
+                                    chunk_size=2)
+    assert read_csv(path) == [
+        EXPORT_COLUMNS,
+        ["mike", "Airlines", AWARD, "a", "2027-01-02", "2024-01-01", "100"],
+        ["mike", "Airlines", AWARD, "a", "2027-01-02", "2024-01-02", "200"],
+        ["mike", "Airlines", AWARD, "a", "2027-01-02", "2024-01-03", "300"],
+        # no balance history yet
+        ["mike", "Airlines", AWARD, "b", "", "", ""]
+    ]
+    assert (result["accounts"], result["rows"]) == (2, 4)
+    assert progress[-1] == {"accounts": 2, "accounts_done": 2, "rows": 4}
+
+
+def test_export_all_users(art_db, tmp_path):
+    add_account(art_db, username="a")
+    add_account(art_db, user="kim", username="c")
+    path = tmp_path / "export.csv"
+    export_balance_history(art_db=art_db, path=str(path))
+    assert [row[0] for row in read_csv(path)[1:]] == ["kim", "mike"]
+
+
+def test_background_export_reports_progress_and_result(art_db, tmp_path):
+    add_account(art_db, username="a")
+    add_account(art_db, username="b")
+    export = BackgroundExport(art_db=art_db, path=str(tmp_path / "export.csv"), user="mike")
+    assert export.poll() == [] and not export.finished
+    export.start()
+    export.thread.join()
+    events = export.poll()
+    assert [event["event"] for event in events] == ["progress", "progress", "finished"]
+    assert (events[-1]["accounts"], events[-1]["rows"]) == (2, 2)
+    assert export.finished
+    assert len(read_csv(tmp_path / "export.csv")) == 3
+
+
+def test_background_export_reports_failure(art_db, tmp_path):
+    export = BackgroundExport(art_db=art_db, path=str(tmp_path / "export.txt"))
+    export.start()
+    export.thread.join()
+    assert export.poll() == [{"event": "failed", "error": f"Unknown export file type: {tmp_path / 'export.txt'}"}]
+    assert export.finished
@@ -0,0 +1,140 @@
+"""Tests of refreshing balances without Chrome: award scripts and events of the worker pool are faked."""
+import queue
+
+import pytest
+
+import art_refresh
+import art_result
+from art_refresh import BackgroundRefresher, RefreshWorkerPool, refresh_all_balances
+from test_art_db import AWARD, add_account
+
+
+class FakePool(object):
+    """Worker pool whose events are put by the tests."""
+
+    def __init__(self):
+        self.events = queue.Queue()
+        self.jobs = []
+
+    def submit(self, job):
+        self.jobs.append(job)
+
+    def cancel(self, job):
+        job["cancelled"] = True
+
+
+@pytest.fixture
+def refresher(art_db):
+    for username in ["a", "b", "c"]:
+        add_account(art_db, username=username)
+    refresher = BackgroundRefresher(art_db=art_db, cdp_url="http://localhost:9222")
+    refresher.pool = FakePool()
+    return refresher
+
+
+def finish(refresher: BackgroundRefresher, job: dict, status: str, balance: int = None) -> None:
+    refresher.pool.events.put({"event": "started", "job": job})
+    refresher.pool.events.put({"event": "finished", "job": job, "elapsed": 1.0, "saved": False,
+                               "award_data": {"status": status, "balance": balance, "expire_date": None,
+                                              "error": None if status == "ok" else "error"}})
+
+
+def test_batch_counts_accounts_which_were_not_updated(refresher, art_db):
+    batch = {}
+    for username in ["a", "b", "c"]:
+        assert refresher.submit(user="mike", award=AWARD, username=username, batch=batch)
+    a, b, c = refresher.pool.jobs
+    finish(refresher, a, status="ok", balance=100)
+    finish(refresher, b, status="failed")
+    finish(refresher, c, status="needs_otp")
+    events = refresher.poll()
+    assert [event["saved"] for event in events if event["event"] == "finished"] == [True, False, False]
+    assert (batch["remaining"], batch["failed"], batch["unsaved"]) == (0, 2, 0)
+    assert refresher.get_status()["failed"] == {("mike", AWARD, "b"): "failed", ("mike", AWARD, "c"): "needs_otp"}
+    assert art_db.get_all_latest_balances(user="mike")["Airlines"][0][2] == 100
+
+
+def test_balance_which_could_not_be_written_is_not_saved(refresher, art_db, monkeypatch):
+    def add_balances(balances):
+        raise RuntimeError("database is gone")
+
+    monkeypatch.setattr(art_db, "add_balances", add_balances)
+    batch = {}
+    refresher.submit(user="mike", award=AWARD, username="a", batch=batch)
+    finish(refresher, refresher.pool.jobs[0], status="ok", balance=100)
+    events = refresher.poll()
+    assert events[-1]["saved"] is False
+    assert (batch["failed"], batch["unsaved"]) == (0, 1)
+    assert refresher.get_status()["failed"] == {("mike", AWARD, "a"): "not saved"}
+
+
+def test_cancelled_updates_are_not_written(refresher, art_db):
+    batch = {}
+    for username in ["a", "b"]:
+        assert refresher.submit(user="mike", award=AWARD, username=username, batch=batch)
+    # an account is never queued twice
+    assert not refresher.submit(user="mike", award=AWARD, username="a", batch=batch)
+    a, b = refresher.pool.jobs
+    refresher.pool.events.put({"event": "started", "job": a})
+    refresher.poll()
+    assert refresher.get_status() == {"running": [("mike", AWARD, "a")], "queued": [("mike", AWARD, "b")], "failed": {}}
+    refresher.cancel_all()
+    assert not refresher.cancel(user="mike", award=AWARD, username="c")
+    # the running update finishes; the queued one is skipped by the worker
+    finish(refresher, a, status="ok", balance=100)
+    refresher.pool.events.put({"event": "cancelled", "job": b})
+    events = refresher.poll()
+    assert [(event["event"], event["cancelled"]) for event in events if event["event"] != "started"] == [
+        ("finished", True), ("cancelled", True)
+    ]
+    assert (batch["remaining"], batch["cancelled"], batch["failed"]) == (0, 2, 0)
+    assert refresher.get_status() == {"running": [], "queued": [], "failed": {}}
+    assert art_db.get_all_latest_balances(user="mike")["Airlines"][0][2] == "-"
+    assert refresher.submit(user="mike", award=AWARD, username="a")
+
+
+def test_prompts_are_answered_by_the_gui(refresher):
+    for username in ["a", "b"]:
+        refresher.submit(user="mike", award=AWARD, username=username)
+    a, b = refresher.pool.jobs
+    refresher.cancel(user="mike", award=AWARD, username="b")
+    answers = []
+    for job in [a, b]:
+        answers.append(queue.Queue())
+        refresher.pool.events.put({"event": "prompt", "job": job, "title": "Passcode", "message": "Enter passcode",
+                                   "answer": answers[-1]})
+    refresher.poll(on_prompt=lambda title, message: f"{title}: 123456")
+    assert [answer.get_nowait() for answer in answers] == ["Passcode: 123456", None]
+
+
+def test_update_all_balances_writes_updated_accounts(art_db, monkeypatch):
+    def work_without_chrome(pool):
+        while True:
+            job = pool.jobs.get()
+            if job is None:
+                break
+            pool._run_job(browser=object(), job=job)
+
+    def get_award_data(browser, script, account_info, award_info, **kwargs):
+        if account_info["username"] == "c":
+            raise RuntimeError("Log in failed")
+        return {"balance": len(account_info["username"]) * 100, "expire_date": None}
+
+    for username in ["a", "bb", "c"]:
+        add_account(art_db, username=username)
+    # award scripts import Playwright
+    monkeypatch.setattr(art_result, "get_retries", lambda script: 1)
+    monkeypatch.setattr(art_result, "BACKOFF_SECONDS", 0)
+    monkeypatch.setattr(RefreshWorkerPool, "_work", work_without_chrome)
+    monkeypatch.setattr(art_refresh, "get_award_data", get_award_data)
+    finished = []
+    report = refresh_all_balances(art_db=art_db, cdp_url="http://localhost:9222", user="mike", concurrency=2,
+                                  isolate_contexts=False, on_result=lambda job, award_data: finished.append(job))
+    assert (report["accounts"], report["concurrency"], report["failed"], report["unsaved"]) == (3, 2, 1, 0)
+    assert len(finished) == 3
+    statuses = {result["username"]: (result["status"], result["saved"]) for result in report["results"]}
+    assert statuses == {"a": ("ok", True), "bb": ("ok", True), "c": ("failed", False)}
+    balances = art_db.get_all_latest_balances(user="mike")["Airlines"]
+    assert sorted((username, balance) for _, username, balance, _, _ in balances) == [
+        ("a", 100), ("bb", 200), ("c", "-")
+    ]
@@ -0,0 +1,105 @@
+"""Tests of update results: statuses, retries, passcodes and the circuit breaker."""
+import asyncio
+
+import pytest
+
+import art_result
+from art_result import CircuitBreaker, get_result, get_result_async
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(art_result, "BACKOFF_SECONDS", 0)
+
+
+def make_attempt(*outcomes):
+    """Attempts which return or raise the outcomes in order (an outcome may ask a passcode first)."""
+    calls = []
+
+    def attempt(prompt):
+        outcome = outcomes[len(calls)]
+        calls.append(outcome)
+        if isinstance(outcome, tuple):
+            answer = prompt("Passcode", "Please enter passcode:")
+            outcome = outcome[1] if answer is not None else RuntimeError("No passcode")
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    attempt.calls = calls
+    return attempt
+
+
+def test_ok_after_a_retry():
+    attempt = make_attempt(TimeoutError("slow"), {"balance": 100, "expire_date": None})
+    result = get_result(attempt=attempt, script="delta", retries=2)
+    assert (result["status"], result["balance"], result["attempts"]) == ("ok", 100, 2)
+
+
+def test_failed_after_all_retries_has_no_balance():
+    attempt = make_attempt(TimeoutError("slow"), TimeoutError("slow"), TimeoutError("slow"))
+    result = get_result(attempt=attempt, script="delta", retries=2)
+    assert (result["status"], result["balance"], result["attempts"]) == ("failed", None, 3)
+    assert result["error"] == "TimeoutError: slow"
+
+
+def test_balance_not_found_is_failed():
+    attempt = make_attempt({"balance": None, "expire_date": None}, {"balance": None, "expire_date": None})
+    result = get_result(attempt=attempt, script="hyatt", retries=1)
+    assert (result["status"], result["balance"]) == ("failed", None)
+    assert result["error"] == "LookupError: No balance found"
+
+
+def test_no_passcode_is_needs_otp_and_not_retried():
+    attempt = make_attempt(("prompt", {"balance": 1, "expire_date": None}))
+    result = get_result(attempt=attempt, script="marriott", retries=2)
+    assert (result["status"], result["balance"], len(attempt.calls)) == ("needs_otp", None, 1)
+
+
+def test_failure_after_a_passcode_is_not_retried():
+    attempt = make_attempt(("prompt", RuntimeError("wrong passcode")))
+    result = get_result(attempt=attempt, script="bilt", prompt=lambda title, message: "123456", retries=2)
+    assert (result["status"], len(attempt.calls)) == ("failed", 1)
+
+
+def test_update_which_pauses_its_award_program_is_failed_and_the_next_is_blocked():
+    breaker = CircuitBreaker(failures=2, cooldown=60)
+    attempt = make_attempt(TimeoutError("slow"), TimeoutError("slow"), TimeoutError("slow"))
+    result = get_result(attempt=attempt, script="ua", breaker=breaker, retries=2)
+    assert (result["status"], result["attempts"]) == ("failed", 2)
+    assert breaker.get_paused() == ["ua"]
+    result = get_result(attempt=make_attempt(), script="ua", breaker=breaker, retries=2)
+    assert (result["status"], result["attempts"]) == ("blocked", 0)
+
+
+def test_success_closes_the_breaker():
+    breaker = CircuitBreaker(failures=2, cooldown=60)
+    get_result(attempt=make_attempt(TimeoutError("slow"), {"balance": 1, "expire_date": None}), script="aa",
+               breaker=breaker, retries=1)
+    get_result(attempt=make_attempt(TimeoutError("slow"), {"balance": 1, "expire_date": None}), script="aa",
+               breaker=breaker, retries=1)
+    assert breaker.get_paused() == []
+
+
+def test_breaker_tries_again_after_cooldown(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(art_result.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failures=2, cooldown=60)
+    for _ in range(2):
+        breaker.record(script="ihg", ok=False)
+    assert not breaker.allow("ihg")
+    now[0] += 60
+    assert breaker.allow("ihg")
+    # one more failure pauses it again
+    breaker.record(script="ihg", ok=False)
+    assert not breaker.allow("ihg")
+
+
+def test_async_result_like_sync():
+    outcomes = make_attempt(TimeoutError("slow"), {"balance": None, "expire_date": None})
+
+    async def attempt(prompt):
+        return outcomes(prompt)
+
+    result = asyncio.run(get_result_async(attempt=attempt, script="chase", retries=1))
+    assert (result["status"], result["balance"], result["attempts"]) == ("failed", None, 2)
@@ -0,0 +1,102 @@
+"""Tests of automatic updates: cadence, due dates, the queue and waits after failed updates."""
+from datetime import date, timedelta
+
+import art_scheduler
+from art_scheduler import RefreshScheduler, get_due_accounts, get_due_date, parse_cadence
+from test_art_db import AWARD, add_account
+
+
+class FakeRefresher(object):
+    """Records submitted accounts; every job stays running until finish() is called."""
+
+    def __init__(self):
+        self.submitted = []
+        self.batches = []
+
+    def submit(self, user, award, username, batch=None):
+        self.submitted.append((user, award, username))
+        batch["remaining"] += 1
+        self.batches.append(batch)
+        return True
+
+    def finish(self, status: str) -> [dict]:
+        """Finish all submitted jobs with a status; get their events."""
+        events = []
+        for (user, award, username), batch in zip(self.submitted, self.batches):
+            batch["remaining"] -= 1
+            events.append({"event": "finished", "cancelled": False,
+                           "job": {"user": user, "award": award, "username": username},
+                           "award_data": {"status": status}})
+        self.submitted, self.batches = [], []
+        return events
+
+
+def test_parse_cadence():
+    assert parse_cadence("7") == (7, {})
+    assert parse_cadence("10; Marriott Bonvoy=3 ;Hilton Honors = 0") == (10, {"Marriott Bonvoy": 3, "Hilton Honors": 1})
+    # an invalid part is ignored
+    assert parse_cadence("x; Bilt Rewards=5") == (7, {"Bilt Rewards": 5})
+
+
+def test_due_date_of_account_without_balance_is_now():
+    assert get_due_date(account={"updated": None, "expected_expire": None}, cadence_days=7) == date.min
+
+
+def test_due_date_by_cadence_or_expiration():
+    updated = date(2026, 1, 1)
+    assert get_due_date(account={"updated": updated, "expected_expire": None}, cadence_days=7) == date(2026, 1, 8)
+    expire = date(2026, 2, 1)
+    assert get_due_date(account={"updated": updated, "expected_expire": expire}, cadence_days=7) == date(2026, 1, 2)
+    # about to expire: once a day at most
+    expire = date(2026, 1, 15)
+    assert get_due_date(account={"updated": updated, "expected_expire": expire}, cadence_days=7) == date(2026, 1, 2)
+
+
+def test_due_accounts_are_ordered_by_due_date(art_db):
+    for username in ["stale", "fresh", "new", "expiring"]:
+        add_account(art_db, username=username)
+    today = date.today()
+    art_db.add_balances([
+        {"user": "mike", "award": AWARD, "username": "stale", "balance": 1, "expire_date": None,
+         "updated": today - timedelta(days=30)},
+        {"user": "mike", "award": AWARD, "username": "fresh", "balance": 1, "expire_date": None, "updated": today},
+        {"user": "mike", "award": AWARD, "username": "expiring", "balance": 1,
+         "expire_date": today + timedelta(days=10), "updated": today - timedelta(days=2)}
+    ])
+    due_accounts = get_due_accounts(art_db=art_db, today=today)
+    assert [account["username"] for account in due_accounts] == ["new", "stale", "expiring"]
+
+
+def test_failed_account_waits_and_account_needing_passcode_is_held(art_db, monkeypatch):
+    for username in ["a", "b"]:
+        add_account(art_db, username=username)
+    art_db.set_config("auto_refresh", "yes")
+    now = [1000.0]
+    monkeypatch.setattr(art_scheduler.time, "monotonic", lambda: now[0])
+    refresher = FakeRefresher()
+    scheduler = RefreshScheduler(art_db=art_db, refresher=refresher)
+
+    assert scheduler.tick()
+    assert [username for _, _, username in refresher.submitted] == ["a", "b"]
+    events = refresher.finish(status="failed")
+    events[1]["award_data"]["status"] = "needs_otp"
+    scheduler.record(events)
+    scheduler.tick()
+
+    # the next run is before the backoff is over: nothing is submitted
+    now[0] += art_scheduler.SCHEDULE_INTERVAL
+    assert not scheduler.tick()
+    scheduler.tick()
+    # after the backoff, only the failed account is tried again
+    now[0] += art_scheduler.FAILURE_BACKOFF
+    assert scheduler.tick()
+    assert [username for _, _, username in refresher.submitted] == ["a"]
+    scheduler.record(refresher.finish(status="failed"))
+    scheduler.tick()
+    # the second failure in a row waits twice as long
+    assert scheduler.attempts[("mike", AWARD, "a")]["retry_at"] == now[0] + 2 * art_scheduler.FAILURE_BACKOFF
+
+    # an update by the user which succeeds ends the wait
+    scheduler.record([{"event": "finished", "cancelled": False,
+                       "job": {"user": "mike", "award": AWARD, "username": "b"}, "award_data": {"status": "ok"}}])
+    assert not scheduler.is_held({"user": "mike", "award": AWARD, "username": "b"})
@@ -0,0 +1,61 @@
+"""Tests of element lookup helpers on a page given by the tests (no browser)."""
+from awards._dom import by_text, read_text, read_texts, search_text
+
+
+class FakeLocator(object):
+    """Locator of elements with texts; evaluate_all() runs the filter of read_texts() in Python."""
+
+    def __init__(self, page, texts):
+        self.page = page
+        self.texts = texts
+
+    @property
+    def first(self):
+        return FakeLocator(page=self.page, texts=self.texts[:1])
+
+    def evaluate_all(self, expression, contains):
+        self.page.calls += 1
+        return [text for text in self.texts if contains is None or contains in text]
+
+    def inner_text(self):
+        self.page.calls += 1
+        return self.texts[0]
+
+
+class FakePage(object):
+    """Page with texts of elements by selector. calls counts round trips to the page."""
+
+    def __init__(self, elements):
+        self.elements = elements
+        self.calls = 0
+        # (selector, has_text) of every locator
+        self.locators = []
+
+    def locator(self, selector, has_text=None):
+        self.locators.append((selector, has_text))
+        return FakeLocator(page=self, texts=self.elements.get(selector, []))
+
+
+def test_texts_are_read_in_one_call():
+    page = FakePage(elements={"div.row": ["Points 1,234", "Card Gold", "Card Platinum"]})
+    assert read_texts(page, "div.row") == ["Points 1,234", "Card Gold", "Card Platinum"]
+    assert read_texts(page, "div.row", contains="Card") == ["Card Gold", "Card Platinum"]
+    assert read_text(page, "div.row") == "Points 1,234"
+    assert page.calls == 3
+
+
+def test_search_text_gets_the_first_match():
+    page = FakePage(elements={"div.row": ["Card Gold", "Points 1,234", "Points 99"]})
+    assert search_text(page, "div.row", r"Points ([\d,]+)").group(1) == "1,234"
+    assert search_text(page, "div.row", r"Miles (\d+)") is None
+    assert search_text(page, "span", r"Points") is None
+    assert page.calls == 3
+
+
+def test_by_text_matches_the_whole_text():
+    page = FakePage(elements={})
+    by_text(page, "button", "Log in (1)")
+    by_text(page, "button", "Log in", exact=False, visible=True)
+    (selector, exact), (visible_selector, substring) = page.locators
+    assert selector == "button" and exact.match("  Log in (1) ") and not exact.match("Log in (1) again")
+    assert (visible_selector, substring) == ("button >> visible=true", "Log in")
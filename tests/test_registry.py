@@ -0,0 +1,88 @@
+"""Tests of the award script registry and its sync to Awards, with award scripts written by the tests."""
+import pytest
+
+import art_db as art_db_module
+from awards._registry import AwardRegistry
+
+AA_SCRIPT = '''
+AWARD_PROGRAM = {
+    "category": "Airlines",
+    "award": "American Airlines AAdvantage",
+    "expire": 36,
+    "note": "changed",
+    "required_fields": [["username", "Username"], ["password", "Password"]]
+}
+'''
+NEW_SCRIPT = '''
+AWARD_PROGRAM = {
+    "category": "Hotels",
+    "award": "Test Rewards",
+    "expire": 0,
+    "required_fields": [["member_id", "Member ID"]]
+}
+
+# award scripts are not imported to read AWARD_PROGRAM
+raise RuntimeError("imported")
+'''
+
+
+@pytest.fixture
+def scripts(tmp_path, monkeypatch):
+    """Package of award scripts (test_award_scripts) in tmp_path."""
+    directory = tmp_path / "test_award_scripts"
+    directory.mkdir()
+    (directory / "__init__.py").write_text("")
+    (directory / "_helpers.py").write_text("IMPORTS = 0\n")
+    (directory / "aa.py").write_text(AA_SCRIPT)
+    (directory / "new_rewards.py").write_text(NEW_SCRIPT)
+    (directory / "no_program.py").write_text("IMPORTS = 1\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    return directory
+
+
+def test_award_programs_are_read_without_importing(scripts):
+    registry = AwardRegistry(directory=str(scripts), package="test_award_scripts")
+    assert registry.get_scripts() == ["aa", "new_rewards", "no_program"]
+    assert registry.get_programs() == [
+        {"script": "aa", "category": "Airlines", "award": "American Airlines AAdvantage", "expire": 36,
+         "note": "changed", "required_field_names": ["username", "password"],
+         "required_field_displays": ["Username", "Password"]},
+        {"script": "new_rewards", "category": "Hotels", "award": "Test Rewards", "expire": 0, "note": "",
+         "required_field_names": ["member_id"], "required_field_displays": ["Member ID"]}
+    ]
+    # imported once, when used
+    module = registry.get_module("no_program")
+    assert module.IMPORTS == 1 and registry.get_module("no_program") is module
+    with pytest.raises(ModuleNotFoundError):
+        registry.get_module("_helpers")
+
+
+def test_manifest_hash_changes_with_award_scripts(scripts):
+    manifest_hash = AwardRegistry(directory=str(scripts)).get_manifest_hash()
+    assert AwardRegistry(directory=str(scripts)).get_manifest_hash() == manifest_hash
+    (scripts / "_helpers.py").write_text("IMPORTS = 2\n")
+    assert AwardRegistry(directory=str(scripts)).get_manifest_hash() == manifest_hash
+    (scripts / "aa.py").write_text(AA_SCRIPT.replace('"expire": 36', '"expire": 24'))
+    assert AwardRegistry(directory=str(scripts)).get_manifest_hash() != manifest_hash
+
+
+def test_award_programs_are_synced_when_award_scripts_change(art_db, scripts, monkeypatch):
+    # the database is synced with award scripts of ART when it is created
+    assert not art_db.sync_award_programs()
+    registry = AwardRegistry(directory=str(scripts))
+    monkeypatch.setattr(art_db_module, "registry", registry)
+    assert art_db.sync_award_programs()
+    aa = art_db.get_award_info(award="American Airlines AAdvantage")
+    assert (aa["expire"], aa["note"], aa["has_script"]) == (36, "changed", True)
+    assert art_db.get_award_info(award="Test Rewards") == {
+        "category": "Hotels", "expire": 0, "note": "", "script": "new_rewards", "required_field_names": ["member_id"],
+        "required_field_displays": ["Member ID"], "has_script": True
+    }
+    # award programs without an award script are kept but cannot be added
+    assert not art_db.get_award_info(award="Delta Skymiles")["has_script"]
+    assert art_db.get_award_program_names() == ["Airlines: American Airlines AAdvantage", "Hotels: Test Rewards"]
+    # nothing is read if award scripts are the same
+    registry.get_award_program = None
+    assert not art_db.sync_award_programs()
+    del registry.get_award_program
+    assert art_db.sync_award_programs(force=True)
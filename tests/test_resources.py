@@ -0,0 +1,74 @@
+"""Tests of ResourceBlocker with routes and responses given by the tests (no browser)."""
+from types import SimpleNamespace
+
+from awards._resources import DEFAULT_PROFILE, ResourceBlocker, get_profile
+
+
+class FakeRequest(object):
+
+    def __init__(self, url, resource_type):
+        self.url = url
+        self.resource_type = resource_type
+
+
+class FakeRoute(object):
+
+    def __init__(self, url, resource_type):
+        self.request = FakeRequest(url=url, resource_type=resource_type)
+        self.result = None
+
+    def abort(self, error_code):
+        self.result = "aborted"
+
+    def continue_(self):
+        self.result = "continued"
+
+
+class FakeResponse(object):
+
+    def __init__(self, url, size):
+        self.url = url
+        self.headers = {"content-length": str(size)}
+
+
+def load(blocker: ResourceBlocker) -> [str]:
+    """Load a page with an image and an analytics script; get results of their routes."""
+    routes = [FakeRoute("https://www.example.com/", "document"),
+              FakeRoute("https://www.example.com/logo.png", "image"),
+              FakeRoute("https://www.google-analytics.com/analytics.js", "script")]
+    for route in routes:
+        blocker._on_route(route)
+        if route.result == "continued":
+            blocker._on_response(FakeResponse(url=route.request.url, size=1000))
+    return [route.result for route in routes]
+
+
+def test_blocking_does_not_report_bytes_it_cannot_measure():
+    blocker = ResourceBlocker(profile=DEFAULT_PROFILE)
+    assert load(blocker) == ["continued", "aborted", "aborted"]
+    assert blocker.report() == {"requests": 3, "blocked_requests": {"image": 1, "script": 1}, "loaded_bytes": 1000,
+                                "blocked_bytes": None, "dry_run": False}
+
+
+def test_measure_mode_counts_bytes_blocking_would_save():
+    blocker = ResourceBlocker(profile=DEFAULT_PROFILE, dry_run=True)
+    assert load(blocker) == ["continued", "continued", "continued"]
+    report = blocker.report()
+    assert (report["loaded_bytes"], report["blocked_bytes"]) == (3000, 2000)
+
+
+def test_profile_of_award_script_is_merged_with_the_default():
+    assert get_profile(award_script=SimpleNamespace()) == DEFAULT_PROFILE
+    assert get_profile(award_script=SimpleNamespace(RESOURCE_PROFILE=None)) is None
+    profile = get_profile(award_script=SimpleNamespace(RESOURCE_PROFILE={
+        "block_types": ["media"],
+        "allow_patterns": ["/captcha/"],
+        "deny_patterns": ["tracking.example.com"]
+    }))
+    blocker = ResourceBlocker(profile=profile)
+    assert not blocker.is_blocked(url="https://www.example.com/logo.png", resource_type="image")
+    assert blocker.is_blocked(url="https://www.example.com/intro.mp4", resource_type="media")
+    assert blocker.is_blocked(url="https://tracking.example.com/pixel", resource_type="fetch")
+    assert blocker.is_blocked(url="https://www.google-analytics.com/collect", resource_type="fetch")
+    assert not blocker.is_blocked(url="https://www.google-analytics.com/captcha/", resource_type="script")
+    assert not blocker.is_blocked(url="https://tracking.example.com/", resource_type="document")
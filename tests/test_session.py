@@ -0,0 +1,76 @@
+"""Tests of saved log in sessions with a browser given by the tests (no browser)."""
+import json
+import os
+import stat
+
+from art_refresh import get_session_store
+from awards._session import SessionStore
+
+
+class FakeContext(object):
+
+    def __init__(self, storage_state=None):
+        self.storage_state_path = storage_state
+
+    def storage_state(self, path):
+        with open(path, "w") as file:
+            json.dump({"cookies": [{"name": "session", "value": "logged in"}], "origins": []}, file)
+
+
+class FakeBrowser(object):
+
+    def new_context(self, **kwargs):
+        return FakeContext(**kwargs)
+
+
+class FakePage(object):
+
+    def __init__(self):
+        self.urls = []
+
+    def goto(self, url):
+        self.urls.append(url)
+
+
+class FakeWaiter(object):
+    """PageWaiter finding the elements of selectors."""
+
+    def __init__(self, selectors):
+        self.selectors = selectors
+
+    def for_selector(self, selector, state, timeout, required):
+        return f"<{selector}>" if selector in self.selectors else None
+
+
+def test_saved_session_is_restored_and_reused(tmp_path):
+    store = SessionStore(directory=str(tmp_path / "sessions"))
+    context, session = store.new_context(browser=FakeBrowser(), script="delta", username="mike@example.com")
+    assert (context.storage_state_path, session.restored) == (None, False)
+    assert not session.is_valid(page=FakePage(), wait=FakeWaiter(["div.miles"]), url="https://x", selector="div.miles")
+    session.save()
+    assert "mike" not in os.path.basename(session.path)
+    assert stat.S_IMODE(os.stat(session.path).st_mode) == 0o600
+
+    context, session = store.new_context(browser=FakeBrowser(), script="delta", username="mike@example.com")
+    assert (context.storage_state_path, session.restored) == (session.path, True)
+    page = FakePage()
+    assert session.is_valid(page=page, wait=FakeWaiter(["div.miles"]), url="https://x/account", selector="div.miles")
+    assert (page.urls, session.reused) == (["https://x/account"], True)
+
+
+def test_expired_session_is_discarded(tmp_path):
+    store = SessionStore(directory=str(tmp_path))
+    _, session = store.new_context(browser=FakeBrowser(), script="ua", username="mike")
+    session.save()
+    _, session = store.new_context(browser=FakeBrowser(), script="ua", username="mike")
+    assert not session.is_valid(page=FakePage(), wait=FakeWaiter([]), url="https://x", selector="div.miles")
+    assert not os.path.exists(session.path)
+    _, session = store.new_context(browser=FakeBrowser(), script="ua", username="mike")
+    assert not session.restored
+
+
+def test_sessions_are_saved_only_if_enabled(art_db, tmp_path):
+    assert get_session_store(art_db=art_db) is None
+    art_db.set_config(conf_key="session_cache", conf_value="Yes")
+    art_db.set_config(conf_key="session_directory", conf_value=str(tmp_path / "sessions"))
+    assert get_session_store(art_db=art_db).directory == str(tmp_path / "sessions")
@@ -0,0 +1,59 @@
+"""Tests of tracing spans of balance updates and their Chrome trace-event JSON."""
+import json
+
+import pytest
+
+from awards._trace import Phases, Tracer
+
+
+def test_nothing_is_recorded_until_tracing_starts(tmp_path):
+    trace = Tracer()
+    with trace.account(program="Delta Skymiles", account="a"):
+        phases = Phases(trace=trace)
+        phases.start("goto")
+        with trace.span("2fa wait"):
+            pass
+        phases.end()
+    assert trace.events == []
+    assert trace.save(str(tmp_path / "trace.json")) == 0
+
+
+def test_phases_of_accounts_are_saved_as_chrome_trace(tmp_path):
+    trace = Tracer()
+    trace.start()
+    with trace.account(program="Delta Skymiles", account="a", attempt=1):
+        phases = Phases(trace=trace)
+        phases.start("goto")
+        phases.start("login")
+        with trace.span("2fa wait"):
+            pass
+        phases.end()
+    # an error of the award script ends its open phase
+    with pytest.raises(RuntimeError):
+        with trace.account(program="Delta Skymiles", account="b"):
+            phases = Phases(trace=trace)
+            phases.start("goto")
+            raise RuntimeError("Page did not load")
+    with trace.account(program="United MileagePlus", account="a"):
+        pass
+    trace.stop()
+    with trace.account(program="Marriott Bonvoy", account="c"):
+        pass
+
+    path = tmp_path / "traces" / "trace.json"
+    assert trace.save(str(path)) == 7
+    with open(path) as f:
+        events = json.load(f)["traceEvents"]
+    names = {(event["pid"], event["tid"]): event["args"]["name"] for event in events if event["ph"] == "M"}
+    assert names == {(1, 0): "Delta Skymiles", (1, 1): "a", (1, 2): "b", (2, 0): "United MileagePlus", (2, 3): "a"}
+    spans = [(event["name"], event["cat"], event["pid"], event["tid"], event["args"])
+             for event in events if event["ph"] == "X"]
+    assert spans == [
+        ("goto", "phase", 1, 1, {}),
+        ("2fa wait", "phase", 1, 1, {}),
+        ("login", "phase", 1, 1, {}),
+        ("Delta Skymiles", "account", 1, 1, {"attempt": 1}),
+        ("goto", "phase", 1, 2, {"error": True}),
+        ("Delta Skymiles", "account", 1, 2, {"error": "RuntimeError"}),
+        ("United MileagePlus", "account", 2, 3, {})
+    ]
@@ -0,0 +1,58 @@
+"""Tests of PageWaiter on a page given by the tests (no browser). Playwright is needed for its TimeoutError."""
+import pytest
+
+playwright = pytest.importorskip("playwright.sync_api")
+
+from awards import _wait
+from awards._wait import PageWaiter
+
+
+class FakePage(object):
+    """Page with the elements of selectors; waits for other elements time out."""
+
+    def __init__(self, selectors):
+        self.selectors = selectors
+        # timeout (milliseconds) of every wait
+        self.timeouts = []
+
+    def wait_for_selector(self, selector, state, timeout):
+        self.timeouts.append(timeout)
+        if selector not in self.selectors:
+            raise playwright.TimeoutError(f"Timeout {timeout}ms exceeded")
+        return f"<{selector}>"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.monotonic() moved by the tests."""
+    clock = [1000.0]
+    monkeypatch.setattr(_wait.time, "monotonic", lambda: clock[0])
+    return clock
+
+
+def test_waits_are_limited_by_the_deadline(clock):
+    page = FakePage(selectors=["button#login"])
+    wait = PageWaiter(page=page, deadline=30, timeout=20)
+    assert wait.for_selector("button#login") == "<button#login>"
+    clock[0] += 25
+    assert wait.for_selector("button#login") == "<button#login>"
+    assert page.timeouts == [20000, 5000]
+    clock[0] += 10
+    # the deadline is exceeded: no more waits on the page
+    with pytest.raises(playwright.TimeoutError):
+        wait.for_selector("button#login")
+    assert wait.for_selector("button#login", required=False) is None
+    assert page.timeouts == [20000, 5000]
+    assert [timing["ok"] for timing in wait.timings] == [True, True, False, False]
+
+
+def test_optional_wait_returns_none_on_timeout(clock):
+    page = FakePage(selectors=[])
+    wait = PageWaiter(page=page, deadline=120, timeout=20)
+    assert wait.for_selector("div.otp", timeout=3, required=False) is None
+    with pytest.raises(playwright.TimeoutError):
+        wait.for_selector("div.balance")
+    assert page.timeouts == [3000, 20000]
+    assert [(timing["wait"], timing["ok"]) for timing in wait.timings] == [
+        ("selector div.otp", False), ("selector div.balance", False)
+    ]